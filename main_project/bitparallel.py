@@ -0,0 +1,339 @@
+"""Simulate many copies of a network at once, one copy per bit.
+
+Used in the Logic Simulator project for checks that need a large number of
+simulations of the same circuit, such as equivalence checking and cold
+start-up analysis.
+
+Classes
+-------
+BitParallel - simulates many two-valued copies of a network at once.
+"""
+import numpy as np
+
+
+class BitParallel:
+
+    """Simulate many two-valued copies of a network at once.
+
+    Every signal is held in a Python int with one bit per copy (lane) of the
+    network, so one bitwise operation evaluates a gate for all the lanes.
+    Signals are two-valued: a lane is 1 for HIGH and 0 for LOW. As in the
+    network, D-types store their DATA input from the previous cycle on a
+    rising edge of CLK, SET and CLEAR act immediately and a cycle settles
+    the gates, in dependency order, until no signal changes.
+
+    Switches, clocks, signal generators, D-types, logic gates and LUTs are
+    supported. Every lane starts from the current state of the devices, see
+    reset. Clocks and signal generators may then start at a different point
+    of their cycles in each lane, see set_phases.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    lanes: number of copies of the network simulated at once.
+
+    Public methods
+    --------------
+    get_lanes_mask(self, lanes): Returns an int with the given lanes set.
+
+    reset(self): Starts every lane from the current state of the devices.
+
+    set_clock_levels(self): Takes the CLK level of the D-types from the
+                            current signals.
+
+    set_phases(self, device_id, phases): Starts a clock or signal generator
+                                        from a different point in each lane.
+
+    set_memory(self, device_id, values): Sets the memory of a D-type in
+                                         every lane.
+
+    set_switch(self, device_id, values): Sets a switch in every lane.
+
+    get_signal(self, device_id, output_id): Returns the lanes of a signal.
+
+    step(self): Simulates one cycle in every lane.
+    """
+
+    # Operation codes of the compiled gates
+    [AND, OR, NAND, NOR, XOR, LUT, D_TYPE] = range(7)
+
+    def __init__(self, devices, lanes=65536):
+        """Compile the network into bitwise operations."""
+        self.devices = devices
+        self.lanes = lanes
+        self.mask = (1 << lanes) - 1
+
+        # Each output is stored at an index of self.values
+        self.signal_index = {}
+        for device in devices.devices_list:
+            for output_id in device.outputs:
+                self.signal_index[(device.device_id, output_id)] = len(
+                    self.signal_index)
+
+        gate_codes = {devices.AND: self.AND, devices.OR: self.OR,
+                      devices.NAND: self.NAND, devices.NOR: self.NOR,
+                      devices.XOR: self.XOR, devices.NOT: self.NAND,
+                      devices.LUT: self.LUT, devices.D_TYPE: self.D_TYPE}
+        self.switches = {}  # {device_id: signal index}
+        self.clocks = []  # [device]
+        self.siggens = []  # [device]
+        operations = {}  # {device_id: operation}
+        for device in devices.devices_list:
+            kind = device.device_kind
+            if kind == devices.SWITCH:
+                self.switches[device.device_id] = self.signal_index[
+                    (device.device_id, None)]
+            elif kind == devices.CLOCK:
+                self.clocks.append(device)
+            elif kind == devices.SIGGEN:
+                self.siggens.append(device)
+            elif kind in gate_codes:
+                operations[device.device_id] = self.compile_device(
+                    device, gate_codes[kind])
+            else:
+                raise ValueError("{} devices cannot be simulated bit-parallel."
+                                 .format(devices.names.get_name_string(kind)))
+        self.operations = self.order_operations(operations)
+        self.reset()
+
+    def get_lanes_mask(self, lanes):
+        """Return an int with the bits of the given lanes set.
+
+        lanes is a NumPy boolean array with one entry per lane.
+        """
+        packed = np.packbits(np.asarray(lanes, dtype=bool), bitorder="little")
+        return int.from_bytes(packed.tobytes(), "little")
+
+    def compile_device(self, device, code):
+        """Return the operation evaluating a gate, LUT or D-type.
+
+        An operation is a list of [code, device_id, output index, input
+        indices, extra], where extra is the truth table of a LUT and the
+        (Q, QBAR) output indices of a D-type.
+        """
+        inputs = []
+        for input_id in device.inputs:
+            connected_output = device.inputs[input_id]
+            if connected_output is None:
+                raise ValueError("All inputs must be connected.")
+            inputs.append(self.signal_index[connected_output])
+        if code == self.D_TYPE:
+            ports = [self.devices.DATA_ID, self.devices.CLK_ID,
+                     self.devices.SET_ID, self.devices.CLEAR_ID]
+            inputs = [self.signal_index[device.inputs[port]]
+                      for port in ports]
+            extra = (self.signal_index[(device.device_id, self.devices.Q_ID)],
+                     self.signal_index[(device.device_id,
+                                        self.devices.QBAR_ID)])
+            return [code, device.device_id, extra[0], inputs, extra]
+        extra = None
+        if code == self.LUT:
+            extra = [int(entry) for entry in device.lut_table]
+        return [code, device.device_id,
+                self.signal_index[(device.device_id, None)], inputs, extra]
+
+    def order_operations(self, operations):
+        """Return the operations sorted so inputs come before outputs.
+
+        Gates in feedback loops are sorted as well as possible; the loops
+        are resolved by repeating the operations until they settle.
+        """
+        output_devices = {}  # {signal index: device_id}
+        for (device_id, output_id), index in self.signal_index.items():
+            output_devices[index] = device_id
+        ordered = []
+        visited = set()
+        for device_id in operations:
+            stack = [(device_id, iter(operations[device_id][3]))]
+            visited.add(device_id)
+            while stack:
+                current_id, inputs = stack[-1]
+                for index in inputs:
+                    source_id = output_devices[index]
+                    if source_id in operations and source_id not in visited:
+                        visited.add(source_id)
+                        stack.append((source_id,
+                                      iter(operations[source_id][3])))
+                        break
+                else:
+                    stack.pop()
+                    ordered.append(operations[current_id])
+        return ordered
+
+    def reset(self):
+        """Start every lane from the current state of the devices.
+
+        The signals, D-type memories and the points the clocks and signal
+        generators are at in their cycles are taken from the devices, so a
+        lane is simulated as the network would be from its current state,
+        e.g. after devices.cold_startup. RISING counts as HIGH and FALLING
+        as LOW.
+        """
+        high = [self.devices.HIGH, self.devices.RISING]
+        self.values = [0] * len(self.signal_index)
+        for (device_id, output_id), index in self.signal_index.items():
+            signal = self.devices.get_device(device_id).outputs[output_id]
+            if signal in high:
+                self.values[index] = self.mask
+        self.memories = {}
+        for operation in self.operations:
+            if operation[0] == self.D_TYPE:
+                device = self.devices.get_device(operation[1])
+                self.memories[operation[1]] = (
+                    self.mask if device.dtype_memory in high else 0)
+        # phases stores {device_id: {(counter, level): lanes}} for clocks and
+        # {device_id: {counter: lanes}} for signal generators
+        self.phases = {}
+        for device in self.clocks:
+            level = int(device.outputs[None] in high)
+            self.phases[device.device_id] = {
+                (device.clock_counter, level): self.mask}
+        for device in self.siggens:
+            self.phases[device.device_id] = {device.clock_counter: self.mask}
+        self.set_clock_levels()
+
+    def set_clock_levels(self):
+        """Take the CLK level of the D-types from the current signals.
+
+        A D-type stores its DATA input on a rising edge of CLK, so CLK must
+        start at its current level for the first step not to see a false
+        edge.
+        """
+        self.clock_levels = {}  # {device_id: CLK lanes at the last step}
+        for operation in self.operations:
+            if operation[0] == self.D_TYPE:
+                self.clock_levels[operation[1]] = self.values[
+                    operation[3][1]]
+
+    def set_phases(self, device_id, phases):
+        """Start a clock or signal generator from a different point per lane.
+
+        phases is a NumPy integer array with one entry per lane. For a clock
+        with half period n, phase p starts the clock at counter p % n, LOW
+        if p < n and HIGH otherwise, so phases range from 0 to 2n - 1. For a
+        signal generator, phase p starts the trace at position p. The new
+        levels do not count as edges at the next step.
+        """
+        device = self.devices.get_device(device_id)
+        phases = np.asarray(phases)
+        lanes = {}
+        level = 0
+        for phase in np.unique(phases):
+            phase = int(phase)
+            phase_lanes = self.get_lanes_mask(phases == phase)
+            if device.device_kind == self.devices.CLOCK:
+                half_period = device.clock_half_period
+                key = (phase % half_period, phase // half_period)
+                if key[1]:
+                    level |= phase_lanes
+            else:
+                key = phase
+                if self.devices.get_trace_bit(device, phase):
+                    level |= phase_lanes
+            lanes[key] = phase_lanes
+        self.phases[device_id] = lanes
+        self.values[self.signal_index[(device_id, None)]] = level
+        self.set_clock_levels()
+
+    def set_memory(self, device_id, values):
+        """Set the memory of a D-type in every lane."""
+        self.memories[device_id] = values & self.mask
+
+    def set_switch(self, device_id, values):
+        """Set a switch in every lane.
+
+        values is an int with bit i set if the switch is HIGH in lane i.
+        """
+        self.values[self.switches[device_id]] = values & self.mask
+
+    def get_signal(self, device_id, output_id):
+        """Return an int with bit i set if the signal is HIGH in lane i."""
+        return self.values[self.signal_index[(device_id, output_id)]]
+
+    def evaluate_lut(self, table, inputs, values):
+        """Return the output of a truth table by Shannon expansion."""
+        if len(table) == 1:
+            return self.mask if table[0] else 0
+        half = len(table) // 2
+        low = self.evaluate_lut(table[:half], inputs[:-1], values)
+        high = self.evaluate_lut(table[half:], inputs[:-1], values)
+        select = values[inputs[-1]]
+        return (low & ~select) | (high & select)
+
+    def step(self):
+        """Simulate one cycle in every lane.
+
+        Return True if successful and the network does not oscillate.
+        """
+        values = self.values
+        mask = self.mask
+        previous_values = list(values)  # the signals of the last cycle
+
+        # Clocks and signal generators
+        for device in self.clocks:
+            half_period = device.clock_half_period
+            phases = {}
+            level = 0
+            for (counter, clock_level), lanes in self.phases[
+                    device.device_id].items():
+                if counter == half_period:
+                    counter = 0
+                    clock_level ^= 1
+                counter += 1
+                phases[(counter, clock_level)] = lanes
+                if clock_level:
+                    level |= lanes
+            self.phases[device.device_id] = phases
+            values[self.signal_index[(device.device_id, None)]] = level
+        for device in self.siggens:
+            length = device.trace_length
+            phases = {}
+            level = 0
+            for counter, lanes in self.phases[device.device_id].items():
+                counter = (counter + 1) % length
+                phases[counter] = lanes
+                if self.devices.get_trace_bit(device, counter):
+                    level |= lanes
+            self.phases[device.device_id] = phases
+            values[self.signal_index[(device.device_id, None)]] = level
+
+        # Settle the gates and D-types
+        for _ in range(20):
+            changed = False
+            for code, device_id, output, inputs, extra in self.operations:
+                if code == self.AND or code == self.NAND:
+                    value = mask
+                    for index in inputs:
+                        value &= values[index]
+                    if code == self.NAND:
+                        value ^= mask
+                elif code == self.OR or code == self.NOR:
+                    value = 0
+                    for index in inputs:
+                        value |= values[index]
+                    if code == self.NOR:
+                        value ^= mask
+                elif code == self.XOR:
+                    value = values[inputs[0]] ^ values[inputs[1]]
+                elif code == self.LUT:
+                    value = self.evaluate_lut(extra, inputs, values)
+                else:  # D-type
+                    [data, clock, set_, clear] = inputs
+                    clock_level = values[clock]
+                    rising = clock_level & ~self.clock_levels[device_id]
+                    self.clock_levels[device_id] = clock_level
+                    memory = self.memories[device_id]
+                    memory = (memory & ~rising) | (previous_values[data] &
+                                                   rising)
+                    memory = (memory | values[set_]) & ~values[clear]
+                    self.memories[device_id] = memory
+                    if values[extra[1]] != memory ^ mask:
+                        values[extra[1]] = memory ^ mask
+                        changed = True
+                    value = memory
+                if values[output] != value:
+                    values[output] = value
+                    changed = True
+            if not changed:
+                return True
+        return False
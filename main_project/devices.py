@@ -4,9 +4,24 @@ properties.
 Classes
 -------
 Device - stores device properties.
+PackedPorts - presents the ports of a packed device as a dictionary.
+PackedDevice - stores device properties, with the state in arrays.
+DeviceKind - stores how devices of one kind are made and executed.
+DeviceArrays - stores the devices as NumPy arrays.
 Devices - makes and stores all the devices in the logic network.
 """
+import collections
+import collections.abc
+import copy
 import random
+import types
+
+import numpy as np
+
+# The bus_widths of the devices without buses, shared by all of them. It is
+# read-only: add_bus_input and add_bus_output give a device its own
+# dictionary when its first bus is added.
+NO_BUS_WIDTHS = types.MappingProxyType({})
 
 
 class Device:
@@ -17,9 +32,19 @@ class Device:
     device_id: device ID.
     Public methods
     --------------
-    No public methods.
+    fork(self): Returns a copy of the device that shares its connections.
+
+    write_memory(self, address, data): Stores a word in the memory.
     """
 
+    # The slots list every attribute of a device, so a misspelt attribute
+    # is an error. Most of the size of a device is in its dictionaries, see
+    # Devices.pack to keep the ports and state in arrays instead.
+    __slots__ = ["device_id", "inputs", "outputs", "device_kind",
+                 "clock_half_period", "clock_counter", "trace", "trace_length",
+                 "switch_state", "dtype_memory", "lut_table", "bus_widths",
+                 "bus_memory", "lfsr_taps", "memory", "memory_shared"]
+
     def __init__(self, device_id):
         """Initialise device properties."""
 
@@ -35,9 +60,268 @@ class Device:
         self.device_kind = None
         self.clock_half_period = None
         self.clock_counter = None
+        # Signal generators: trace stores the bits of the pattern packed in
+        # bytes, bit i of the pattern being bit i % 8 of byte i // 8
         self.trace = None
+        self.trace_length = None
         self.switch_state = None
         self.dtype_memory = None
+        self.lut_table = None
+
+        # Word-level devices: bus_widths stores {port_id: width} for the ports
+        # that carry an N-bit bus (stored as an int) instead of a signal
+        self.bus_widths = NO_BUS_WIDTHS
+        self.bus_memory = None
+        self.lfsr_taps = None
+
+        # Memory devices: memory is a NumPy array of depth words, and
+        # memory_shared is True while it may be shared with a fork
+        self.memory = None
+        self.memory_shared = False
+
+    def fork(self):
+        """Return a copy of the device that shares its connections.
+
+        The inputs dictionary and the trace are part of the netlist and are
+        shared with the original. The output signals are copied. Any
+        writable memory is shared until either device writes to it, see
+        write_memory, so the two devices can then be simulated independently
+        and forking a large or memory-mapped RAM costs nothing up front.
+        """
+        forked_device = copy.copy(self)
+        forked_device.outputs = dict(self.outputs)
+        if self.memory is not None and self.memory.flags.writeable:
+            self.memory_shared = forked_device.memory_shared = True
+        return forked_device
+
+    def write_memory(self, address, data):
+        """Store data at the given address of the memory.
+
+        A memory shared with a fork is copied before the first write.
+        """
+        if self.memory_shared:
+            self.memory = np.array(self.memory)
+            self.memory_shared = False
+        self.memory[address] = data
+
+
+class PackedPorts(collections.abc.MutableMapping):
+
+    """Present the ports of a packed device as a dictionary.
+
+    The ports are the device's row of the compressed port arrays of
+    Devices.arrays (see Devices.pack), so reading and writing the view reads
+    and writes the arrays. The ports of a packed device are fixed: setting a
+    port the device does not have raises KeyError, and ports cannot be
+    deleted.
+
+    Parameters
+    ----------
+    devices: instance of the Devices() class holding the arrays.
+    index: dense index of the device in the arrays.
+    outputs: True for the outputs of the device, False for its inputs.
+
+    Public methods
+    --------------
+    find_port(self, port_id): Returns the index of a port in the arrays.
+    """
+
+    __slots__ = ["devices", "index", "outputs"]
+
+    def __init__(self, devices, index, outputs):
+        """Initialise the view."""
+        self.devices = devices
+        self.index = index
+        self.outputs = outputs
+
+    def get_ports(self):
+        """Return the port IDs of the device, with -1 standing for None."""
+        arrays = self.devices.arrays
+        if self.outputs:
+            offsets, ports = arrays.output_offsets, arrays.output_ports
+        else:
+            offsets, ports = arrays.input_offsets, arrays.input_ports
+        start = offsets[self.index]
+        return start, ports[start:offsets[self.index + 1]]
+
+    def find_port(self, port_id):
+        """Return the index of the port in the arrays.
+
+        Raise KeyError if the device does not have the port.
+        """
+        start, ports = self.get_ports()
+        matches = np.flatnonzero(ports == (-1 if port_id is None
+                                           else port_id))
+        if not len(matches):
+            raise KeyError(port_id)
+        return start + int(matches[0])
+
+    def __getitem__(self, port_id):
+        """Return the signal of an output or the output driving an input."""
+        arrays = self.devices.arrays
+        position = self.find_port(port_id)
+        if self.outputs:
+            return int(arrays.output_signals[position])
+        driver = int(arrays.input_drivers[position])
+        if driver == -1:
+            return None
+        owner = int(np.searchsorted(arrays.output_offsets, driver,
+                                    side="right")) - 1
+        output_id = int(arrays.output_ports[driver])
+        return (int(arrays.device_ids[owner]),
+                None if output_id == -1 else output_id)
+
+    def __setitem__(self, port_id, value):
+        """Set the signal of an output or the output driving an input."""
+        arrays = self.devices.arrays
+        position = self.find_port(port_id)
+        if self.outputs:
+            arrays.output_signals[position] = value
+        elif value is None:
+            arrays.input_drivers[position] = -1
+        else:
+            [device_id, output_id] = value
+            source = self.devices.get_device(device_id)
+            arrays.input_drivers[position] = source.outputs.find_port(
+                output_id)
+
+    def __delitem__(self, port_id):
+        """Refuse to delete a port of a packed device."""
+        raise TypeError("The ports of a packed device are fixed.")
+
+    def __iter__(self):
+        """Iterate over the port IDs in order of creation."""
+        for port_id in self.get_ports()[1].tolist():
+            yield None if port_id == -1 else port_id
+
+    def __len__(self):
+        """Return the number of ports."""
+        return len(self.get_ports()[1])
+
+
+class PackedDevice(Device):
+
+    """Store device properties, with the state in arrays.
+
+    The inputs, outputs, D-type memory and clock counter of the device are
+    views of Devices.arrays (see Devices.pack) instead of attributes of the
+    device, so a packed network has no dictionaries per device. The other
+    properties are copied from the device that is packed.
+
+    Parameters
+    ----------
+    device: instance of the Device() class to pack.
+    devices: instance of the Devices() class holding the arrays.
+    index: dense index of the device in the arrays.
+
+    Public methods
+    --------------
+    fork(self, devices=None): Returns a copy of the device that stores its
+                              state in the arrays of the given devices.
+    """
+
+    __slots__ = ["devices", "index"]
+
+    # The properties stored in the arrays rather than in the device
+    array_properties = ["inputs", "outputs", "dtype_memory", "clock_counter"]
+
+    def __init__(self, device, devices, index):
+        """Copy the properties kept in the device."""
+        for name in Device.__slots__:
+            if name not in self.array_properties:
+                setattr(self, name, getattr(device, name))
+        self.devices = devices
+        self.index = index
+
+    @property
+    def inputs(self):
+        """Return the inputs of the device as a dictionary view."""
+        return PackedPorts(self.devices, self.index, False)
+
+    @property
+    def outputs(self):
+        """Return the outputs of the device as a dictionary view."""
+        return PackedPorts(self.devices, self.index, True)
+
+    @property
+    def dtype_memory(self):
+        """Return the D-type memory, or None if the device has none."""
+        memory = int(self.devices.arrays.dtype_memory[self.index])
+        return None if memory == -1 else memory
+
+    @dtype_memory.setter
+    def dtype_memory(self, memory):
+        """Set the D-type memory."""
+        self.devices.arrays.dtype_memory[self.index] = (
+            -1 if memory is None else memory)
+
+    @property
+    def clock_counter(self):
+        """Return the clock counter, or None if the device has none."""
+        counter = int(self.devices.arrays.clock_counters[self.index])
+        return None if counter == -1 else counter
+
+    @clock_counter.setter
+    def clock_counter(self, counter):
+        """Set the clock counter."""
+        self.devices.arrays.clock_counters[self.index] = (
+            -1 if counter is None else counter)
+
+    def fork(self, devices=None):
+        """Return a copy of the device that stores its state in devices.
+
+        devices is the fork of the Devices() instance holding the arrays,
+        see Devices.fork. Memory is shared as by Device.fork.
+        """
+        forked_device = PackedDevice(self, devices or self.devices,
+                                     self.index)
+        if self.memory is not None and self.memory.flags.writeable:
+            self.memory_shared = forked_device.memory_shared = True
+        return forked_device
+
+
+# The devices of a network as arrays indexed by a dense device index, in
+# order of creation, for vectorized engines. Outputs and inputs are stored
+# in compressed rows: the ports of device i are at offsets[i]:offsets[i + 1].
+# A port ID of -1 stands for None, and input_drivers holds the index in the
+# output arrays of the connected output, or -1 if the input is unconnected.
+DeviceArrays = collections.namedtuple("DeviceArrays", [
+    "device_ids", "kinds", "dtype_memory", "clock_counters",
+    "output_offsets", "output_ports", "output_signals",
+    "input_offsets", "input_ports", "input_drivers"])
+
+
+class DeviceKind:
+
+    """Store how devices of one kind are made and executed.
+
+    Parameters
+    ----------
+    kind_id: name ID of the device kind.
+    constructor: function(device_id, device_kind, device_property) that makes
+                 a device of this kind and returns an error code.
+    evaluator: function(network, device_id) that executes a device of this
+               kind for one settle iteration and returns True if successful.
+    input_ids: list of input IDs, or None if they depend on the device
+               property (e.g. the number of gate inputs).
+    output_ids: list of output IDs. A single unnamed output has ID None.
+    sequential: True if the devices have internal state that persists
+                between simulation cycles, False if they are combinational.
+
+    Public methods
+    --------------
+    No public methods.
+    """
+
+    def __init__(self, kind_id, constructor, evaluator, input_ids, output_ids,
+                 sequential):
+        """Initialise the kind properties."""
+        self.kind_id = kind_id
+        self.constructor = constructor
+        self.evaluator = evaluator
+        self.input_ids = input_ids
+        self.output_ids = output_ids
+        self.sequential = sequential
 
 
 class Devices:
@@ -73,9 +357,78 @@ class Devices:
     make_gate(self, device_id, device_kind, no_of_inputs): Makes logic gates
                                         with the specified number of inputs.
     make_d_type(self, device_id): Makes a D-type device.
-    cold_startup(self): Simulates cold start-up of D-types and c locks.
+    make_lut(self, device_id, no_of_inputs, table): Makes a truth-table
+                                         device with the specified table.
+    set_lut_table(self, device_id, table): Sets the truth table of the
+                                           specified LUT device.
+    build_lut_table(self, table, no_of_inputs): Returns the truth table as a
+                                                NumPy array of signals.
+    add_bus_input(self, device_id, input_id, width): Adds an N-bit bus input
+                                                     to the specified device.
+    add_bus_output(self, device_id, output_id, width, value=0): Adds an N-bit
+                                         bus output to the specified device.
+    get_bus_width(self, device_id, port_id): Returns the width of a bus port,
+                                             or None for a 1-bit signal.
+    set_bus_width(self, device_id, width): Sets the width of all the bus
+                                           ports of a word-level device.
+    make_register(self, device_id, width): Makes an N-bit register.
+    make_counter(self, device_id, width): Makes an N-bit counter.
+    make_lfsr(self, device_id, width, taps=None): Makes an N-bit linear
+                                                  feedback shift register.
+    make_adder(self, device_id, width): Makes an N-bit adder.
+    make_comparator(self, device_id, width): Makes an N-bit comparator.
+    make_mux(self, device_id, width): Makes an N-bit 2-to-1 multiplexer.
+    get_bus_dtype(self, width): Returns the smallest unsigned NumPy type that
+                                holds an N-bit bus.
+    get_address_width(self, depth): Returns the address width of a memory.
+    make_memory_array(self, depth, width, contents=None): Returns an array of
+                                                 memory words.
+    make_memory(self, device_id, device_kind, depth, width): Makes a RAM or
+                                                             ROM.
+    load_memory(self, device_id, contents, mmap=False): Initialises the words
+                                   of a memory from an array or .npy file.
+    set_memory_depth(self, device_id, depth): Sets the number of words of a
+                                              memory.
+    pack_trace(self, trace): Returns the bit-packed bytes and the length of
+                             a signal generator trace.
+    get_trace_bit(self, device, position): Returns the signal of a trace at
+                                           a position.
+    load_trace(self, device_id, path): Sets the trace of a signal generator
+                                       from a file.
+    cold_startup(self, generator=None): Simulates cold start-up of D-types
+                                        and clocks from a seedable generator.
     make_device(self, device_id, device_kind, device_property=None): Creates
                        the specified device and returns errors if unsuccessful.
+    make_devices(self, device_list): Creates many devices and returns all the
+                                     errors.
+    get_schedule(self): Returns the devices in the order the network
+                        executes them.
+
+    register_kind(self, kind_id, constructor, evaluator, input_ids,
+                  output_ids, sequential): Adds a device kind to the kinds
+                                           table.
+    create_switch(self, device_id, device_kind, device_property): Checks the
+                         property and makes a switch. Returns an error code.
+    create_clock(self, device_id, device_kind, device_property): Checks the
+                         property and makes a clock. Returns an error code.
+    create_siggen(self, device_id, device_kind, device_property): Checks the
+                  property and makes a signal generator. Returns an error code.
+    create_gate(self, device_id, device_kind, device_property): Checks the
+                         property and makes a gate. Returns an error code.
+    create_d_type(self, device_id, device_kind, device_property): Checks the
+                         property and makes a D-type. Returns an error code.
+    create_lut(self, device_id, device_kind, device_property): Checks the
+                  property and makes a truth-table device. Returns an error
+                  code.
+    create_bus_device(self, device_id, device_kind, device_property): Checks
+                  the property and makes a word-level device. Returns an error
+                  code.
+    create_memory(self, device_id, device_kind, device_property): Checks the
+                  property and makes a RAM or ROM. Returns an error code.
+    pack(self): Moves the ports and state of the devices into arrays.
+    make_arrays(self): Returns a DeviceArrays holding a copy of the devices.
+    get_arrays(self): Returns the devices as a DeviceArrays of NumPy arrays.
+    fork(self): Returns a copy of the devices that shares the netlist.
     """
 
     def __init__(self, names):
@@ -85,10 +438,24 @@ class Devices:
 
         self.devices_list = []
 
+        # device_index stores {device_id: Device} and kind_groups stores
+        # {device_kind: [device_id, ...]}, both in order of creation
+        self.device_index = {}
+        self.kind_groups = {}
+        # schedule caches get_schedule until a device or kind is added
+        self.schedule = None
+        # arrays is the DeviceArrays holding the ports and state of the
+        # devices once they are packed, see pack
+        self.arrays = None
+
         gate_strings = ["AND", "OR", "NAND", "NOR", "XOR", "NOT"]
-        device_strings = ["CLOCK", "SWITCH", "DTYPE", "SIGGEN"]
+        device_strings = ["CLOCK", "SWITCH", "DTYPE", "SIGGEN", "LUT"]
         dtype_inputs = ["CLK", "SET", "CLEAR", "DATA"]
         dtype_outputs = ["Q", "QBAR"]
+        bus_strings = ["REG", "ADDER", "COMPARE", "MUX", "COUNTER", "LFSR"]
+        bus_ports = ["A", "B", "SEL", "COUT", "EQ", "LT", "GT"]
+        memory_strings = ["RAM", "ROM"]
+        memory_ports = ["ADDR", "WE"]
 
         [self.NO_ERROR, self.INVALID_QUALIFIER, self.NO_QUALIFIER,
          self.BAD_DEVICE, self.QUALIFIER_PRESENT,
@@ -96,42 +463,133 @@ class Devices:
 
         self.signal_types = [self.LOW, self.HIGH, self.RISING,
                              self.FALLING, self.BLANK] = range(5)
-        self.gate_types = [self.AND, self.OR, self.NAND, self.NOR,
-                           self.XOR, self.NOT] = self.names.lookup(gate_strings)
-        self.device_types = [self.CLOCK, self.SWITCH,
-                             self.D_TYPE, self.SIGGEN] = self.names.lookup(device_strings)
+        self.gate_types = [
+            self.AND, self.OR, self.NAND, self.NOR, self.XOR,
+            self.NOT] = self.names.lookup(gate_strings)
+        self.device_types = [
+            self.CLOCK, self.SWITCH, self.D_TYPE, self.SIGGEN,
+            self.LUT] = self.names.lookup(device_strings)
         self.dtype_input_ids = [self.CLK_ID, self.SET_ID, self.CLEAR_ID,
                                 self.DATA_ID] = self.names.lookup(dtype_inputs)
         self.dtype_output_ids = [
             self.Q_ID, self.QBAR_ID] = self.names.lookup(dtype_outputs)
+        self.bus_types = [self.REGISTER, self.ADDER, self.COMPARATOR, self.MUX,
+                          self.COUNTER, self.LFSR] = self.names.lookup(
+                              bus_strings)
+        self.bus_port_ids = [self.A_ID, self.B_ID, self.SEL_ID, self.COUT_ID,
+                             self.EQ_ID, self.LT_ID,
+                             self.GT_ID] = self.names.lookup(bus_ports)
+        self.memory_types = [self.RAM, self.ROM] = self.names.lookup(
+            memory_strings)
+        self.memory_port_ids = [self.ADDR_ID, self.WE_ID] = self.names.lookup(
+            memory_ports)
 
         self.max_gate_inputs = 16
+        self.max_bus_width = 64
+        self.default_bus_width = 8
+        self.default_memory_depth = 256
+        self.max_memory_depth = 1 << 32
+
+        # Taps giving a maximal-length sequence for each LFSR width. Tap n is
+        # bit n - 1 of the state.
+        self.lfsr_default_taps = {
+            2: (2, 1), 3: (3, 2), 4: (4, 3), 5: (5, 3), 6: (6, 5), 7: (7, 6),
+            8: (8, 6, 5, 4), 9: (9, 5), 10: (10, 7), 11: (11, 9),
+            12: (12, 6, 4, 1), 13: (13, 4, 3, 1), 14: (14, 5, 3, 1),
+            15: (15, 14), 16: (16, 15, 13, 4), 17: (17, 14), 18: (18, 11),
+            19: (19, 6, 2, 1), 20: (20, 17), 21: (21, 19), 22: (22, 21),
+            23: (23, 18), 24: (24, 23, 22, 17), 25: (25, 22),
+            26: (26, 6, 2, 1), 27: (27, 5, 2, 1), 28: (28, 25), 29: (29, 27),
+            30: (30, 6, 4, 1), 31: (31, 28), 32: (32, 22, 2, 1)}
+
+        # kinds stores {device_kind: DeviceKind}. The network executes the
+        # kinds in this order, so D-types and the clocked word-level devices
+        # come before clocks to catch the rising edge of the clock. The
+        # evaluators of the built-in kinds are attached by the network.
+        self.kinds = collections.OrderedDict()
+        self.register_kind(self.SWITCH, self.create_switch, None, [], [None],
+                           False)
+        self.register_kind(self.SIGGEN, self.create_siggen, None, [], [None],
+                           True)
+        self.register_kind(self.D_TYPE, self.create_d_type, None,
+                           self.dtype_input_ids, self.dtype_output_ids, True)
+        self.register_kind(self.REGISTER, self.create_bus_device, None,
+                           [self.CLK_ID, self.DATA_ID], [None], True)
+        self.register_kind(self.COUNTER, self.create_bus_device, None,
+                           [self.CLK_ID], [None], True)
+        self.register_kind(self.LFSR, self.create_bus_device, None,
+                           [self.CLK_ID], [None], True)
+        self.register_kind(self.RAM, self.create_memory, None,
+                           [self.CLK_ID, self.ADDR_ID, self.DATA_ID,
+                            self.WE_ID], [None], True)
+        self.register_kind(self.CLOCK, self.create_clock, None, [], [None],
+                           True)
+        for gate_kind in [self.AND, self.OR, self.NAND, self.NOR, self.XOR,
+                          self.NOT]:
+            self.register_kind(gate_kind, self.create_gate, None, None,
+                               [None], False)
+        self.register_kind(self.LUT, self.create_lut, None, None, [None],
+                           False)
+        self.register_kind(self.ADDER, self.create_bus_device, None,
+                           [self.A_ID, self.B_ID], [None, self.COUT_ID], False)
+        self.register_kind(self.COMPARATOR, self.create_bus_device, None,
+                           [self.A_ID, self.B_ID],
+                           [self.EQ_ID, self.LT_ID, self.GT_ID], False)
+        self.register_kind(self.MUX, self.create_bus_device, None,
+                           [self.SEL_ID, self.A_ID, self.B_ID], [None], False)
+        self.register_kind(self.ROM, self.create_memory, None, [self.ADDR_ID],
+                           [None], False)
+
+    def register_kind(self, kind_id, constructor, evaluator, input_ids,
+                      output_ids, sequential):
+        """Add a device kind to the kinds table.
+
+        Once registered, devices of this kind can be made with make_device
+        and are executed by the network through the evaluator. Registering
+        an existing kind again replaces it.
+        """
+        self.kinds[kind_id] = DeviceKind(kind_id, constructor, evaluator,
+                                         input_ids, output_ids, sequential)
+        self.schedule = None
+
+    def get_schedule(self):
+        """Return the devices in the order the network executes them.
+
+        The schedule is a list of (device_kind, device_ids, evaluator) for
+        the kinds that have an evaluator and devices, in the order of the
+        kinds table. It is built once and cached until a device or kind is
+        added, so set schedule to None after changing an evaluator.
+        """
+        if self.schedule is None:
+            self.schedule = [
+                (device_kind, tuple(self.kind_groups[device_kind]),
+                 kind.evaluator)
+                for device_kind, kind in self.kinds.items()
+                if self.kind_groups.get(device_kind) and
+                kind.evaluator is not None]
+        return self.schedule
 
     def get_device(self, device_id):
         """Return the Device object corresponding to device_id."""
-        for device in self.devices_list:
-            if device.device_id == device_id:
-                return device
-        return None
+        return self.device_index.get(device_id)
 
     def find_devices(self, device_kind=None):
         """Return a list of device IDs of the specified device_kind.
         Return a list of all device IDs in the network if no device_kind is
         specified.
         """
-        device_id_list = []
-        for device in self.devices_list:
-            if device_kind is None:
-                device_id_list.append(device.device_id)
-            elif device.device_kind == device_kind:
-                device_id_list.append(device.device_id)
-        return device_id_list
+        if device_kind is None:
+            return list(self.device_index)
+        return list(self.kind_groups.get(device_kind, []))
 
     def add_device(self, device_id, device_kind):
         """Add the specified device to the network."""
         new_device = Device(device_id)
         new_device.device_kind = device_kind
         self.devices_list.append(new_device)
+        self.device_index[device_id] = new_device
+        self.kind_groups.setdefault(device_kind, []).append(device_id)
+        self.schedule = None
 
     def add_input(self, device_id, input_id):
         """Add the specified input to the specified device.
@@ -212,30 +670,83 @@ class Devices:
         cycles before the clock switches state.
         """
         self.add_device(device_id, self.CLOCK)
+        self.add_output(device_id, output_id=None, signal=self.LOW)
         device = self.get_device(device_id)
         device.clock_half_period = clock_half_period
-
-        self.cold_startup()  # clock initialised to a random point in its cycle
+        device.clock_counter = 0  # see cold_startup for a random start
 
     def make_siggen(self, device_id, trace):
-        """Make a clock device with the specified half period.
-        clock_half_period is an integer > 0. It is the number of simulation
-        cycles before the clock switches state.
+        """Make a signal generator with the specified trace.
+        trace is a non-empty string or array of 0s and 1s, the output at each
+        simulation cycle, repeated. It is stored bit-packed.
         """
         device = self.get_device(device_id)
-        device.trace = trace
+        [device.trace, device.trace_length] = self.pack_trace(trace)
+        device.clock_counter = 0  # see cold_startup for a random start
+        self.add_output(device_id, output_id=None,
+                        signal=self.get_trace_bit(device, 0))
+
+    def pack_trace(self, trace):
+        """Return the bit-packed bytes and the length of a trace.
+
+        trace is a string or array of 0s and 1s. Return None if it is empty
+        or holds anything else.
+        """
+        if isinstance(trace, str):
+            bits = np.frombuffer(trace.encode(), dtype=np.uint8) - ord("0")
+        else:
+            bits = np.asarray(trace)
+        if bits.ndim != 1 or len(bits) == 0 or np.any((bits != 0) &
+                                                      (bits != 1)):
+            return None
+        packed = np.packbits(bits.astype(bool), bitorder="little")
+        return [packed.tobytes(), len(bits)]
+
+    def get_trace_bit(self, device, position):
+        """Return the signal (LOW or HIGH) of a trace at the given position."""
+        return device.trace[position >> 3] >> (position & 7) & 1
+
+    def load_trace(self, device_id, path):
+        """Set the trace of a signal generator from a file.
 
-        self.cold_startup()  # clock initialised to a random point in its cycle
+        The file is a .npy array or a text file of 0s and 1s, where white
+        space is ignored. The generator restarts from the first bit. Return
+        True if successful.
+        """
+        device = self.get_device(device_id)
+        if device is None or device.device_kind != self.SIGGEN:
+            return False
+        try:
+            if path.endswith(".npy"):
+                trace = np.load(path)
+            else:
+                with open(path, "rb") as trace_file:
+                    characters = np.frombuffer(trace_file.read(),
+                                               dtype=np.uint8)
+                trace = characters[~np.isin(characters,
+                                            np.frombuffer(b" \t\r\n",
+                                                          dtype=np.uint8))]
+                trace = trace - ord("0")
+        except (OSError, ValueError):
+            return False
+        packed_trace = self.pack_trace(trace)
+        if packed_trace is None:
+            return False
+        [device.trace, device.trace_length] = packed_trace
+        device.clock_counter = 0
+        device.outputs[None] = self.get_trace_bit(device, 0)
+        return True
 
     def make_gate(self, device_id, device_kind, no_of_inputs):
         """Make logic gates with the specified number of inputs."""
         self.add_device(device_id, device_kind)
         self.add_output(device_id, output_id=None)
 
-        for input_number in range(1, no_of_inputs + 1):
-            input_name = "".join(["I", str(input_number)])
-            [input_id] = self.names.lookup([input_name])
-            self.add_input(device_id, input_id)
+        input_names = ["".join(["I", str(input_number)])
+                       for input_number in range(1, no_of_inputs + 1)]
+        device = self.get_device(device_id)
+        for input_id in self.names.lookup(input_names):
+            device.inputs[input_id] = None
 
     def make_d_type(self, device_id):
         """Make a D-type device."""
@@ -244,32 +755,500 @@ class Devices:
             self.add_input(device_id, input_id)
         for output_id in self.dtype_output_ids:
             self.add_output(device_id, output_id)
-        self.cold_startup()  # D-type initialised to a random state
+        # see cold_startup for a random state
+        self.get_device(device_id).dtype_memory = self.LOW
+
+    def make_lut(self, device_id, no_of_inputs, table):
+        """Make a truth-table (LUT) device with the specified table.
+
+        Return True if successful, see set_lut_table.
+        """
+        self.make_gate(device_id, self.LUT, no_of_inputs)
+        return self.set_lut_table(device_id, table)
+
+    def set_lut_table(self, device_id, table):
+        """Set the truth table of the specified LUT device.
+
+        Return True if successful, see build_lut_table for the table format.
+        """
+        device = self.get_device(device_id)
+        if device is None or device.device_kind != self.LUT:
+            return False
+        lut_table = self.build_lut_table(table, len(device.inputs))
+        if lut_table is None:
+            return False
+        device.lut_table = lut_table
+        return True
+
+    def build_lut_table(self, table, no_of_inputs):
+        """Return the truth table as a NumPy array of LOW and HIGH signals.
+
+        table is a string (or sequence) of 2**no_of_inputs zeros and ones.
+        Its k-th entry is the output when the inputs, read as a binary number
+        with I1 as the least significant bit, equal k. For example, the
+        3-input majority function has table "00010111". Return None if the
+        table is invalid.
+        """
+        if isinstance(table, str):
+            if set(table) - set("01"):
+                return None
+            lut_table = np.frombuffer(table.encode(),
+                                      dtype=np.uint8) - ord("0")
+        else:
+            try:
+                lut_table = np.array(table, dtype=np.uint8)
+            except (TypeError, ValueError):
+                return None
+            if ((lut_table != self.LOW) & (lut_table != self.HIGH)).any():
+                return None
+        if lut_table.shape != (2 ** no_of_inputs,):
+            return None
+        return lut_table
+
+    def add_bus_input(self, device_id, input_id, width):
+        """Add an N-bit bus input to the specified device.
+
+        Return True if successful.
+        """
+        if not self.add_input(device_id, input_id):
+            return False
+        device = self.get_device(device_id)
+        if device.bus_widths is NO_BUS_WIDTHS:
+            device.bus_widths = {}
+        device.bus_widths[input_id] = width
+        return True
+
+    def add_bus_output(self, device_id, output_id, width, value=0):
+        """Add an N-bit bus output to the specified device.
+
+        The value of a bus output is an int between 0 and 2**width - 1.
+        Return True if successful.
+        """
+        if not self.add_output(device_id, output_id, value):
+            return False
+        device = self.get_device(device_id)
+        if device.bus_widths is NO_BUS_WIDTHS:
+            device.bus_widths = {}
+        device.bus_widths[output_id] = width
+        return True
+
+    def get_bus_width(self, device_id, port_id):
+        """Return the width of the specified bus port.
+
+        Return None if the port carries a 1-bit signal or does not exist.
+        """
+        device = self.get_device(device_id)
+        if device is None:
+            return None
+        return device.bus_widths.get(port_id)
+
+    def set_bus_width(self, device_id, width):
+        """Set the width of all the bus ports of a word-level device.
+
+        Bus values and the register state are truncated to the new width.
+        For memories, the data ports and every word are set to the new width
+        and the address width is unchanged. Return True if successful.
+        """
+        device = self.get_device(device_id)
+        if device is None:
+            return False
+        if device.device_kind not in self.bus_types + self.memory_types:
+            return False
+        if width not in range(1, self.max_bus_width + 1):
+            return False
+        if device.device_kind in self.memory_types:
+            for port_id in [None, self.DATA_ID]:
+                if port_id in device.bus_widths:
+                    device.bus_widths[port_id] = width
+            device.outputs[None] &= (1 << width) - 1
+            device.memory = self.make_memory_array(len(device.memory), width,
+                                                   device.memory)
+            return True
+        if device.device_kind == self.LFSR:
+            if width not in self.lfsr_default_taps:
+                return False
+            device.lfsr_taps = self.get_lfsr_taps_mask(
+                self.lfsr_default_taps[width])
+        mask = (1 << width) - 1
+        for port_id in device.bus_widths:
+            device.bus_widths[port_id] = width
+            if port_id in device.outputs:
+                device.outputs[port_id] &= mask
+        if device.bus_memory is not None:
+            device.bus_memory &= mask
+            if device.device_kind == self.LFSR and device.bus_memory == 0:
+                device.bus_memory = 1  # the all-zero state never changes
+        return True
+
+    def get_bus_dtype(self, width):
+        """Return the smallest unsigned NumPy type holding a bus of width."""
+        for dtype in [np.uint8, np.uint16, np.uint32, np.uint64]:
+            if width <= np.iinfo(dtype).bits:
+                return dtype
+        return None
+
+    def get_address_width(self, depth):
+        """Return the width of the address bus of a memory of depth words."""
+        return max(1, (depth - 1).bit_length())
+
+    def make_memory_array(self, depth, width, contents=None):
+        """Return a new array of depth words of the given width.
+
+        The words are copied from contents, if given, and truncated to the
+        width. Return None if contents does not hold depth integer words.
+        """
+        dtype = self.get_bus_dtype(width)
+        if contents is None:
+            return np.zeros(depth, dtype=dtype)
+        contents = np.asarray(contents)
+        if contents.shape != (depth,):
+            return None
+        if not np.issubdtype(contents.dtype, np.integer):
+            return None
+        mask = np.array((1 << width) - 1, dtype=np.uint64)
+        return (contents.astype(np.uint64) & mask).astype(dtype)
+
+    def get_lfsr_taps_mask(self, taps):
+        """Return the tap positions as a bit mask of the LFSR state."""
+        mask = 0
+        for tap in taps:
+            mask |= 1 << (tap - 1)
+        return mask
+
+    def make_register(self, device_id, width):
+        """Make an N-bit register.
+
+        The output (ID None) takes the value of the DATA bus on each rising
+        edge of CLK.
+        """
+        self.add_device(device_id, self.REGISTER)
+        self.add_input(device_id, self.CLK_ID)
+        self.add_bus_input(device_id, self.DATA_ID, width)
+        self.add_bus_output(device_id, None, width)
+        self.get_device(device_id).bus_memory = 0
+
+    def make_counter(self, device_id, width):
+        """Make an N-bit counter.
+
+        The output (ID None) is incremented, modulo 2**width, on each rising
+        edge of CLK.
+        """
+        self.add_device(device_id, self.COUNTER)
+        self.add_input(device_id, self.CLK_ID)
+        self.add_bus_output(device_id, None, width)
+        self.get_device(device_id).bus_memory = 0
+
+    def make_lfsr(self, device_id, width, taps=None):
+        """Make an N-bit linear feedback shift register.
+
+        On each rising edge of CLK, the state shifts left by one bit and the
+        XOR of the tap bits is shifted in. taps is a sequence of tap
+        positions, where tap n is bit n - 1. By default, taps giving a
+        maximal-length sequence are used.
+        """
+        if taps is None:
+            taps = self.lfsr_default_taps[width]
+        self.add_device(device_id, self.LFSR)
+        self.add_input(device_id, self.CLK_ID)
+        self.add_bus_output(device_id, None, width, 1)
+        device = self.get_device(device_id)
+        device.lfsr_taps = self.get_lfsr_taps_mask(taps)
+        device.bus_memory = 1
+
+    def make_adder(self, device_id, width):
+        """Make an N-bit adder.
+
+        The output (ID None) is A + B modulo 2**width, and COUT is HIGH when
+        the sum overflows.
+        """
+        self.add_device(device_id, self.ADDER)
+        self.add_bus_input(device_id, self.A_ID, width)
+        self.add_bus_input(device_id, self.B_ID, width)
+        self.add_bus_output(device_id, None, width)
+        self.add_output(device_id, self.COUT_ID)
+
+    def make_comparator(self, device_id, width):
+        """Make an N-bit comparator.
+
+        EQ, LT and GT are HIGH when A is equal to, less than or greater than
+        B respectively.
+        """
+        self.add_device(device_id, self.COMPARATOR)
+        self.add_bus_input(device_id, self.A_ID, width)
+        self.add_bus_input(device_id, self.B_ID, width)
+        for output_id in [self.EQ_ID, self.LT_ID, self.GT_ID]:
+            self.add_output(device_id, output_id)
+
+    def make_mux(self, device_id, width):
+        """Make an N-bit 2-to-1 multiplexer.
+
+        The output (ID None) is bus A when SEL is LOW and bus B when SEL is
+        HIGH.
+        """
+        self.add_device(device_id, self.MUX)
+        self.add_input(device_id, self.SEL_ID)
+        self.add_bus_input(device_id, self.A_ID, width)
+        self.add_bus_input(device_id, self.B_ID, width)
+        self.add_bus_output(device_id, None, width)
+
+    def make_memory(self, device_id, device_kind, depth, width):
+        """Make a RAM or ROM of depth words, each of the given width.
+
+        The output (ID None) is the word at the address on the ADDR bus. A
+        RAM also has DATA, WE and CLK inputs, and stores the DATA bus at the
+        address on each rising edge of CLK while WE is HIGH. The words are
+        held in a NumPy array and are initially zero.
+        """
+        self.add_device(device_id, device_kind)
+        if device_kind == self.RAM:
+            self.add_input(device_id, self.CLK_ID)
+            self.add_bus_input(device_id, self.DATA_ID, width)
+            self.add_input(device_id, self.WE_ID)
+        self.add_bus_input(device_id, self.ADDR_ID,
+                           self.get_address_width(depth))
+        self.add_bus_output(device_id, None, width)
+        self.get_device(device_id).memory = self.make_memory_array(depth,
+                                                                   width)
+
+    def load_memory(self, device_id, contents, mmap=False):
+        """Initialise the words of a RAM or ROM.
+
+        contents is an array or a .npy file name, which is read with
+        numpy.load. If mmap is True, the file is memory-mapped instead of
+        read, so only the words that are accessed are loaded. A mapped ROM is
+        read-only and a mapped RAM is copy-on-write, so the file is never
+        changed. The words must be unsigned and fit the width to be mapped.
+        Return True if successful.
+        """
+        device = self.get_device(device_id)
+        if device is None or device.device_kind not in self.memory_types:
+            return False
+        width = device.bus_widths[None]
+        if isinstance(contents, str):
+            try:
+                if mmap:
+                    mode = "r" if device.device_kind == self.ROM else "c"
+                    contents = np.load(contents, mmap_mode=mode)
+                else:
+                    contents = np.load(contents)
+            except (OSError, ValueError):
+                return False
+        if mmap:
+            if (contents.shape != device.memory.shape or
+                    contents.dtype.kind != "u" or
+                    contents.dtype.itemsize >
+                    np.dtype(self.get_bus_dtype(width)).itemsize):
+                return False
+            device.memory = contents
+        else:
+            memory = self.make_memory_array(len(device.memory), width,
+                                            contents)
+            if memory is None:
+                return False
+            device.memory = memory
+        return True
+
+    def set_memory_depth(self, device_id, depth):
+        """Set the number of words of a RAM or ROM.
+
+        The address bus is resized to fit and the words are cleared. Return
+        True if successful.
+        """
+        device = self.get_device(device_id)
+        if device is None or device.device_kind not in self.memory_types:
+            return False
+        if depth not in range(1, self.max_memory_depth + 1):
+            return False
+        device.bus_widths[self.ADDR_ID] = self.get_address_width(depth)
+        device.memory = self.make_memory_array(depth,
+                                               device.bus_widths[None])
+        return True
+
+    def cold_startup(self, generator=None):
+        """Simulate cold start-up of D-types, clocks and registers.
+        Set the memory of the D-types and word-level registers, counters and
+        LFSRs to a random state and make the clocks and signal generators
+        begin from a random point in their cycles. Devices are made in a
+        fixed reset state, so this is called once, after the network is
+        built.
+
+        generator is a NumPy Generator, a random.Random() instance or an
+        integer seed; the same seed always gives the same start-up state. A
+        fresh, unseeded generator is used if none is given.
+        """
+        if isinstance(generator, random.Random):
+            generator = np.random.default_rng(generator.getrandbits(128))
+        elif not isinstance(generator, np.random.Generator):
+            generator = np.random.default_rng(generator)
+
+        # Draw the state of every device of a kind at once
+        d_types = [self.device_index[device_id] for device_id in
+                   self.kind_groups.get(self.D_TYPE, [])]
+        for device, memory in zip(d_types, generator.integers(
+                0, 2, len(d_types)).tolist()):
+            device.dtype_memory = memory
+
+        clocks = [self.device_index[device_id] for device_id in
+                  self.kind_groups.get(self.CLOCK, [])]
+        half_periods = np.array([device.clock_half_period
+                                 for device in clocks], dtype=np.int64)
+        levels = generator.integers(0, 2, len(clocks)).tolist()
+        counters = generator.integers(0, half_periods).tolist()
+        for device, level, counter in zip(clocks, levels, counters):
+            device.outputs[None] = level
+            device.clock_counter = counter
+
+        siggens = [self.device_index[device_id] for device_id in
+                   self.kind_groups.get(self.SIGGEN, [])]
+        lengths = np.array([device.trace_length for device in siggens],
+                           dtype=np.int64)
+        for device, counter in zip(siggens, generator.integers(
+                0, lengths).tolist()):
+            device.clock_counter = counter
+            device.outputs[None] = self.get_trace_bit(device, counter)
+
+        for device_kind in [self.REGISTER, self.COUNTER, self.LFSR]:
+            for device_id in self.kind_groups.get(device_kind, []):
+                device = self.device_index[device_id]
+                top = (1 << device.bus_widths[None]) - 1
+                # an LFSR must not start in the all-zero state
+                bottom = 1 if device_kind == self.LFSR else 0
+                device.bus_memory = int(generator.integers(
+                    bottom, top, endpoint=True, dtype=np.uint64))
+                device.outputs[None] = device.bus_memory
+
+    def create_switch(self, device_id, device_kind, device_property):
+        """Check the property and make a switch.
+
+        The property is the switch initial state: 0 (LOW) or 1 (HIGH). Return
+        self.NO_ERROR if successful, or the corresponding error if not.
+        """
+        if device_property is None:
+            return self.NO_QUALIFIER
+        elif device_property not in [self.LOW, self.HIGH]:
+            return self.INVALID_QUALIFIER
+        self.make_switch(device_id, device_property)
+        return self.NO_ERROR
+
+    def create_clock(self, device_id, device_kind, device_property):
+        """Check the property and make a clock.
+
+        The property is the clock half period > 0. Return self.NO_ERROR if
+        successful, or the corresponding error if not.
+        """
+        if device_property is None:
+            return self.NO_QUALIFIER
+        elif device_property <= 0:
+            return self.INVALID_QUALIFIER
+        self.make_clock(device_id, device_property)
+        return self.NO_ERROR
+
+    def create_siggen(self, device_id, device_kind, device_property):
+        """Check the property and make a signal generator.
+
+        The property is the trace: a non-empty string of 0s and 1s. Return
+        self.NO_ERROR if successful, or the corresponding error if not.
+        """
+        if device_property is None:
+            return self.NO_QUALIFIER
+        elif (not isinstance(device_property, str) or
+              self.pack_trace(device_property) is None):
+            return self.INVALID_QUALIFIER
+        self.add_device(device_id, self.SIGGEN)
+        self.make_siggen(device_id, device_property)
+        return self.NO_ERROR
+
+    def create_gate(self, device_id, device_kind, device_property):
+        """Check the property and make a logic gate.
+
+        The property is the number of inputs, between 1 and 16. XOR gates
+        always have 2 inputs and take no property. Return self.NO_ERROR if
+        successful, or the corresponding error if not.
+        """
+        if device_kind == self.XOR:
+            if device_property is not None:
+                return self.QUALIFIER_PRESENT
+            self.make_gate(device_id, device_kind, 2)
+            return self.NO_ERROR
+
+        if device_property is None:
+            return self.NO_QUALIFIER
+        elif device_property not in range(1, self.max_gate_inputs + 1):
+            return self.INVALID_QUALIFIER
+        self.make_gate(device_id, device_kind, device_property)
+        return self.NO_ERROR
 
-    def cold_startup(self):
-        """Simulate cold start-up of D-types and clocks.
-        Set the memory of the D-types to a random state and make the clocks
-        begin from a random point in their cycles.
+    def create_d_type(self, device_id, device_kind, device_property):
+        """Make a D-type, which takes no property.
+
+        Return self.NO_ERROR if successful, or the corresponding error if not.
+        """
+        if device_property is not None:
+            return self.QUALIFIER_PRESENT
+        self.make_d_type(device_id)
+        return self.NO_ERROR
+
+    def create_lut(self, device_id, device_kind, device_property):
+        """Check the property and make a truth-table (LUT) device.
+
+        The property is a (number of inputs, table) pair, with between 1 and
+        16 inputs, see set_lut_table. Return self.NO_ERROR if successful, or
+        the corresponding error if not.
         """
-        for device in self.devices_list:
-            if device.device_kind == self.D_TYPE:
-                device.dtype_memory = random.choice([self.LOW, self.HIGH])
+        if device_property is None:
+            return self.NO_QUALIFIER
+        try:
+            no_of_inputs, table = device_property
+        except (TypeError, ValueError):
+            return self.INVALID_QUALIFIER
+        if no_of_inputs not in range(1, self.max_gate_inputs + 1):
+            return self.INVALID_QUALIFIER
+        elif self.build_lut_table(table, no_of_inputs) is None:
+            return self.INVALID_QUALIFIER
+        self.make_lut(device_id, no_of_inputs, table)
+        return self.NO_ERROR
 
-            elif device.device_kind == self.CLOCK:
-                clock_signal = random.choice([self.LOW, self.HIGH])
-                self.add_output(device.device_id, output_id=None,
-                                signal=clock_signal)
-                # Initialise it to a random point in its cycle.
-                device.clock_counter = \
-                    random.randrange(device.clock_half_period)
+    def create_bus_device(self, device_id, device_kind, device_property):
+        """Check the property and make a word-level device.
 
-            elif device.device_kind == self.SIGGEN:
-                device.clock_counter = \
-                    random.randrange(len(device.trace))
+        The property is the bus width, between 1 and 64. LFSRs are limited
+        to the widths with default taps, between 2 and 32. Return
+        self.NO_ERROR if successful, or the corresponding error if not.
+        """
+        makers = {self.REGISTER: self.make_register,
+                  self.COUNTER: self.make_counter,
+                  self.LFSR: self.make_lfsr,
+                  self.ADDER: self.make_adder,
+                  self.COMPARATOR: self.make_comparator,
+                  self.MUX: self.make_mux}
+        if device_property is None:
+            return self.NO_QUALIFIER
+        elif device_property not in range(1, self.max_bus_width + 1):
+            return self.INVALID_QUALIFIER
+        elif (device_kind == self.LFSR and
+              device_property not in self.lfsr_default_taps):
+            return self.INVALID_QUALIFIER
+        makers[device_kind](device_id, device_property)
+        return self.NO_ERROR
+
+    def create_memory(self, device_id, device_kind, device_property):
+        """Check the property and make a RAM or ROM.
 
-                signal = int(device.trace[device.clock_counter])
-                self.add_output(device.device_id, output_id=None,
-                                signal=signal)
+        The property is (depth, width), for depth words of width bits.
+        Return self.NO_ERROR if successful, or the corresponding error if not.
+        """
+        if device_property is None:
+            return self.NO_QUALIFIER
+        try:
+            depth, width = device_property
+        except (TypeError, ValueError):
+            return self.INVALID_QUALIFIER
+        if depth not in range(1, self.max_memory_depth + 1):
+            return self.INVALID_QUALIFIER
+        if width not in range(1, self.max_bus_width + 1):
+            return self.INVALID_QUALIFIER
+        self.make_memory(device_id, device_kind, depth, width)
+        return self.NO_ERROR
 
     def make_device(self, device_id, device_kind, device_property=None):
         """Create the specified device.
@@ -279,51 +1258,143 @@ class Devices:
         if self.get_device(device_id) is not None:
             error_type = self.DEVICE_PRESENT
 
-        elif device_kind == self.SWITCH:
-            # Device property is the switch initial state: 0(LOW) or 1(HIGH)
-            if device_property is None:
-                error_type = self.NO_QUALIFIER
-            elif device_property not in [self.LOW, self.HIGH]:
-                error_type = self.INVALID_QUALIFIER
-            else:
-                self.make_switch(device_id, device_property)
-                error_type = self.NO_ERROR
-
-        elif device_kind == self.CLOCK:
-            # Device property is the clock half period > 0
-            if device_property is None:
-                error_type = self.NO_QUALIFIER
-            elif device_property <= 0:
-                error_type = self.INVALID_QUALIFIER
-            else:
-                self.make_clock(device_id, device_property)
-                error_type = self.NO_ERROR
-
-        elif device_kind in self.gate_types:
-            # Device property is the number of inputs
-            if device_kind == self.XOR:
-                if device_property is not None:
-                    error_type = self.QUALIFIER_PRESENT
-                else:
-                    self.make_gate(device_id, device_kind, 2)
-                    error_type = self.NO_ERROR
-            else:  # other gates
-                if device_property is None:
-                    error_type = self.NO_QUALIFIER
-                elif device_property not in range(1, 17):  # between 1 and 16
-                    error_type = self.INVALID_QUALIFIER
-                else:
-                    self.make_gate(device_id, device_kind, device_property)
-                    error_type = self.NO_ERROR
-
-        elif device_kind == self.D_TYPE:
-            if device_property is not None:
-                error_type = self.QUALIFIER_PRESENT
-            else:
-                self.make_d_type(device_id)
-                error_type = self.NO_ERROR
+        elif device_kind in self.kinds:
+            constructor = self.kinds[device_kind].constructor
+            error_type = constructor(device_id, device_kind, device_property)
 
         else:
             error_type = self.BAD_DEVICE
 
         return error_type
+
+    def make_devices(self, device_list):
+        """Create the devices in device_list.
+
+        device_list is an iterable of (device_id, device_kind,
+        device_property) tuples, as taken by make_device. The IDs and kinds
+        are checked in one pass before any device is made, and the devices
+        that pass are then made. Return a list of (position, error) pairs for
+        the devices that could not be made, which is empty if all were.
+        """
+        device_list = list(device_list)
+        errors = []
+        # Check for devices already present or repeated in device_list
+        seen_ids = set(self.device_index)
+        valid_positions = []
+        for position, (device_id, device_kind, _) in enumerate(device_list):
+            if device_id in seen_ids:
+                errors.append((position, self.DEVICE_PRESENT))
+            elif device_kind not in self.kinds:
+                errors.append((position, self.BAD_DEVICE))
+            else:
+                seen_ids.add(device_id)
+                valid_positions.append(position)
+
+        for position in valid_positions:
+            (device_id, device_kind, device_property) = device_list[position]
+            constructor = self.kinds[device_kind].constructor
+            error_type = constructor(device_id, device_kind, device_property)
+            if error_type != self.NO_ERROR:
+                errors.append((position, error_type))
+        errors.sort()
+        return errors
+
+    def pack(self):
+        """Move the ports and state of the devices into arrays.
+
+        self.arrays is set to a DeviceArrays of the devices and every device
+        is replaced by a PackedDevice whose inputs, outputs, dtype_memory and
+        clock_counter read and write the arrays, so get_arrays then returns
+        the arrays themselves and vectorized engines can use the state of
+        the network without copying it. The ports of a packed device are
+        fixed, so the netlist must be complete before packing. Return True
+        if successful, or False if the devices are already packed.
+        """
+        if self.arrays is not None:
+            return False
+        self.arrays = self.make_arrays()
+        for index, device in enumerate(self.devices_list):
+            packed_device = PackedDevice(device, self, index)
+            self.devices_list[index] = packed_device
+            self.device_index[device.device_id] = packed_device
+        return True
+
+    def get_arrays(self):
+        """Return the devices as a DeviceArrays of NumPy arrays.
+
+        dtype_memory and clock_counters are -1 for devices without them. If
+        the devices are packed (see pack), the arrays are returned as they
+        are stored, so they follow the network and writing them changes the
+        devices. Otherwise they are a snapshot of the current state.
+        """
+        if self.arrays is not None:
+            return self.arrays
+        return self.make_arrays()
+
+    def make_arrays(self):
+        """Return a DeviceArrays holding a copy of the devices."""
+        device_count = len(self.devices_list)
+        device_ids = np.empty(device_count, dtype=np.int64)
+        kinds = np.empty(device_count, dtype=np.int64)
+        dtype_memory = np.full(device_count, -1, dtype=np.int8)
+        clock_counters = np.full(device_count, -1, dtype=np.int64)
+        output_offsets = np.zeros(device_count + 1, dtype=np.int64)
+        input_offsets = np.zeros(device_count + 1, dtype=np.int64)
+        output_ports = []
+        output_signals = []
+        input_ports = []
+        input_sources = []
+        signal_index = {}  # {(device_id, output_id): output array index}
+        for index, device in enumerate(self.devices_list):
+            device_ids[index] = device.device_id
+            kinds[index] = device.device_kind
+            if device.dtype_memory is not None:
+                dtype_memory[index] = device.dtype_memory
+            if device.clock_counter is not None:
+                clock_counters[index] = device.clock_counter
+            for output_id, signal in device.outputs.items():
+                signal_index[(device.device_id, output_id)] = len(
+                    output_ports)
+                output_ports.append(-1 if output_id is None else output_id)
+                output_signals.append(signal)
+            for input_id, source in device.inputs.items():
+                input_ports.append(-1 if input_id is None else input_id)
+                input_sources.append(source)
+            output_offsets[index + 1] = len(output_ports)
+            input_offsets[index + 1] = len(input_ports)
+        input_drivers = np.array([-1 if source is None else
+                                  signal_index[source]
+                                  for source in input_sources],
+                                 dtype=np.int64)
+        return DeviceArrays(
+            device_ids, kinds, dtype_memory, clock_counters, output_offsets,
+            np.array(output_ports, dtype=np.int64),
+            np.array(output_signals, dtype=np.uint64), input_offsets,
+            np.array(input_ports, dtype=np.int64), input_drivers)
+
+    def fork(self):
+        """Return a copy of the devices that shares the netlist.
+
+        The names, the error codes and every device's connections are shared
+        with the original, so the netlist must be complete before forking.
+        Only the mutable device state is copied, which for packed devices is
+        the dtype_memory, clock_counters and output_signals arrays.
+        """
+        forked_devices = copy.copy(self)
+        if self.arrays is not None:
+            forked_devices.arrays = self.arrays._replace(
+                dtype_memory=self.arrays.dtype_memory.copy(),
+                clock_counters=self.arrays.clock_counters.copy(),
+                output_signals=self.arrays.output_signals.copy())
+            forked_devices.devices_list = [device.fork(forked_devices)
+                                           for device in self.devices_list]
+        else:
+            forked_devices.devices_list = [device.fork()
+                                           for device in self.devices_list]
+        forked_devices.device_index = {device.device_id: device
+                                       for device in
+                                       forked_devices.devices_list}
+        forked_devices.kind_groups = {
+            device_kind: list(device_ids)
+            for device_kind, device_ids in self.kind_groups.items()}
+        return forked_devices
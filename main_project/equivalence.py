@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""Check that two circuit definition files describe equivalent circuits.
+
+Used in the Logic Simulator project to check, by simulation, that a circuit
+behaves the same as a reference circuit, for example after it has been
+rewritten with different gates.
+
+Usage
+-----
+python -m main_project.equivalence [-e] [-n vectors] [-c cycles] [-s seed]
+                                   <first file> <second file>
+
+Functions
+---------
+load_circuit - returns the monitors of the circuit in a definition file.
+
+Classes
+-------
+Equivalence - compares two circuits on random or exhaustive stimulus.
+"""
+import contextlib
+import getopt
+import io
+import random
+import sys
+import time
+
+import numpy as np
+
+from main_project.names import Names
+from main_project.devices import Devices
+from main_project.network import Network
+from main_project.monitors import Monitors
+from main_project.scanner import Scanner
+from main_project.parse import Parser
+from main_project.bitparallel import BitParallel
+
+
+def load_circuit(path):
+    """Return the monitors of the circuit in a definition file.
+
+    The devices, network and names are available from the returned
+    monitors.Monitors() instance. Return None if the file has errors.
+    """
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    monitors = Monitors(names, devices, network)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scanner = Scanner(path, names)
+        parser = Parser(names, devices, network, monitors, scanner)
+        parser.parse_network()
+    if scanner.total_errors:
+        return None
+    return monitors
+
+
+class Equivalence:
+
+    """Compare two circuits on random or exhaustive stimulus.
+
+    The switches of the two circuits are matched by name, as are the
+    monitored signals, and both circuits are driven by the same switch values
+    from the state their devices are in, as made by the parser (see
+    bitparallel.BitParallel.reset). Each
+    vector is one sequence of switch values over a number of cycles, and
+    lanes vectors are simulated at once, so a check runs at millions of
+    vectors per second on small circuits. The monitored signals are compared
+    after every cycle. A check is inconclusive if either circuit does not
+    settle.
+
+    Parameters
+    ----------
+    first_monitors: instance of the monitors.Monitors() class of the first
+                    circuit.
+    second_monitors: instance of the monitors.Monitors() class of the second
+                     circuit.
+    lanes: number of vectors simulated at once.
+
+    Public methods
+    --------------
+    match_signals(self): Returns the error code of matching the switches and
+                         monitors of the circuits by name.
+
+    compare(self, patterns, lanes_mask): Simulates both circuits on the given
+                                   switch values and returns the first
+                                   mismatch.
+
+    check_random(self, vectors, cycles=1, seed=None): Compares the circuits
+                                   on random vectors.
+
+    check_exhaustive(self, cycles=1): Compares the circuits on every
+                                   combination of switch values, each held
+                                   for the given number of cycles.
+    """
+
+    def __init__(self, first_monitors, second_monitors, lanes=65536):
+        """Compile both circuits and match their signals."""
+        self.names = first_monitors.names
+        [self.NO_ERROR, self.SWITCHES_DIFFER, self.MONITORS_DIFFER,
+         self.NO_MONITORS] = self.names.unique_error_codes(4)
+        self.circuits = [first_monitors, second_monitors]
+        self.lanes = lanes
+        self.engines = [BitParallel(monitors.devices, lanes)
+                        for monitors in self.circuits]
+        self.error_code = self.match_signals()
+
+    def match_signals(self):
+        """Match the switches and monitors of the circuits by name.
+
+        Set switch_names, the names of the switches, and monitor_names, the
+        names of the monitored signals. Both circuits must have the same
+        switches and monitor the same signals. Return self.NO_ERROR if
+        successful, or the corresponding error if not.
+        """
+        switches = []  # [{name: device_id}] for each circuit
+        monitors = []  # [{name: (device_id, output_id)}] for each circuit
+        for circuit in self.circuits:
+            devices = circuit.devices
+            switches.append({devices.names.get_name_string(device_id):
+                             device_id for device_id in
+                             devices.find_devices(devices.SWITCH)})
+            monitors.append({devices.get_signal_name(*signal): signal
+                             for signal in circuit.monitor_rows})
+        self.switch_ids = switches
+        self.monitor_ids = monitors
+        self.switch_names = sorted(switches[0])
+        self.monitor_names = sorted(set(monitors[0]) & set(monitors[1]))
+        if set(switches[0]) != set(switches[1]):
+            return self.SWITCHES_DIFFER
+        if set(monitors[0]) != set(monitors[1]):
+            return self.MONITORS_DIFFER
+        if not self.monitor_names:
+            return self.NO_MONITORS
+        return self.NO_ERROR
+
+    def compare(self, patterns, lanes_mask):
+        """Simulate both circuits on the given switch values.
+
+        patterns[cycle][i] holds the values of switch switch_names[i] at the
+        cycle in every lane, and only the lanes in lanes_mask are compared.
+        Return None if the monitored signals agree, a list of [cycle, signal
+        name, lane, first value, second value] for the first mismatch, or
+        [cycle, None, circuit, None, None] if circuit 0 or 1 does not settle
+        at the cycle in some lane.
+        """
+        for engine in self.engines:
+            engine.reset()
+        for cycle, values in enumerate(patterns):
+            for circuit, (engine, switch_ids) in enumerate(
+                    zip(self.engines, self.switch_ids)):
+                for name, value in zip(self.switch_names, values):
+                    engine.set_switch(switch_ids[name], value)
+                if not engine.step():
+                    return [cycle, None, circuit, None, None]
+            [first, second] = self.engines
+            for name in self.monitor_names:
+                difference = (first.get_signal(*self.monitor_ids[0][name]) ^
+                              second.get_signal(*self.monitor_ids[1][name]))
+                difference &= lanes_mask
+                if difference:
+                    lane = (difference & -difference).bit_length() - 1
+                    first_value = first.get_signal(
+                        *self.monitor_ids[0][name]) >> lane & 1
+                    return [cycle, name, lane, first_value, 1 - first_value]
+        return None
+
+    def get_result(self, vectors, patterns=None, mismatch=None):
+        """Return the result of a check as a dictionary.
+
+        The dictionary holds whether the circuits are equivalent, the number
+        of vectors compared and, for a mismatch, its cycle, the signal name,
+        the values of the signal in both circuits and the switch values at
+        each cycle up to the mismatch. If a circuit does not settle, the
+        check is inconclusive: equivalent is None and the dictionary holds
+        the cycle and the number (1 or 2) of the oscillating circuit.
+        """
+        result = {"equivalent": mismatch is None, "vectors": vectors}
+        if mismatch is not None and mismatch[1] is None:
+            result["equivalent"] = None
+            result["cycle"] = mismatch[0]
+            result["oscillating"] = mismatch[2] + 1
+        elif mismatch is not None:
+            [cycle, name, lane, first_value, second_value] = mismatch
+            result["cycle"] = cycle
+            result["signal"] = name
+            result["values"] = (first_value, second_value)
+            result["pattern"] = {
+                switch_name: [values[i] >> lane & 1
+                              for values in patterns[:cycle + 1]]
+                for i, switch_name in enumerate(self.switch_names)}
+        return result
+
+    def check_random(self, vectors, cycles=1, seed=None):
+        """Compare the circuits on random vectors.
+
+        Each vector sets every switch to a random value at each of the
+        cycles. Return the result dictionary (see get_result), or None if the
+        signals of the circuits do not match.
+        """
+        if self.error_code != self.NO_ERROR:
+            return None
+        generator = random.Random(seed)
+        done = 0
+        while done < vectors:
+            batch = min(self.lanes, vectors - done)
+            patterns = [[generator.getrandbits(self.lanes)
+                         for name in self.switch_names]
+                        for cycle in range(cycles)]
+            mismatch = self.compare(patterns, (1 << batch) - 1)
+            if mismatch is not None and mismatch[1] is None:
+                return self.get_result(done, mismatch=mismatch)
+            if mismatch is not None:
+                return self.get_result(done + mismatch[2] + 1, patterns,
+                                       mismatch)
+            done += batch
+        return self.get_result(done)
+
+    def check_exhaustive(self, cycles=1):
+        """Compare the circuits on every combination of switch values.
+
+        Each combination is held for the given number of cycles. Return the
+        result dictionary (see get_result), or None if the signals of the
+        circuits do not match. Raise ValueError for 64 switches or more,
+        whose combinations cannot be counted in 64 bits (nor checked in
+        practice).
+        """
+        if self.error_code != self.NO_ERROR:
+            return None
+        if len(self.switch_names) >= 64:
+            raise ValueError("Too many switches for an exhaustive check.")
+        engine = self.engines[0]
+        vectors = 1 << len(self.switch_names)
+        for start in range(0, vectors, self.lanes):
+            batch = min(self.lanes, vectors - start)
+            combinations = np.arange(start, start + self.lanes,
+                                     dtype=np.uint64)
+            values = [engine.get_lanes_mask((combinations >> np.uint64(i)) &
+                                            np.uint64(1))
+                      for i in range(len(self.switch_names))]
+            patterns = [values] * cycles
+            mismatch = self.compare(patterns, (1 << batch) - 1)
+            if mismatch is not None and mismatch[1] is None:
+                return self.get_result(start, mismatch=mismatch)
+            if mismatch is not None:
+                return self.get_result(start + mismatch[2] + 1, patterns,
+                                       mismatch)
+        return self.get_result(vectors)
+
+
+def main(arg_list):
+    """Compare the two definition files given on the command line."""
+    usage_message = ("Usage:\n"
+                     "python -m main_project.equivalence [-e] [-n vectors] "
+                     "[-c cycles] [-s seed] <first file> <second file>")
+    try:
+        options, arguments = getopt.getopt(arg_list, "hen:c:s:")
+    except getopt.GetoptError:
+        print("Error: invalid command line arguments\n")
+        print(usage_message)
+        return 2
+
+    exhaustive = False
+    vectors = 1 << 20
+    cycles = 1
+    seed = None
+    for option, value in options:
+        if option == "-h":
+            print(usage_message)
+            return 0
+        elif option == "-e":
+            exhaustive = True
+        elif option == "-n":
+            vectors = int(value)
+        elif option == "-c":
+            cycles = int(value)
+        elif option == "-s":
+            seed = int(value)
+    if len(arguments) != 2:
+        print("Error: two file paths required\n")
+        print(usage_message)
+        return 2
+
+    circuits = []
+    for path in arguments:
+        monitors = load_circuit(path)
+        if monitors is None:
+            print("Error: could not parse {}".format(path))
+            return 2
+        circuits.append(monitors)
+    try:
+        equivalence = Equivalence(*circuits)
+    except ValueError as error:
+        print("Error: {}".format(error))
+        return 2
+    if equivalence.error_code == equivalence.SWITCHES_DIFFER:
+        print("Error: the circuits have different switches")
+        return 2
+    if equivalence.error_code == equivalence.MONITORS_DIFFER:
+        print("Error: the circuits monitor different signals")
+        return 2
+    if equivalence.error_code == equivalence.NO_MONITORS:
+        print("Error: the circuits have no monitored signals")
+        return 2
+
+    start_time = time.perf_counter()
+    try:
+        if exhaustive:
+            result = equivalence.check_exhaustive(cycles)
+        else:
+            result = equivalence.check_random(vectors, cycles, seed)
+    except ValueError as error:
+        print("Error: {}".format(error))
+        return 2
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+    print("{} vectors of {} cycles in {:.3f} s ({:.3g} vectors/s)".format(
+        result["vectors"], cycles, elapsed, result["vectors"] / elapsed))
+    if result["equivalent"] is None:
+        print("Error: circuit {} does not settle at cycle {}".format(
+            result["oscillating"], result["cycle"]))
+        return 2
+    if result["equivalent"]:
+        print("Equivalent on all monitored signals: {}".format(
+            ", ".join(equivalence.monitor_names)))
+        return 0
+    print("Mismatch on {} at cycle {}: {} != {}".format(
+        result["signal"], result["cycle"], *result["values"]))
+    for name, values in result["pattern"].items():
+        print("{:>10}: {}".format(name, "".join(str(v) for v in values)))
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
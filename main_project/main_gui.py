@@ -20,6 +20,7 @@ import random
 import subprocess
 from multiprocessing import Process
 import os
+import threading
 
 from main_project.names import Names
 from main_project.devices import Devices
@@ -71,6 +72,11 @@ class CircuitDiagram(wx.Panel):
             "QBAR": (self.device_size[0] - 5, self.device_size[0]*2/3)
         }
 
+        # The diagram stores the position and bitmap of each device as
+        # {device_id: [x, y]} and {device_id: wx.StaticBitmap}
+        self.locations = {}
+        self.images = {}
+
         self.Buffer = None
 
         self.Bind(wx.EVT_PAINT, self.OnPaint)
@@ -107,20 +113,20 @@ class CircuitDiagram(wx.Panel):
         dc.SetPen(wx.Pen("black", 2))
         dc.Clear()
         # --------- DRAW BITMAPS --------- #
-        tmp = self.devices.devices_list
+        tmp = list(self.devices.devices_list)
         random.shuffle(tmp)
         for i, device in enumerate(tmp):
             device_type = self.names.get_name_string(device.device_kind)
 
-            if hasattr(device, 'location'):
-                device.image.SetPosition(
-                    (device.location[0], device.location[1]))
+            if device.device_id in self.locations:
+                self.images[device.device_id].SetPosition(
+                    tuple(self.locations[device.device_id]))
             else:
                 if device_type in ['SWITCH', 'CLOCK', 'SIGGEN']:
                     x, y = 50, (i+1)*50
                 else:
                     x, y = random.randint(150, 400), (i+1)*50
-                device.location = [x, y]
+                self.locations[device.device_id] = [x, y]
 
                 if device.device_kind == self.devices.D_TYPE:
                     bitmap = scale_bitmap(
@@ -132,8 +138,9 @@ class CircuitDiagram(wx.Panel):
                     bitmap = scale_bitmap(
                         self.icons[device_type], self.device_size[0], self.device_size[1])
 
-                device.image = wx.StaticBitmap(self, -1, bitmap)
-                device.image.SetPosition((x, y))
+                image = wx.StaticBitmap(self, -1, bitmap)
+                image.SetPosition((x, y))
+                self.images[device.device_id] = image
 
         # ----------- DRAW LINES ----------- #
         for device in self.devices.devices_list:        # device with inputs
@@ -158,18 +165,20 @@ class CircuitDiagram(wx.Panel):
                     device.device_id, input_)
                 new_device = self.devices.get_device(
                     out[0])
+                location = self.locations[device.device_id]
+                new_location = self.locations[new_device.device_id]
                 if out[1] is None:
                     if new_device.device_kind in [self.devices.CLOCK, self.devices.SIGGEN]:
-                        dc.DrawLine(device.location[0]+xo, device.location[1] + yo, new_device.location[0] +
-                                    self.device_size[1]-5, new_device.location[1] + self.device_size[1]/2)
+                        dc.DrawLine(location[0]+xo, location[1] + yo, new_location[0] +
+                                    self.device_size[1]-5, new_location[1] + self.device_size[1]/2)
                     else:
-                        dc.DrawLine(device.location[0]+xo, device.location[1] + yo, new_device.location[0] +
-                                    self.device_size[0]-5, new_device.location[1] + self.device_size[1]/2)
+                        dc.DrawLine(location[0]+xo, location[1] + yo, new_location[0] +
+                                    self.device_size[0]-5, new_location[1] + self.device_size[1]/2)
                 else:  # it's a dtype output
                     (x1, y1) = self.dtype_posns[self.names.get_name_string(
                         out[1])]
-                    dc.DrawLine(device.location[0]+xo, device.location[1] + yo, new_device.location[0] +
-                                x1, new_device.location[1] + y1)
+                    dc.DrawLine(location[0]+xo, location[1] + yo, new_location[0] +
+                                x1, new_location[1] + y1)
 
 
 class Gui(wx.Frame):        # main options screen
@@ -182,6 +191,12 @@ class Gui(wx.Frame):        # main options screen
         self.SetIcon(wx.Icon('./main_project/.GUI/CUED Software.png'))
         self.Maximize(True)
         self.SetBackgroundColour((186, 211, 255))
+        self.SimulateWindow = None
+        # The options store their buttons as
+        # {(device_id, output_id): wx.ToggleButton} and
+        # {device_id: wx.ToggleButton}
+        self.monitor_btns = {}
+        self.switch_btns = {}
         self.header_font = wx.Font(
             25, wx.FONTFAMILY_SWISS, wx.NORMAL, wx.FONTWEIGHT_BOLD, False)
         self.label_font = wx.Font(
@@ -338,6 +353,8 @@ class Gui(wx.Frame):        # main options screen
                             wx.EXPAND | wx.ALL, 0)
 
             # ---------------- TABLE --------------- #
+            self.monitor_btns = {}
+            self.switch_btns = {}
             for device in self.devices.devices_list:
 
                 name = self.devices.names.get_name_string(device.device_id)
@@ -368,52 +385,57 @@ class Gui(wx.Frame):        # main options screen
                 # MONITOR OPTIONS
                 # TODO: make them do somwthing
                 if device.device_kind == self.devices.D_TYPE:
-                    device.monitor_btn = wx.ToggleButton(
+                    monitor_btn = wx.ToggleButton(
                         self.middle_panel, label="monitor {}.Q".format(name))
-                    device.monitor_btn_bar = wx.ToggleButton(
+                    monitor_btn_bar = wx.ToggleButton(
                         self.middle_panel, label="monitor {}.QBAR".format(name))
-                    device.monitor_btn.Bind(
+                    self.monitor_btns[(device.device_id,
+                                       self.devices.Q_ID)] = monitor_btn
+                    self.monitor_btns[(device.device_id,
+                                       self.devices.QBAR_ID)] = monitor_btn_bar
+                    monitor_btn.Bind(
                         wx.EVT_TOGGLEBUTTON, self.OnToggleClick)
 
-                    device.monitor_btn.SetForegroundColour('white')
-                    device.monitor_btn_bar.Bind(
+                    monitor_btn.SetForegroundColour('white')
+                    monitor_btn_bar.Bind(
                         wx.EVT_TOGGLEBUTTON, self.OnToggleClick)
-                    device.monitor_btn_bar.SetForegroundColour('white')
+                    monitor_btn_bar.SetForegroundColour('white')
 
                     row = wx.BoxSizer(wx.VERTICAL)
-                    row.Add(device.monitor_btn, 1,
+                    row.Add(monitor_btn, 1,
                             wx.ALL | wx.ALIGN_CENTER | wx.ALIGN_CENTER_VERTICAL, 5)
-                    row.Add(device.monitor_btn_bar, 1,
+                    row.Add(monitor_btn_bar, 1,
                             wx.ALL | wx.ALIGN_CENTER | wx.ALIGN_CENTER_VERTICAL, 5)
 
                     if name+'.Q' in self.monitors.get_signal_names()[0]:
-                        device.monitor_btn.SetValue(True)
-                        device.monitor_btn.SetBackgroundColour('#3ac10d')
+                        monitor_btn.SetValue(True)
+                        monitor_btn.SetBackgroundColour('#3ac10d')
                     else:
-                        device.monitor_btn.SetBackgroundColour('#e0473a')
+                        monitor_btn.SetBackgroundColour('#e0473a')
 
                     if name+'.QBAR' in self.monitors.get_signal_names()[0]:
-                        device.monitor_btn_bar.SetValue(True)
-                        device.monitor_btn_bar.SetBackgroundColour('#3ac10d')
+                        monitor_btn_bar.SetValue(True)
+                        monitor_btn_bar.SetBackgroundColour('#3ac10d')
                     else:
-                        device.monitor_btn_bar.SetBackgroundColour('#e0473a')
+                        monitor_btn_bar.SetBackgroundColour('#e0473a')
 
                     device_info.Add(row, 1,
                                     wx.ALL | wx.ALIGN_CENTER | wx.ALIGN_CENTER_VERTICAL, 5)
                 else:
-                    device.monitor_btn = wx.ToggleButton(
+                    monitor_btn = wx.ToggleButton(
                         self.middle_panel, label="monitor {}".format(name))
-                    device.monitor_btn.Bind(
+                    self.monitor_btns[(device.device_id, None)] = monitor_btn
+                    monitor_btn.Bind(
                         wx.EVT_TOGGLEBUTTON, self.OnToggleClick)
-                    device.monitor_btn.SetForegroundColour('white')
+                    monitor_btn.SetForegroundColour('white')
 
                     if name in self.monitors.get_signal_names()[0]:
-                        device.monitor_btn.SetValue(True)
-                        device.monitor_btn.SetBackgroundColour('#3ac10d')
+                        monitor_btn.SetValue(True)
+                        monitor_btn.SetBackgroundColour('#3ac10d')
                     else:
-                        device.monitor_btn.SetBackgroundColour('#e0473a')
+                        monitor_btn.SetBackgroundColour('#e0473a')
 
-                    device_info.Add(device.monitor_btn, 1,
+                    device_info.Add(monitor_btn, 1,
                                     wx.ALL | wx.ALIGN_CENTER | wx.ALIGN_CENTER_VERTICAL, 5)
 
             # ----------- SET INITIAL SWITCH STATES ------------ #
@@ -428,17 +450,18 @@ class Gui(wx.Frame):        # main options screen
                 self.switch_options.Add(label, 1,
                                         wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
 
-                device.switch_btn = wx.ToggleButton(
+                switch_btn = wx.ToggleButton(
                     self.middle_panel, label=_("initial switch state"))
-                device.switch_btn.Bind(wx.EVT_TOGGLEBUTTON, self.OnToggleClick)
-                device.switch_btn.SetForegroundColour('white')
+                self.switch_btns[device.device_id] = switch_btn
+                switch_btn.Bind(wx.EVT_TOGGLEBUTTON, self.OnToggleClick)
+                switch_btn.SetForegroundColour('white')
                 if device.switch_state:
-                    device.switch_btn.SetValue(True)
-                    device.switch_btn.SetBackgroundColour('#3ac10d')
+                    switch_btn.SetValue(True)
+                    switch_btn.SetBackgroundColour('#3ac10d')
                 else:
-                    device.switch_btn.SetBackgroundColour('#e0473a')
+                    switch_btn.SetBackgroundColour('#e0473a')
 
-                self.switch_options.Add(device.switch_btn, 1,
+                self.switch_options.Add(switch_btn, 1,
                                         wx.ALL, 5)
 
             self.middle_sizer.Insert(1, self.switch_options, 0,
@@ -475,35 +498,27 @@ class Gui(wx.Frame):        # main options screen
 
     def newSimulate(self, event):
         name = event.GetEventObject().name
+        # Stop and close the old simulation before its monitors are replaced
+        if self.SimulateWindow:
+            self.SimulateWindow.cancel_run()
+            self.SimulateWindow.Destroy()
+        # Set the monitors and switches before the simulation page shows them
+        self.monitors.reset_monitors()
+        for (device_id, output_id), button in self.monitor_btns.items():
+            if button.GetValue():
+                self.monitors.make_monitor(device_id, output_id)
+        for device_id, button in self.switch_btns.items():
+            if button.GetValue():
+                self.devices.set_switch(device_id, self.devices.HIGH)
+            else:
+                self.devices.set_switch(device_id, self.devices.LOW)
+
         if name == '3D':
             self.SimulateWindow = SimulatePage(self, True)
         elif name == '2D':
             self.SimulateWindow = SimulatePage(self, False)
 
         self.SimulateWindow.Show()
-        self.monitors.reset_monitors()
-
-        for device in self.devices.devices_list:
-            if hasattr(device, 'monitor_btn'):
-                if device.monitor_btn.GetValue():
-                    if device.device_kind == self.devices.D_TYPE:
-                        self.monitors.make_monitor(
-                            device.device_id, self.names.query("Q"))
-                    else:
-                        self.monitors.make_monitor(device.device_id, None)
-
-            if hasattr(device, 'monitor_btn_bar'):
-                if device.monitor_btn_bar.GetValue():
-                    self.monitors.make_monitor(
-                        device.device_id, self.names.query("QBAR"))
-
-            if hasattr(device, 'switch_btn'):
-                if device.switch_btn.GetValue():
-                    self.devices.set_switch(
-                        device.device_id, self.devices.HIGH)
-                else:
-                    self.devices.set_switch(device.device_id, self.devices.LOW)
-
         self.SimulateWindow.run(2, True)
 
     def OnRightPanelToggle(self, event):
@@ -655,6 +670,23 @@ class SimulatePage(wx.Frame):       # simulation screen
         right_sizer.AddSpacer(30)
         row.Add(self.continueBtn, 0, wx.ALL, 10)
 
+        right_sizer.Add(row, 0, wx.EXPAND, 10)
+
+        # Simulation runs in a worker thread, see run()
+        self.worker = None
+        self.run_id = 0  # identifies the chunks sent by the current worker
+        self.cancelled = False
+        self.cycles_done = 0
+        self.cycles_requested = 0
+        row = wx.BoxSizer(wx.HORIZONTAL)
+        self.progress = wx.Gauge(self, wx.ID_ANY, range=100)
+        self.cancelBtn = wx.Button(self, wx.ID_ANY, _("Cancel"))
+        self.cancelBtn.name = "cancel"
+        self.cancelBtn.Bind(wx.EVT_BUTTON, self.on_btn, self.cancelBtn)
+        self.cancelBtn.Disable()
+        row.Add(self.progress, 1, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 10)
+        row.Add(self.cancelBtn, 0, wx.ALL, 10)
+
         right_sizer.Add(row, 0, wx.EXPAND, 10)
         right_sizer.AddSpacer(30)
 
@@ -662,21 +694,21 @@ class SimulatePage(wx.Frame):       # simulation screen
         for device in self.parent.devices.devices_list:
             if device.device_kind == self.parent.devices.SWITCH:
 
-                device.switch_btn = wx.ToggleButton(self, label="On/Off")
-                device.switch_btn.SetForegroundColour('white')
-                device.switch_btn.name = 'switch '+str(device.device_id)
-                device.switch_btn.Bind(
-                    wx.EVT_TOGGLEBUTTON, self.on_btn, device.switch_btn)
+                switch_btn = wx.ToggleButton(self, label="On/Off")
+                switch_btn.SetForegroundColour('white')
+                switch_btn.name = 'switch '+str(device.device_id)
+                switch_btn.Bind(
+                    wx.EVT_TOGGLEBUTTON, self.on_btn, switch_btn)
 
                 if device.switch_state == 1:
-                    device.switch_btn.SetValue(True)
-                    device.switch_btn.SetBackgroundColour('#3ac10d')
+                    switch_btn.SetValue(True)
+                    switch_btn.SetBackgroundColour('#3ac10d')
                 else:
-                    device.switch_btn.SetBackgroundColour('#e0473a')
+                    switch_btn.SetBackgroundColour('#e0473a')
 
                 pan.Add(wx.StaticText(self, 0, label=self.parent.names.get_name_string(
                     device.device_id)), 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL)
-                pan.Add(device.switch_btn, 0, wx.ALL | wx.EXPAND)
+                pan.Add(switch_btn, 0, wx.ALL | wx.EXPAND)
         right_sizer.Add(pan, 0, wx.ALIGN_CENTER)
         right_sizer.AddSpacer(30)
 
@@ -727,18 +759,14 @@ class SimulatePage(wx.Frame):       # simulation screen
 
         elif name == 'continue':
             self.run(int(self.continueSpin.GetValue()))
-            if self.canvas.max_x > self.canvas.size.width:
-                self.canvas.pan_x = -self.canvas.max_x-100 + self.canvas.size.width
-                self.canvas.init = False
-                self.canvas.Refresh()
 
-            if self.canvas3d.max_x > self.canvas3d.size.width/3:
-                self.canvas3d.pan_x = -self.canvas3d.max_x-100 + self.canvas3d.size.width/3
-                self.canvas3d.init = False
-                self.canvas3d.Refresh()
+        elif name == 'cancel':
+            self.cancelled = True
 
         elif name == 'reset':
+            self.cancel_run()
             self.parent.monitors.reset_monitors()
+            self.parent.network.reset_stimulus()
 
             self.canvas.signals = []
             self.canvas.pan_x = 0
@@ -779,41 +807,122 @@ class SimulatePage(wx.Frame):       # simulation screen
             self.Layout()
 
         elif name == 'kill':
+            self.cancel_run()
             self.canvas.Destroy()
             self.canvas3d.Destroy()
             self.Destroy()
 
     def on_close(self, event):
+        self.cancel_run()
         self.Destroy()
         c = self.__class__
         self.parent.SimulateWindow = c(self.parent)
 
     def run(self, num, reset=False):
+        """Simulate num more cycles in a worker thread.
+
+        The worker streams the monitored signals back to the main thread in
+        chunks, so the traces are drawn as they arrive and the window stays
+        responsive. Only the worker touches the network while it runs, and
+        only the main thread touches the monitors.
+        """
+        if self.worker is not None:  # a simulation is already running
+            return
         if reset:
             self.parent.monitors.reset_monitors()
+            self.parent.network.reset_stimulus()
+            self.canvas.signals = []
+            self.canvas3d.signals = []
             self.colours = []
-            for i in range(len(self.parent.monitors.monitors_dictionary)):
+            for i in range(len(self.parent.monitors.monitor_rows)):
                 self.colours.append(
                     (random.uniform(0, 0.9), random.uniform(0, 0.9), random.uniform(0, 0.9)))
 
-        for _ in range(num):
-            if self.parent.network.execute_network():
-                self.parent.monitors.record_signals()
-            else:
-                print(_("Error! Network oscillating."))
-
-        self.canvas.signals = []
-        self.canvas3d.signals = []
-
-        count = 0
-        for (device_id, output_id), value in self.parent.monitors.monitors_dictionary.items():
-            monitor_name = self.parent.devices.get_signal_name(
-                device_id, output_id)
-            self.canvas.signals.append(
-                [monitor_name, self.colours[count], value])
-            self.canvas3d.signals.append(
-                [monitor_name, self.colours[count], value])
-            count += 1
+        self.cancelled = False
+        self.cycles_done = 0
+        self.cycles_requested = num
+        self.progress.SetValue(0)
+        self.continueBtn.Disable()
+        self.cancelBtn.Enable()
+
+        # Send about 20 progress updates per run
+        chunk = max(1, min(4096, num // 20))
+        self.worker = threading.Thread(target=self.simulate,
+                                       args=(num, chunk, self.run_id),
+                                       daemon=True)
+        self.worker.start()
+
+    def simulate(self, num, chunk, run_id):
+        """Run the simulation. This is executed by the worker thread."""
+        for signals in self.parent.monitors.stream(num, chunk):
+            if self.cancelled:
+                break
+            wx.CallAfter(self.on_chunk, signals, run_id)
+        wx.CallAfter(self.on_run_done, self.parent.network.steady_state,
+                     run_id)
+
+    def on_chunk(self, signals, run_id):
+        """Record a chunk of signals sent by the worker and draw it."""
+        if not self or run_id != self.run_id:  # closed, reset or old chunk
+            return
+        self.parent.monitors.record_chunk(signals)
+        self.cycles_done += signals.shape[1]
+        self.progress.SetValue(
+            100 * self.cycles_done // max(1, self.cycles_requested))
+        self.update_canvases(signals)
+
+    def on_run_done(self, steady_state, run_id):
+        """Tidy up once the worker has finished."""
+        if not self or run_id != self.run_id:  # closed, reset or old run
+            return
+        self.worker = None
+        self.continueBtn.Enable()
+        self.cancelBtn.Disable()
+        if not steady_state:
+            print(_("Error! Network oscillating."))
+
+        if self.canvas.max_x > self.canvas.size.width:
+            self.canvas.pan_x = -self.canvas.max_x-100 + self.canvas.size.width
+            self.canvas.init = False
+            self.canvas.Refresh()
+
+        if self.canvas3d.max_x > self.canvas3d.size.width/3:
+            self.canvas3d.pan_x = -self.canvas3d.max_x-100 + self.canvas3d.size.width/3
+            self.canvas3d.init = False
+            self.canvas3d.Refresh()
+
+    def cancel_run(self):
+        """Stop the worker, if any, and wait for it to finish."""
+        if self.worker is not None:
+            self.cancelled = True
+            self.worker.join()
+            self.worker = None
+            self.run_id += 1  # drop chunks that have not been drawn yet
+            self.continueBtn.Enable()
+            self.cancelBtn.Disable()
+
+    def update_canvases(self, signals):
+        """Append a chunk of signals to the canvases and redraw them.
+
+        signals has one row per monitor, in the order of monitor_rows, so
+        only the new cycles are copied and a run costs time linear in its
+        length. The canvases draw to a back buffer and swap it in when done,
+        and they only read signals that the main thread has already
+        recorded, so drawing never waits for the worker.
+        """
+        if not self.canvas.signals:
+            for count, (device_id, output_id) in enumerate(
+                    self.parent.monitors.monitor_rows):
+                monitor_name = self.parent.devices.get_signal_name(
+                    device_id, output_id)
+                # Both canvases share the list of values of each signal
+                values = []
+                self.canvas.signals.append(
+                    [monitor_name, self.colours[count], values])
+                self.canvas3d.signals.append(
+                    [monitor_name, self.colours[count], values])
+        for signal, row in zip(self.canvas.signals, signals.tolist()):
+            signal[-1].extend(row)
 
         try:
             self.canvas.render()
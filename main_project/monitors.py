@@ -9,6 +9,17 @@ Monitors - records and displays specified output signals.
 
 """
 import collections
+import copy
+import keyword
+import re
+import time
+
+import numpy as np
+
+from main_project.traces import (RunLengthTrace, DecimatedTrace,
+                                 WindowedTrace, TraceWriter, TracePyramid,
+                                 get_buckets)
+from main_project.vcd import VcdWriter
 
 
 class Monitors:
@@ -18,11 +29,34 @@ class Monitors:
     This class contains functions for recording and displaying the signal state
     of outputs specified by their device and port IDs.
 
+    The signals are stored in a 2-D NumPy array with one row per monitor and
+    one column per cycle, of uint8 unless buses of 8 bits or more are
+    monitored. The array grows geometrically, or if a capacity is given,
+    acts as a ring buffer holding only the last capacity cycles. A bus can
+    take the value BLANK, so its BLANK cycles are stored as get_blank.
+    monitors_dictionary gives the stored signals as lists, for
+    compatibility; it copies the whole store on every access, so code that
+    reads signals repeatedly should use get_trace or get_signal_array.
+
+    Each monitor has a recording policy (see set_policy). Monitors with the
+    ALL policy have a row of the array. The others are stored as trace
+    objects from the traces module, which record only the changes of the
+    signal with their cycle stamps (ON_CHANGE), every k-th cycle (EVERY) or
+    the cycles inside given windows (WINDOWS), and are expanded back to
+    every cycle when read.
+
+    For zoomed-out views, get_summary serves the minimum, maximum and
+    whether the signal changes for each pixel of a window of cycles, from a
+    pyramid of summaries (see traces.TracePyramid) that is built on first
+    use and then updated as signals are recorded.
+
     Parameters
     ----------
     names: instance of the names.Names() class.
     devices: instance of the devices.Devices() class.
     network: instance of the network.Network() class.
+    capacity: number of cycles kept, or None to keep them all.
+    run_length: True to store new monitors as run-length encoded traces.
 
     Public methods
     --------------
@@ -35,8 +69,32 @@ class Monitors:
     get_monitor_signal(self, device_id, output_id): Returns the signal level of
                                                     the specified monitor.
 
+    get_blank(self, device_id, output_id): Returns the value stored for the
+                                           cycles a monitor is BLANK.
+
+    set_policy(self, device_id, output_id, policy, parameter=None): Sets
+                                   how the signals of a monitor are recorded.
+
+    set_run_length(self, device_id, output_id): Stores a monitor as a
+                                                run-length encoded trace.
+
+    get_length(self): Returns the number of cycles stored.
+
+    get_trace(self, device_id, output_id, start=0, stop=None): Returns the
+                                    stored signals of a monitor as an array.
+
+    get_signal_array(self): Returns the stored signals of all the monitors as
+                            an array.
+
+    get_summary(self, start=0, stop=None, pixels=1000): Returns summaries
+                            of the stored signals for each pixel of a
+                            window of cycles.
+
     record_signals(self): Records the current signal level of all monitors.
 
+    record_chunk(self, signals): Records a chunk of signal levels, as yielded
+                                 by stream, for all monitors.
+
     get_signal_names(self): Returns two lists of signal names: monitored and
                             not monitored.
 
@@ -45,17 +103,67 @@ class Monitors:
     get_margin(self): Returns the length of the longest monitor's name.
 
     display_signals(self): Displays signal trace(s) in the text console.
+
+    stream(self, cycles, chunk=4096): Simulates the network and yields the
+                                      monitored signals in NumPy chunks.
+
+    write_vcd(self, path, cycles, chunk=4096, cycle_time=1): Simulates the
+                                      network and writes the monitored
+                                      signals to a VCD file.
+
+    spill_traces(self, path, cycles=0, chunk=4096): Moves the stored signals
+                                      to a compressed store on disk and
+                                      simulates more cycles into it.
+
+    compile_predicate(self, expression): Returns a function that evaluates an
+                                         expression over named signals.
+
+    run_until(self, predicate, max_cycles): Simulates the network until the
+                                            predicate is true.
+
+    capture(self, trigger, cycles, pre=64, post=64, max_captures=None):
+                                    Simulates the network and captures the
+                                    monitored signals around each trigger.
+
+    unshare_traces(self): Copies the signal store if it is shared with a fork.
+
+    fork(self, network=None): Returns a copy of the monitors running on a fork
+                              of the network.
     """
 
-    def __init__(self, names, devices, network):
-        """Initialise the monitors dictionary and monitor errors."""
+    # Recording policies of the monitors
+    [ALL, ON_CHANGE, EVERY, WINDOWS] = range(4)
+
+    def __init__(self, names, devices, network, capacity=None,
+                 run_length=False):
+        """Initialise the signal store and monitor errors."""
         self.names = names
         self.network = network
         self.devices = devices
 
-        # monitors_dictionary stores
-        # {(device_id, output_id): [signal_list]}
-        self.monitors_dictionary = collections.OrderedDict()
+        # monitor_rows stores {(device_id, output_id): row} for the rows of
+        # signal_array, in the order the monitors were made. The row is None
+        # for monitors stored as trace objects.
+        self.monitor_rows = collections.OrderedDict()
+        self.capacity = capacity
+        self.run_length = run_length
+        # traces stores {(device_id, output_id): trace object}. A trace
+        # holds every cycle since the last reset, even with a capacity.
+        self.traces = {}
+        self.signal_array = np.empty((0, capacity or 64), dtype=np.uint8)
+        # Cycles recorded since the last reset. With a capacity, cycle c is
+        # stored in column c % capacity.
+        self.cycles = 0
+        # sources stores (device outputs, output_id) for each monitor, so
+        # that recording needs no device lookups; None when it must be
+        # rebuilt, along with row_sources and trace_sources (see get_sources)
+        self.sources = None
+        # True if signal_array is shared with a fork and must be copied
+        # before it is next written to
+        self.traces_shared = False
+        # Summaries of the stored signals at power-of-two resolutions, or
+        # None until get_summary is next called
+        self.pyramid = None
 
         [self.NO_ERROR, self.NOT_OUTPUT,
          self.MONITOR_PRESENT] = self.names.unique_error_codes(3)
@@ -70,15 +178,44 @@ class Monitors:
             return self.network.DEVICE_ABSENT
         elif output_id not in monitor_device.outputs:
             return self.NOT_OUTPUT
-        elif (device_id, output_id) in self.monitors_dictionary:
+        elif (device_id, output_id) in self.monitor_rows:
             return self.MONITOR_PRESENT
         else:
-            # If n simulation cycles have been completed before making this
-            # monitor, then initialise the signal trace with an n-length list
-            # of BLANK signals. Otherwise, initialise the trace with an empty
-            # list.
-            self.monitors_dictionary[(device_id, output_id)] = [
-                self.devices.BLANK] * cycles_completed
+            # The new monitor is BLANK for the cycles already recorded. If it
+            # is the only monitor, n simulation cycles may have been
+            # completed before making it, which are BLANK too.
+            if not self.monitor_rows:
+                self.cycles = cycles_completed
+                columns = self.signal_array.shape[1]
+                if self.capacity is None and cycles_completed > columns:
+                    columns = cycles_completed
+                self.signal_array = np.empty((0, columns),
+                                             dtype=self.signal_array.dtype)
+            width = monitor_device.bus_widths.get(output_id)
+            if width is not None:
+                # Widen the store to hold the bus and its BLANK value
+                signal_type = self.devices.get_bus_dtype(min(width + 1, 64))
+                if (np.dtype(signal_type).itemsize >
+                        self.signal_array.dtype.itemsize):
+                    self.signal_array = self.signal_array.astype(signal_type)
+            blank = self.get_blank(device_id, output_id)
+            if self.run_length:
+                trace = RunLengthTrace(dtype=self.signal_array.dtype)
+                trace.extend_run(blank, self.get_length())
+                self.traces[(device_id, output_id)] = trace
+                self.monitor_rows[(device_id, output_id)] = None
+                self.sources = None
+                self.pyramid = None
+                return self.NO_ERROR
+            blank_row = np.full((1, self.signal_array.shape[1]), blank,
+                                dtype=self.signal_array.dtype)
+            row = self.signal_array.shape[0]
+            self.signal_array = np.concatenate([self.signal_array,
+                                                blank_row])
+            self.monitor_rows[(device_id, output_id)] = row
+            self.sources = None
+            self.pyramid = None
+            self.traces_shared = False  # the array is a new copy
             return self.NO_ERROR
 
     def remove_monitor(self, device_id, output_id):
@@ -86,44 +223,344 @@ class Monitors:
 
         Return True if successful.
         """
-        if (device_id, output_id) not in self.monitors_dictionary:
+        if (device_id, output_id) not in self.monitor_rows:
             return False
         else:
-            del self.monitors_dictionary[(device_id, output_id)]
+            row = self.monitor_rows.pop((device_id, output_id))
+            if row is None:
+                del self.traces[(device_id, output_id)]
+            else:
+                self.remove_row(row)
+            self.sources = None
+            self.pyramid = None
             return True
 
+    def remove_row(self, row):
+        """Remove a row from the signal array and renumber the others."""
+        self.signal_array = np.delete(self.signal_array, row, axis=0)
+        for monitor, monitor_row in self.monitor_rows.items():
+            if monitor_row is not None and monitor_row > row:
+                self.monitor_rows[monitor] = monitor_row - 1
+        self.traces_shared = False  # the array is a new copy
+
+    def set_policy(self, device_id, output_id, policy, parameter=None):
+        """Set how the signals of a monitor are recorded.
+
+        policy is ALL to record every cycle in the signal array, ON_CHANGE
+        to record only the changes, EVERY to record every parameter-th cycle
+        or WINDOWS to record only the cycles inside parameter, a list of
+        [start, stop) pairs of cycles counted from the last reset. The
+        signals stored so far are kept as far as the new policy records
+        them. Return True if successful. Raise ValueError if the policy or
+        its parameter is not valid.
+        """
+        monitor = (device_id, output_id)
+        if monitor not in self.monitor_rows:
+            return False
+        row = self.monitor_rows[monitor]
+        if row is None:
+            signals = self.traces[monitor].to_array()
+        else:
+            signals = self.get_trace(device_id, output_id)
+        signal_type = self.signal_array.dtype
+        if policy == self.ALL:
+            if row is not None:
+                return True
+            # The array holds the last get_length() cycles of the trace
+            length = self.get_length()
+            new_row = np.full((1, self.signal_array.shape[1]),
+                              self.get_blank(device_id, output_id),
+                              dtype=signal_type)
+            if self.capacity is None:
+                columns = np.arange(length)
+            else:
+                columns = np.arange(self.cycles - length,
+                                    self.cycles) % self.capacity
+            new_row[0, columns] = signals[len(signals) - length:]
+            self.monitor_rows[monitor] = self.signal_array.shape[0]
+            self.signal_array = np.concatenate([self.signal_array, new_row])
+            self.traces_shared = False  # the array is a new copy
+            del self.traces[monitor]
+        else:
+            if policy == self.ON_CHANGE:
+                trace = RunLengthTrace(signals, dtype=signal_type)
+            elif policy == self.EVERY:
+                trace = DecimatedTrace(parameter, signals, dtype=signal_type)
+            elif policy == self.WINDOWS:
+                trace = WindowedTrace(parameter, signals, dtype=signal_type,
+                                      fill=self.get_blank(device_id,
+                                                          output_id))
+            else:
+                raise ValueError("Invalid recording policy.")
+            if row is not None:
+                self.remove_row(row)
+            self.monitor_rows[monitor] = None
+            self.traces[monitor] = trace
+        self.sources = None
+        self.pyramid = None
+        return True
+
+    def set_run_length(self, device_id, output_id):
+        """Store a monitor as a run-length encoded trace.
+
+        The same as set_policy with the ON_CHANGE policy. Return True if
+        successful.
+        """
+        return self.set_policy(device_id, output_id, self.ON_CHANGE)
+
     def get_monitor_signal(self, device_id, output_id):
         """Return the signal level of the specified monitor.
 
         If the monitor does not exist, return None.
         """
-        if (device_id, output_id) in self.monitors_dictionary:
+        if (device_id, output_id) in self.monitor_rows:
             return self.network.get_output_signal(device_id, output_id)
         else:
             return None
 
+    def get_blank(self, device_id, output_id):
+        """Return the value stored for the cycles a monitor is BLANK.
+
+        This is BLANK for 1-bit signals. A bus can take the value BLANK, so
+        its BLANK cycles are stored as 1 << width, just above its range, or
+        as the largest 64-bit value for a 64-bit bus.
+        """
+        width = self.devices.get_bus_width(device_id, output_id)
+        if width is None:
+            return self.devices.BLANK
+        return min(1 << width, (1 << 64) - 1)
+
+    @property
+    def monitors_dictionary(self):
+        """Return the stored signals as {(device_id, output_id): [signals]}.
+
+        The lists are copies of the signal store, oldest cycle first. This is
+        a costly accessor: each access expands every trace and converts every
+        stored cycle to Python ints, in time and memory proportional to the
+        whole store. Read it once, or use get_trace or get_signal_array,
+        which return NumPy arrays, when reading signals repeatedly or while
+        a run streams in.
+        """
+        signal_array = self.get_signal_array()
+        return collections.OrderedDict(
+            (monitor, signals.tolist())
+            for monitor, signals in zip(self.monitor_rows, signal_array))
+
+    def get_length(self):
+        """Return the number of cycles stored for each monitor."""
+        if self.capacity is None:
+            return self.cycles
+        return min(self.cycles, self.capacity)
+
+    def get_signal_array(self):
+        """Return the stored signals as an array, oldest cycle first.
+
+        The array has one row per monitor, in the order of monitor_rows. It
+        is a view of the store unless a ring buffer has wrapped around or
+        monitors are stored as run-length encoded traces.
+        """
+        length = self.get_length()
+        if self.capacity is None or self.cycles <= self.capacity:
+            signal_array = self.signal_array[:, :length]
+        else:
+            start = self.cycles % self.capacity
+            signal_array = np.concatenate([self.signal_array[:, start:],
+                                           self.signal_array[:, :start]],
+                                          axis=1)
+        if not self.traces:
+            return signal_array
+        signals = np.empty((len(self.monitor_rows), length),
+                           dtype=self.signal_array.dtype)
+        for position, (monitor, row) in enumerate(self.monitor_rows.items()):
+            if row is None:
+                trace = self.traces[monitor]
+                signals[position] = trace.to_array(len(trace) - length)
+            else:
+                signals[position] = signal_array[row]
+        return signals
+
+    def get_trace(self, device_id, output_id, start=0, stop=None):
+        """Return the stored signals of a monitor as an array.
+
+        start and stop index the stored cycles as for a list, so only that
+        window is copied. Return None if the monitor does not exist.
+        """
+        if (device_id, output_id) not in self.monitor_rows:
+            return None
+        row = self.monitor_rows[(device_id, output_id)]
+        length = self.get_length()
+        [start, stop, _] = slice(start, stop).indices(length)
+        if row is None:
+            trace = self.traces[(device_id, output_id)]
+            offset = len(trace) - length  # a trace outlives a ring buffer
+            return trace.to_array(offset + start, offset + max(start, stop))
+        if self.capacity is None:
+            return self.signal_array[row, start:stop].copy()
+        first_cycle = self.cycles - length
+        columns = np.arange(first_cycle + start,
+                            first_cycle + max(start, stop)) % self.capacity
+        return self.signal_array[row, columns]
+
+    def get_summary(self, start=0, stop=None, pixels=1000):
+        """Return summaries of the stored signals for a window of cycles.
+
+        The window, indexed as for a list, is split into pixels columns.
+        Return [mins, maxs, changes], arrays with one row per monitor, in
+        the order of monitor_rows, holding the minimum and maximum signal
+        in each column and whether the signal changes in it. Zoomed-out
+        windows are served from the pyramid in O(pixels) time; with a
+        capacity, or when a column holds few cycles, the stored signals are
+        summarised directly.
+        """
+        length = self.get_length()
+        [start, stop, _] = slice(start, stop).indices(length)
+        if self.capacity is None:
+            if self.pyramid is None:
+                self.pyramid = TracePyramid(len(self.monitor_rows),
+                                            self.signal_array.dtype)
+                self.pyramid.extend(self.get_signal_array())
+            summary = self.pyramid.get_summary(start, stop, pixels)
+            if summary is not None:
+                return summary
+        # The cycle before the window tells whether its first cycle changes
+        before = min(start, 1)
+        signal_array = np.empty((len(self.monitor_rows),
+                                 max(stop - start + before, 0)),
+                                dtype=self.signal_array.dtype)
+        for row, (device_id, output_id) in enumerate(self.monitor_rows):
+            signal_array[row] = self.get_trace(device_id, output_id,
+                                               start - before, stop)
+        if stop <= start:
+            empty = signal_array[:, :0]
+            return [empty, empty, empty.astype(bool)]
+        changes = np.zeros(signal_array.shape, dtype=bool)
+        changes[:, 1:] = signal_array[:, 1:] != signal_array[:, :-1]
+        starts = before + np.arange(pixels) * (stop - start) // pixels
+        return get_buckets(signal_array, signal_array, changes, starts)
+
+    def get_sources(self):
+        """Return (device outputs, output_id) for each monitor.
+
+        Also set row_sources, the sources of the rows of the signal array in
+        row order, and trace_sources, [trace, device outputs, output_id] for
+        each trace object. row_positions and trace_positions hold the
+        positions of their monitors in monitor_rows.
+        """
+        if self.sources is None:
+            rows = self.signal_array.shape[0]
+            self.sources = []
+            self.row_sources = [None] * rows
+            self.trace_sources = []
+            self.row_positions = [None] * rows
+            self.trace_positions = []
+            for position, (monitor, row) in enumerate(
+                    self.monitor_rows.items()):
+                [device_id, output_id] = monitor
+                device = self.devices.get_device(device_id)
+                self.sources.append((device.outputs, output_id))
+                if row is None:
+                    self.trace_sources.append([self.traces[monitor],
+                                               device.outputs, output_id])
+                    self.trace_positions.append(position)
+                else:
+                    self.row_sources[row] = (device.outputs, output_id)
+                    self.row_positions[row] = position
+        return self.sources
+
+    def make_room(self, cycles):
+        """Make room in the store for the given number of new cycles."""
+        if self.traces_shared:
+            self.unshare_traces()
+        columns = self.signal_array.shape[1]
+        if self.capacity is None and self.cycles + cycles > columns:
+            # Grow geometrically, so recording takes amortised O(1) time
+            columns = max(2 * columns, self.cycles + cycles)
+            signal_array = np.empty((self.signal_array.shape[0], columns),
+                                    dtype=self.signal_array.dtype)
+            signal_array[:, :self.cycles] = self.signal_array[:,
+                                                              :self.cycles]
+            self.signal_array = signal_array
+
     def record_signals(self):
         """Record the current signal level for every monitor.
 
         This function is called at every simulation cycle.
         """
-        for device_id, output_id in self.monitors_dictionary:
-            signal_level = self.get_monitor_signal(device_id, output_id)
-            self.monitors_dictionary[(device_id,
-                                      output_id)].append(signal_level)
+        profiler = self.network.profiler
+        if profiler is not None:
+            start_time = time.perf_counter()
+
+        self.make_room(1)
+        self.get_sources()
+        column = self.cycles
+        if self.capacity is not None:
+            column %= self.capacity
+        self.signal_array[:, column] = [
+            outputs[output_id] for outputs, output_id in self.row_sources]
+        for trace, outputs, output_id in self.trace_sources:
+            trace.append(outputs[output_id])
+        if self.pyramid is not None:
+            # The pyramid summarises the signals as read back, with the
+            # recording policies applied, as when it is built
+            column = [outputs[output_id]
+                      for outputs, output_id in self.sources]
+            for position, (trace, _, _) in zip(self.trace_positions,
+                                               self.trace_sources):
+                column[position] = trace.get_signal(-1)
+            self.pyramid.append(column)
+        self.cycles += 1
+
+        if profiler is not None:
+            profiler.add_phase_time("record_signals",
+                                    time.perf_counter() - start_time)
+
+    def record_chunk(self, signals):
+        """Record a chunk of signal levels for every monitor.
+
+        signals is an array with one row per monitor, in the order of
+        monitor_rows, such as a chunk yielded by stream.
+        """
+        cycles = signals.shape[1]
+        self.make_room(cycles)
+        self.get_sources()
+        # The pyramid summarises the signals as read back, with the
+        # recording policies applied, as when it is built
+        summarised = signals
+        if self.trace_sources:
+            if self.pyramid is not None:
+                summarised = np.array(signals)
+            for position, (trace, _, _) in zip(self.trace_positions,
+                                               self.trace_sources):
+                trace.extend(signals[position])
+                if self.pyramid is not None:
+                    summarised[position] = trace.to_array(len(trace) -
+                                                          cycles)
+            signals = signals[self.row_positions]
+        if self.pyramid is not None:
+            self.pyramid.extend(summarised)
+        if self.capacity is None:
+            self.signal_array[:, self.cycles:self.cycles + cycles] = signals
+        else:
+            if cycles > self.capacity:  # only the last cycles are kept
+                signals = signals[:, cycles - self.capacity:]
+                self.cycles += cycles - self.capacity
+                cycles = self.capacity
+            columns = np.arange(self.cycles, self.cycles + cycles)
+            self.signal_array[:, columns % self.capacity] = signals
+        self.cycles += cycles
 
     def get_signal_names(self):
         """Return two signal name lists: monitored and not monitored."""
         non_monitored_signal_list = []
         monitored_signal_list = []
-        for device_id, output_id in self.monitors_dictionary:
+        for device_id, output_id in self.monitor_rows:
             monitor_name = self.devices.get_signal_name(device_id, output_id)
             monitored_signal_list.append(monitor_name)
 
         for device_id in self.devices.find_devices():
             device = self.devices.get_device(device_id)
             for output_id in device.outputs:
-                if (device_id, output_id) not in self.monitors_dictionary:
+                if (device_id, output_id) not in self.monitor_rows:
                     signal_name = self.devices.get_signal_name(device_id,
                                                                output_id)
                     non_monitored_signal_list.append(signal_name)
@@ -133,10 +570,12 @@ class Monitors:
     def reset_monitors(self):
         """Clear the memory of all the monitors.
 
-        The list of stored signal levels for each monitor is deleted.
+        The stored signal levels of every monitor are deleted.
         """
-        for device_id, output_id in self.monitors_dictionary:
-            self.monitors_dictionary[(device_id, output_id)] = []
+        self.cycles = 0
+        for trace in self.traces.values():
+            trace.clear()
+        self.pyramid = None
 
     def get_margin(self):
         """Return the length of the longest monitor's name.
@@ -146,7 +585,7 @@ class Monitors:
         starting to draw the signal trace.
         """
         length_list = []  # for storing name lengths
-        for device_id, output_id in self.monitors_dictionary:
+        for device_id, output_id in self.monitor_rows:
             monitor_name = self.devices.get_signal_name(device_id, output_id)
             name_length = len(monitor_name)
             length_list.append(name_length)
@@ -158,11 +597,22 @@ class Monitors:
     def display_signals(self):
         """Display the signal trace(s) in the text console."""
         margin = self.get_margin()
-        for device_id, output_id in self.monitors_dictionary:
+        signal_array = self.get_signal_array()
+        for (device_id, output_id), signals in zip(self.monitor_rows,
+                                                   signal_array):
             monitor_name = self.devices.get_signal_name(device_id, output_id)
             name_length = len(monitor_name)
-            signal_list = self.monitors_dictionary[(device_id, output_id)]
+            signal_list = signals.tolist()
             print(monitor_name + (margin - name_length) * " ", end=": ")
+            width = self.devices.get_bus_width(device_id, output_id)
+            if width is not None:
+                # buses are shown as hexadecimal values
+                digits = (width + 3) // 4
+                blank = self.get_blank(device_id, output_id)
+                print(" ".join(digits * " " if value == blank else
+                               format(int(value), "0{}x".format(digits))
+                               for value in signal_list))
+                continue
             for signal in signal_list:
                 if signal == self.devices.HIGH:
                     print("-", end="")
@@ -175,3 +625,238 @@ class Monitors:
                 if signal == self.devices.BLANK:
                     print(" ", end="")
             print("\n", end="")
+
+    def stream(self, cycles, chunk=4096):
+        """Simulate the network and yield the monitored signals in chunks.
+
+        Each chunk is a NumPy uint8 array with one row per monitor, in the
+        order of monitor_rows, and one column per simulation cycle.
+        If buses of 8 bits or more are monitored, the type of the signal
+        store is used instead.
+        All chunks have chunk columns except possibly the last one. The
+        signals are not stored in the monitors and the network is only
+        executed when the next chunk is requested, so arbitrarily long runs
+        take constant memory. The stream stops early if the network
+        oscillates, in which case network.steady_state is False.
+        """
+        if chunk <= 0:
+            raise ValueError("Expected chunk to be a positive integer.")
+        # Store where each monitored signal lives, so that gathering the
+        # signals does not need any device lookups
+        sources = self.get_sources()
+        # The array is the type of the store, which holds the widest bus
+        signal_type = self.signal_array.dtype
+
+        cycles_left = cycles
+        while cycles_left > 0:
+            chunk_length = min(chunk, cycles_left)
+            signals = np.empty((len(sources), chunk_length),
+                               dtype=signal_type)
+            for cycle in range(chunk_length):
+                if not self.network.execute_network():
+                    if cycle > 0:
+                        yield signals[:, :cycle]
+                    return
+                profiler = self.network.profiler
+                if profiler is not None:
+                    start_time = time.perf_counter()
+                for row, (outputs, output_id) in enumerate(sources):
+                    signals[row, cycle] = outputs[output_id]
+                if profiler is not None:
+                    profiler.add_phase_time("record_signals",
+                                            time.perf_counter() - start_time)
+            cycles_left -= chunk_length
+            yield signals
+
+    def write_vcd(self, path, cycles, chunk=4096, cycle_time=1):
+        """Simulate the network and write the monitored signals to a file.
+
+        The signals are streamed (see stream) into a value change dump file
+        (see vcd.VcdWriter) and are not stored in the monitors, so the run
+        takes constant memory. Return the number of cycles written, which is
+        less than cycles if the network oscillated.
+        """
+        writer = VcdWriter(self, path, cycle_time)
+        try:
+            for signals in self.stream(cycles, chunk):
+                writer.write_chunk(signals)
+        finally:
+            writer.close()
+        return writer.cycles
+
+    def spill_traces(self, path, cycles=0, chunk=4096, store_chunk=65536):
+        """Move the stored signals to a compressed trace store on disk.
+
+        The stored signals are written to the directory path (see
+        traces.TraceWriter), in chunks of store_chunk cycles, and cleared
+        from memory. The network is then simulated for the given number of
+        cycles, streamed straight to disk. Return the number of cycles in
+        the store, which can be read back with traces.TraceReader.
+        """
+        signal_names = [self.devices.get_signal_name(device_id, output_id)
+                        for device_id, output_id in self.monitor_rows]
+        writer = TraceWriter(path, signal_names, self.signal_array.dtype,
+                             store_chunk)
+        try:
+            writer.write_chunk(self.get_signal_array())
+            self.reset_monitors()
+            for signals in self.stream(cycles, chunk):
+                writer.write_chunk(signals)
+        finally:
+            writer.close()
+        return writer.cycles
+
+    def compile_predicate(self, expression):
+        """Return a function that evaluates an expression over named signals.
+
+        The expression is Python, with signal names such as B or F.Q standing
+        for their current signal level, e.g. "F.Q == HIGH and B == 0". HIGH,
+        LOW, RISING, FALLING and BLANK may be used for the signal levels. The
+        expression is compiled once and each signal is read straight from
+        its device outputs, so the function is cheap to call every cycle.
+        Raise ValueError if a name is not a signal or the expression is not
+        valid.
+        """
+        levels = {"LOW": self.devices.LOW, "HIGH": self.devices.HIGH,
+                  "RISING": self.devices.RISING,
+                  "FALLING": self.devices.FALLING,
+                  "BLANK": self.devices.BLANK}
+        namespace = {}
+        signal_variables = {}
+
+        def replace_signal(match):
+            signal_name = match.group(0)
+            if keyword.iskeyword(signal_name) or signal_name in levels:
+                return signal_name
+            if signal_name not in signal_variables:
+                [device_name, _, port_name] = signal_name.partition(".")
+                device = self.devices.get_device(self.names.query(device_name))
+                output_id = self.names.query(port_name) if port_name else None
+                if device is None or output_id not in device.outputs:
+                    raise ValueError(
+                        "'{}' is not a signal name.".format(signal_name))
+                variable = "_s{}".format(len(signal_variables))
+                namespace[variable] = device.outputs
+                namespace[variable + "_port"] = output_id
+                signal_variables[signal_name] = variable
+            variable = signal_variables[signal_name]
+            return "{0}[{0}_port]".format(variable)
+
+        # Names not preceded by a digit, e.g. the x of 0x1f, or by a dot
+        name_pattern = r"(?<![\w.])[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)?"
+        source = re.sub(name_pattern, replace_signal, expression)
+        namespace.update(levels)
+        try:
+            code = compile("lambda: ({})".format(source), "<predicate>",
+                           "eval")
+        except SyntaxError:
+            raise ValueError("Invalid expression '{}'.".format(expression))
+        return eval(code, namespace)
+
+    def run_until(self, predicate, max_cycles):
+        """Simulate the network until the predicate is true.
+
+        predicate is an expression over named signals, see compile_predicate,
+        or a function with no arguments. It is checked after each cycle and
+        the signals are recorded as usual. Return [cycle, monitors_dictionary]
+        where cycle is the index in the signal lists of the cycle at which
+        the predicate became true, or None if it did not within max_cycles
+        or the network oscillated (then network.steady_state is False).
+        """
+        if isinstance(predicate, str):
+            predicate = self.compile_predicate(predicate)
+        for _ in range(max_cycles):
+            if not self.network.execute_network():
+                return [None, self.monitors_dictionary]
+            self.record_signals()
+            if predicate():
+                return [self.get_length() - 1, self.monitors_dictionary]
+        return [None, self.monitors_dictionary]
+
+    def capture(self, trigger, cycles, pre=64, post=64, max_captures=None):
+        """Simulate the network and capture the signals around triggers.
+
+        trigger is an expression over named signals, see compile_predicate,
+        or a function with no arguments. It fires at each cycle where it
+        becomes true, e.g. "F.Q == HIGH and B == HIGH" fires on a rising
+        edge of F.Q while B is HIGH, or of B while F.Q is HIGH. Each capture
+        holds the pre cycles before the trigger, kept in a circular buffer,
+        the trigger cycle and the post cycles after it. Triggers during a
+        capture are part of it and do not start another one.
+
+        Like a logic analyser, the monitored signals are neither stored in
+        the monitors nor kept outside the captures, so memory is bounded by
+        the captures however long the run. The run stops after max_captures
+        captures, or if the network oscillates (then network.steady_state is
+        False). Return a list of [first cycle, trigger cycle, signals] for
+        each capture, where the cycles count from the start of the run and
+        signals is an array with one row per monitor, in the order of
+        monitor_rows, and one column per cycle from the first cycle.
+        """
+        if pre < 0 or post < 0:
+            raise ValueError("Expected pre and post to be non-negative.")
+        if isinstance(trigger, str):
+            trigger = self.compile_predicate(trigger)
+        sources = self.get_sources()
+        signal_type = self.signal_array.dtype
+        # history holds the last pre + 1 cycles, cycle c in column
+        # c % (pre + 1)
+        history = np.empty((len(sources), pre + 1), dtype=signal_type)
+        captures = []
+        capture = None  # [first cycle, trigger cycle, signals, columns]
+        armed = True  # False while the trigger is true
+        for cycle in range(cycles):
+            if not self.network.execute_network():
+                break
+            column = cycle % (pre + 1)
+            history[:, column] = [outputs[output_id]
+                                  for outputs, output_id in sources]
+            triggered = trigger()
+            if capture is not None:
+                capture[2][:, capture[3]] = history[:, column]
+                capture[3] += 1
+            elif triggered and armed:
+                kept = min(cycle, pre)  # cycles kept before the trigger
+                signals = np.empty((len(sources), kept + 1 + post),
+                                   dtype=signal_type)
+                signals[:, :kept + 1] = history[:, np.arange(
+                    cycle - kept, cycle + 1) % (pre + 1)]
+                capture = [cycle - kept, cycle, signals, kept + 1]
+            armed = not triggered
+            if capture is not None and capture[3] == capture[2].shape[1]:
+                captures.append(capture[:3])
+                capture = None
+                if len(captures) == max_captures:
+                    break
+        if capture is not None:  # the run ended during the capture
+            captures.append([capture[0], capture[1],
+                             capture[2][:, :capture[3]]])
+        return captures
+
+    def unshare_traces(self):
+        """Give this instance its own copy of the signal store."""
+        self.signal_array = self.signal_array.copy()
+        self.traces_shared = False
+
+    def fork(self, network=None):
+        """Return a copy of the monitors running on a fork of the network.
+
+        If network is None, the network is forked too. The signal store is
+        shared until either copy records new signals, at which point that
+        copy makes its own store (copy-on-write). Run-length encoded traces
+        are small, so they are copied straight away.
+        """
+        forked_monitors = copy.copy(self)
+        if network is None:
+            network = self.network.fork()
+        forked_monitors.network = network
+        forked_monitors.devices = network.devices
+        forked_monitors.monitor_rows = collections.OrderedDict(
+            self.monitor_rows)
+        forked_monitors.traces = {monitor: copy.deepcopy(trace)
+                                  for monitor, trace in self.traces.items()}
+        forked_monitors.sources = None
+        forked_monitors.pyramid = None
+        forked_monitors.traces_shared = True
+        self.traces_shared = True
+        return forked_monitors
@@ -0,0 +1,207 @@
+"""Analyse how a circuit depends on its random cold start-up state.
+
+Used in the Logic Simulator project to simulate a circuit from many random
+initial states at once and collect statistics of its monitored signals, to
+expose behaviour that depends on how the circuit happened to start up.
+
+Classes
+-------
+MonteCarlo - simulates a circuit from many random cold start-up states.
+"""
+import random
+
+import numpy as np
+
+from main_project.bitparallel import BitParallel
+
+
+class MonteCarlo:
+
+    """Simulate a circuit from many random cold start-up states.
+
+    Each sample starts from the current state of the network after
+    devices.cold_startup, which gives random D-type memories and clocks and
+    signal generators at random points in their cycles, and is driven by the
+    current switch states and the network's stimulus from cycle 0. Circuits
+    that bitparallel.BitParallel supports are simulated with all the samples
+    at once; the others run one fork of the network per sample. Both draw
+    the same start-up states for the same seed and give the same traces.
+
+    For each monitored single-bit signal, the statistics hold the
+    probability that it is HIGH at each cycle and the distribution of the
+    settle time: the first cycle from which a sample agrees with the most
+    common value of every later cycle. Samples that differ from the majority
+    at the last cycle never settle.
+
+    Parameters
+    ----------
+    monitors: instance of the monitors.Monitors() class.
+    samples: number of random start-up states.
+    seed: seed of the random start-up states, for reproducible results.
+
+    Public methods
+    --------------
+    get_signal_names(self): Returns the names of the analysed signals.
+
+    run_bitparallel(self, cycles): Simulates all the samples at once and
+                                   returns their signal traces.
+
+    run_forks(self, cycles): Simulates each sample on a fork of the network
+                             and returns their signal traces.
+
+    get_statistics(self, traces): Returns the statistics of signal traces.
+
+    run(self, cycles): Simulates the samples for the given number of cycles
+                       and returns the statistics of each signal.
+    """
+
+    def __init__(self, monitors, samples=4096, seed=None):
+        """Store the circuit and the sampling parameters."""
+        if samples <= 0:
+            raise ValueError("Expected samples to be a positive integer.")
+        self.monitors = monitors
+        self.devices = monitors.devices
+        self.network = monitors.network
+        self.samples = samples
+        self.seed = seed
+
+        # signals stores the monitored single-bit (device_id, output_id)
+        self.signals = []
+        for device_id, output_id in monitors.monitor_rows:
+            device = self.devices.get_device(device_id)
+            if device.bus_widths.get(output_id) is None:
+                self.signals.append((device_id, output_id))
+
+    def get_signal_names(self):
+        """Return the names of the analysed signals."""
+        return [self.devices.get_signal_name(device_id, output_id)
+                for device_id, output_id in self.signals]
+
+    def get_stimulus(self):
+        """Return a fork of the devices and of the network's stimulus.
+
+        The stimulus restarts from cycle 0 and sets the switches of the
+        forked devices, which then hold the switch states of each cycle.
+        """
+        devices = self.devices.fork()
+        stimulus = self.network.stimulus
+        if stimulus is not None:
+            stimulus = stimulus.fork(devices)
+            stimulus.reset()
+        return [devices, stimulus]
+
+    def run_bitparallel(self, cycles):
+        """Simulate all the samples at once.
+
+        Return a list of traces, one per signal, holding an int per cycle
+        with bit i set if the signal is HIGH in sample i. Raise ValueError if
+        the circuit has devices that cannot be simulated bit-parallel.
+        """
+        engine = BitParallel(self.devices, self.samples)
+
+        # Draw the start-up state of each sample with cold_startup, in the
+        # same order as run_forks, and load it into the lanes of the engine
+        generator = random.Random(self.seed)
+        startup_devices = self.devices.fork()
+        d_type_ids = startup_devices.find_devices(self.devices.D_TYPE)
+        phase_ids = (startup_devices.find_devices(self.devices.CLOCK) +
+                     startup_devices.find_devices(self.devices.SIGGEN))
+        memories = np.empty((len(d_type_ids), self.samples), dtype=bool)
+        phases = np.empty((len(phase_ids), self.samples), dtype=np.int64)
+        for sample in range(self.samples):
+            startup_devices.cold_startup(generator)
+            for row, device_id in enumerate(d_type_ids):
+                memories[row, sample] = startup_devices.get_device(
+                    device_id).dtype_memory == self.devices.HIGH
+            for row, device_id in enumerate(phase_ids):
+                device = startup_devices.get_device(device_id)
+                phases[row, sample] = device.clock_counter
+                if (device.device_kind == self.devices.CLOCK and
+                        device.outputs[None] == self.devices.HIGH):
+                    phases[row, sample] += device.clock_half_period
+        for device_id, lanes in zip(d_type_ids, memories):
+            engine.set_memory(device_id, engine.get_lanes_mask(lanes))
+        for device_id, device_phases in zip(phase_ids, phases):
+            engine.set_phases(device_id, device_phases)
+
+        [switch_devices, stimulus] = self.get_stimulus()
+        switch_ids = switch_devices.find_devices(self.devices.SWITCH)
+        traces = [[] for signal in self.signals]
+        for cycle in range(cycles):
+            if stimulus is not None and cycle >= stimulus.next_cycle:
+                stimulus.apply(cycle)
+            for switch_id in switch_ids:
+                switch_state = switch_devices.get_device(
+                    switch_id).switch_state
+                engine.set_switch(switch_id, -switch_state)
+            engine.step()
+            for trace, signal in zip(traces, self.signals):
+                trace.append(engine.get_signal(*signal))
+        return traces
+
+    def run_forks(self, cycles):
+        """Simulate each sample on a fork of the network.
+
+        Return the traces in the same form as run_bitparallel. Signals that
+        are not HIGH (including during oscillation) count as LOW.
+        """
+        generator = random.Random(self.seed)
+        traces = [[0] * cycles for signal in self.signals]
+        for sample in range(self.samples):
+            network = self.network.fork()
+            network.cycle = 0
+            if network.stimulus is not None:
+                network.stimulus.reset()
+            network.devices.cold_startup(generator)
+            for cycle in range(cycles):
+                network.execute_network()
+                for trace, (device_id, output_id) in zip(traces,
+                                                         self.signals):
+                    device = network.devices.get_device(device_id)
+                    if device.outputs[output_id] == self.devices.HIGH:
+                        trace[cycle] |= 1 << sample
+        return traces
+
+    def get_statistics(self, traces):
+        """Return the statistics of the signal traces.
+
+        Return a dictionary {signal name: {"high": array, "settle": array}}
+        where "high" holds the probability that the signal is HIGH at each
+        cycle and "settle" holds the number of samples settling at each
+        cycle, with a last entry for the samples that never settle.
+        """
+        mask = (1 << self.samples) - 1
+        statistics = {}
+        for name, trace in zip(self.get_signal_names(), traces):
+            cycles = len(trace)
+            high = np.array([bin(value).count("1") for value in trace],
+                            dtype=float) / self.samples
+            # settled holds the samples agreeing with the majority from the
+            # current cycle to the end, working back from the last cycle
+            settled = mask
+            settled_from = [0] * cycles
+            for cycle in range(cycles - 1, -1, -1):
+                value = trace[cycle]
+                if 2 * bin(value).count("1") > self.samples:
+                    value ^= mask  # samples that differ from a HIGH majority
+                settled &= ~value
+                settled_from[cycle] = settled
+            settle = np.zeros(cycles + 1, dtype=np.int64)
+            previous = 0
+            for cycle in range(cycles):
+                settle[cycle] = bin(settled_from[cycle] & ~previous).count("1")
+                previous = settled_from[cycle]
+            settle[cycles] = self.samples - bin(previous).count("1")
+            statistics[name] = {"high": high, "settle": settle}
+        return statistics
+
+    def run(self, cycles):
+        """Simulate the samples for the given number of cycles.
+
+        Return the statistics of each signal (see get_statistics).
+        """
+        try:
+            traces = self.run_bitparallel(cycles)
+        except ValueError:
+            traces = self.run_forks(cycles)
+        return self.get_statistics(traces)
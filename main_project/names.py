@@ -43,6 +43,9 @@ class Names:
         self.error_code_count = 0  # how many error codes have been declared
 
         self.names = []
+        # name_index stores {name_string: name_id}, so lookups take constant
+        # time however many names there are
+        self.name_index = {}
 
     def unique_error_codes(self, num_error_codes):
         """Return a list of unique integer error codes."""
@@ -63,10 +66,7 @@ class Names:
         if name_string.isdigit():
             raise SyntaxError("name must be string")
 
-        if name_string in self.names:
-            return self.names.index(name_string)
-        else:
-            return None
+        return self.name_index.get(name_string)
 
     def lookup(self, name_string_list):
         """Return a list of name IDs for each name string in name_string_list.
@@ -76,11 +76,14 @@ class Names:
         if type(name_string_list) is not list:
             raise TypeError("Lookup function argument must be a list")
         id_list = []
+        name_index = self.name_index
         for name_string in name_string_list:
-            if name_string not in self.names:
+            name_id = name_index.get(name_string)
+            if name_id is None:
+                name_id = name_index[name_string] = len(self.names)
                 self.names.append(name_string)
 
-            id_list.append(self.names.index(name_string))
+            id_list.append(name_id)
 
         return id_list
 
@@ -6,6 +6,11 @@ Classes
 --------
 Network - builds and executes the network.
 """
+import copy
+import functools
+import time
+
+import numpy as np
 
 
 class Network:
@@ -35,11 +40,17 @@ class Network:
                     second_port_id): Connects the first device to the second
                                      device.
 
+    make_connections(self, connection_list): Makes many connections and
+                                             returns all the errors.
+
     check_network(self): Checks if all inputs in the network are connected.
 
     update_signal(self, signal, target): Updates the signal in the direction of
                                          the target.
 
+    update_signals(self, signals, targets): Updates an array of signals in the
+                                            direction of their targets.
+
     invert_signal(self, signal): Returns the inverse of the signal if the
                                  signal is HIGH or LOW.
 
@@ -51,6 +62,40 @@ class Network:
     execute_d_type(self, device_id): Simulates a D-type device and updates its
                                      output signal value.
 
+    execute_lut(self, device_id): Simulates a truth-table device and updates
+                                  its output signal value.
+
+    lut_lookup(self, lut_table, input_signals): Returns the truth-table
+                              outputs for arrays of input signals.
+
+    update_bus(self, device, output_id, value): Sets the value of a bus
+                                                output.
+
+    execute_sequential_bus(self, device_id, next_state): Simulates a clocked
+                              word-level device.
+
+    execute_register(self, device_id): Simulates a register.
+
+    execute_counter(self, device_id): Simulates a counter.
+
+    execute_lfsr(self, device_id): Simulates a linear feedback shift register.
+
+    get_bus_inputs(self, device_id, input_ids): Returns the values at the
+                                                given inputs.
+
+    execute_adder(self, device_id): Simulates an adder.
+
+    execute_comparator(self, device_id): Simulates a comparator.
+
+    execute_mux(self, device_id): Simulates a multiplexer.
+
+    read_memory(self, device, address): Returns the word at the given address
+                                        of a memory device.
+
+    execute_ram(self, device_id): Simulates a RAM.
+
+    execute_rom(self, device_id): Simulates a ROM.
+
     execute_clock(self, device_id): Simulates a clock and updates its output
                                     signal value.
 
@@ -59,6 +104,10 @@ class Network:
 
     execute_network(self): Executes all the devices in the network for one
                            simulation cycle.
+
+    reset_stimulus(self): Restarts the cycle count and the stimulus schedule.
+
+    fork(self): Returns a copy of the network for what-if simulation.
     """
 
     def __init__(self, names, devices):
@@ -69,8 +118,82 @@ class Network:
         [self.NO_ERROR, self.INPUT_TO_INPUT, self.OUTPUT_TO_OUTPUT,
          self.INPUT_CONNECTED, self.PORT_ABSENT,
          self.DEVICE_ABSENT] = self.names.unique_error_codes(6)
+        # Bus ports can only be connected to bus ports of the same width
+        [self.WIDTH_MISMATCH] = self.names.unique_error_codes(1)
         self.steady_state = True  # for checking if signals have settled
 
+        # Logic level of each signal (LOW, HIGH, RISING, FALLING, BLANK) when
+        # it is used as a truth-table input
+        self.signal_levels = np.array([0, 1, 1, 0, 0], dtype=np.intp)
+
+        # transitions[signal][target] is the signal after one update towards
+        # the target, or None if the signal cannot be updated (BLANK). Any
+        # target other than LOW drives the signal HIGH.
+        LOW, HIGH, RISING, FALLING, BLANK = (
+            self.devices.LOW, self.devices.HIGH, self.devices.RISING,
+            self.devices.FALLING, self.devices.BLANK)
+        self.transitions = [None] * 5
+        for signal in [LOW, FALLING]:
+            self.transitions[signal] = [RISING] * 5
+            self.transitions[signal][LOW] = LOW
+        for signal in [HIGH, RISING]:
+            self.transitions[signal] = [HIGH] * 5
+            self.transitions[signal][LOW] = FALLING
+        self.transitions[BLANK] = [None] * 5
+        # The same table as an array for updating many signals at once, with
+        # BLANK marking the signals that cannot be updated
+        self.transition_table = np.array(
+            [[BLANK if new_signal is None else new_signal
+              for new_signal in row] for row in self.transitions],
+            dtype=np.uint8)
+
+        # Set to a profiler.Profiler() instance to collect timings and
+        # counters from the simulation loop
+        self.profiler = None
+
+        # Number of cycles executed, and an optional stimulus.Stimulus()
+        # instance whose switch changes are applied at the start of a cycle
+        self.cycle = 0
+        self.stimulus = None
+
+        # Attach the evaluators of the built-in device kinds to the kinds
+        # table. Evaluators take (network, device_id), so forks of the
+        # network can share the table.
+        HIGH = self.devices.HIGH
+        LOW = self.devices.LOW
+        builtin_evaluators = {
+            self.devices.SWITCH: Network.execute_switch,
+            self.devices.SIGGEN: Network.execute_siggen,
+            self.devices.D_TYPE: Network.execute_d_type,
+            self.devices.CLOCK: Network.execute_clock,
+            # Gates output y if all their inputs are x, see execute_gate
+            self.devices.AND: functools.partial(Network.execute_gate,
+                                                x=HIGH, y=HIGH),
+            self.devices.OR: functools.partial(Network.execute_gate,
+                                               x=LOW, y=LOW),
+            self.devices.NAND: functools.partial(Network.execute_gate,
+                                                 x=HIGH, y=LOW),
+            self.devices.NOR: functools.partial(Network.execute_gate,
+                                                x=LOW, y=HIGH),
+            self.devices.XOR: functools.partial(Network.execute_gate,
+                                                x=None, y=None),
+            self.devices.NOT: functools.partial(Network.execute_gate,
+                                                x=HIGH, y=LOW),
+            self.devices.LUT: Network.execute_lut,
+            self.devices.REGISTER: Network.execute_register,
+            self.devices.COUNTER: Network.execute_counter,
+            self.devices.LFSR: Network.execute_lfsr,
+            self.devices.ADDER: Network.execute_adder,
+            self.devices.COMPARATOR: Network.execute_comparator,
+            self.devices.MUX: Network.execute_mux,
+            self.devices.RAM: Network.execute_ram,
+            self.devices.ROM: Network.execute_rom}
+        for device_kind, evaluator in builtin_evaluators.items():
+            kind = self.devices.kinds[device_kind]
+            if kind.evaluator is None:
+                kind.evaluator = evaluator
+        self.devices.schedule = None  # the evaluators have changed
+
     def get_connected_output(self, device_id, input_id):
         """Return the output connected to the given input.
 
@@ -128,6 +251,10 @@ class Network:
                 # Both ports are inputs
                 error_type = self.INPUT_TO_INPUT
             elif second_port_id in second_device.outputs:
+                if (first_device.bus_widths.get(first_port_id) !=
+                        second_device.bus_widths.get(second_port_id)):
+                    error_type = self.WIDTH_MISMATCH
+                    return error_type
                 # Make connection
                 first_device.inputs[first_port_id] = (second_device_id,
                                                       second_port_id)
@@ -144,6 +271,9 @@ class Network:
                 if second_device.inputs[second_port_id] is not None:
                     # Input is already in a connection
                     error_type = self.INPUT_CONNECTED
+                elif (first_device.bus_widths.get(first_port_id) !=
+                      second_device.bus_widths.get(second_port_id)):
+                    error_type = self.WIDTH_MISMATCH
                 else:
                     second_device.inputs[second_port_id] = (first_device_id,
                                                             first_port_id)
@@ -156,6 +286,23 @@ class Network:
 
         return error_type
 
+    def make_connections(self, connection_list):
+        """Make the connections in connection_list.
+
+        connection_list is an iterable of (first_device_id, first_port_id,
+        second_device_id, second_port_id) tuples, as taken by
+        make_connection. Every connection is attempted, so all the errors are
+        found at once. Return a list of (position, error) pairs for the
+        connections that could not be made, which is empty if all were.
+        """
+        errors = []
+        make_connection = self.make_connection
+        for position, connection in enumerate(connection_list):
+            error_type = make_connection(*connection)
+            if error_type != self.NO_ERROR:
+                errors.append((position, error_type))
+        return errors
+
     def check_network(self):
         """Return True if all inputs in the network are connected."""
         for device_id in self.devices.find_devices():
@@ -171,22 +318,35 @@ class Network:
         Return updated signal, and set steady_state to false if the new signal
         is different from the old signal.
         """
-        if signal in [self.devices.LOW, self.devices.FALLING]:
-            if target == self.devices.LOW:
-                new_signal = self.devices.LOW
-            else:
-                new_signal = self.devices.RISING
-        elif signal in [self.devices.HIGH, self.devices.RISING]:
-            if target == self.devices.LOW:
-                new_signal = self.devices.FALLING
-            else:
-                new_signal = self.devices.HIGH
-        else:
+        if signal not in self.devices.signal_types:  # not a valid signal
+            return None
+        if target != self.devices.LOW:  # any other target drives HIGH
+            target = self.devices.HIGH
+        new_signal = self.transitions[signal][target]
+        if new_signal is None:
             return None
         if signal != new_signal:
             self.steady_state = False
         return new_signal
 
+    def update_signals(self, signals, targets):
+        """Update an array of signals in the direction of their targets.
+
+        signals and targets are NumPy integer arrays of the same shape.
+        Return the array of updated signals, and set steady_state to false if
+        any of them has changed. Return None if any signal cannot be updated.
+        As for update_signal, any target other than LOW drives the signal
+        HIGH.
+        """
+        targets = np.where(targets == self.devices.LOW, self.devices.LOW,
+                           self.devices.HIGH)
+        new_signals = self.transition_table[signals, targets]
+        if np.any(new_signals == self.devices.BLANK):
+            return None
+        if np.any(new_signals != signals):
+            self.steady_state = False
+        return new_signals
+
     def invert_signal(self, signal):
         """Return the inverse of the signal if the signal is HIGH or LOW.
 
@@ -303,6 +463,237 @@ class Network:
 
         return True
 
+    def execute_lut(self, device_id):
+        """Simulate a truth-table (LUT) device and update its output signal.
+
+        The logic levels of the inputs are packed into an index into the
+        truth table, with I1 as the least significant bit. Return True if
+        successful.
+        """
+        device = self.devices.get_device(device_id)
+        if device.lut_table is None:  # the table has not been set
+            return False
+        index = 0
+        bit = 1
+        for input_id in device.inputs:
+            input_signal = self.get_input_signal(device_id, input_id)
+            if input_signal is None:  # this input is unconnected
+                return False
+            if input_signal in [self.devices.HIGH, self.devices.RISING]:
+                index |= bit
+            bit <<= 1
+
+        # Update and store the new signal
+        signal = self.get_output_signal(device_id, None)
+        target = int(device.lut_table[index])
+        updated_signal = self.update_signal(signal, target)
+        if updated_signal is None:  # if the update is unsuccessful
+            return False
+        device.outputs[None] = updated_signal
+        return True
+
+    def lut_lookup(self, lut_table, input_signals):
+        """Return the truth-table outputs for the given input signals.
+
+        input_signals holds one NumPy array of signals per input, I1 first.
+        All the input patterns are looked up at once and the outputs are
+        returned as an array of the same shape.
+        """
+        index = np.zeros(np.shape(input_signals[0]), dtype=np.intp)
+        for bit, signals in enumerate(input_signals):
+            index |= self.signal_levels[signals] << bit
+        return lut_table[index]
+
+    def update_bus(self, device, output_id, value):
+        """Set the value of a bus output.
+
+        Set steady_state to False if the new value is different from the old
+        value.
+        """
+        if device.outputs[output_id] != value:
+            device.outputs[output_id] = value
+            self.steady_state = False
+
+    def execute_sequential_bus(self, device_id, next_state):
+        """Simulate a clocked word-level device.
+
+        When CLK is RISING the state is set to next_state(device), which may
+        read the inputs, and the outputs are left unchanged until the next
+        execution. All the clocked devices therefore sample their inputs
+        before any of their outputs change. Return True if successful.
+        """
+        device = self.devices.get_device(device_id)
+        clock_signal = self.get_input_signal(device_id, self.devices.CLK_ID)
+        if clock_signal is None:  # CLK is unconnected
+            return False
+        if clock_signal == self.devices.RISING:
+            state = next_state(device)
+            if state is None:  # an input is unconnected
+                return False
+            device.bus_memory = state
+            self.steady_state = False  # outputs are updated next iteration
+        else:
+            self.update_bus(device, None, device.bus_memory)
+        return True
+
+    def execute_register(self, device_id):
+        """Simulate a register and update its output value.
+
+        The register stores the DATA bus on each rising edge of CLK. Return
+        True if successful.
+        """
+        return self.execute_sequential_bus(
+            device_id, lambda device: self.get_input_signal(
+                device.device_id, self.devices.DATA_ID))
+
+    def execute_counter(self, device_id):
+        """Simulate a counter and update its output value.
+
+        The count is incremented, modulo 2**width, on each rising edge of
+        CLK. Return True if successful.
+        """
+        def next_state(device):
+            mask = (1 << device.bus_widths[None]) - 1
+            return (device.bus_memory + 1) & mask
+        return self.execute_sequential_bus(device_id, next_state)
+
+    def execute_lfsr(self, device_id):
+        """Simulate a linear feedback shift register and update its output.
+
+        On each rising edge of CLK, the state is shifted left by one bit and
+        the parity of the tap bits is shifted in. Return True if successful.
+        """
+        def next_state(device):
+            mask = (1 << device.bus_widths[None]) - 1
+            feedback = bin(device.bus_memory & device.lfsr_taps).count("1") & 1
+            return ((device.bus_memory << 1) | feedback) & mask
+        return self.execute_sequential_bus(device_id, next_state)
+
+    def get_bus_inputs(self, device_id, input_ids):
+        """Return the values at the given inputs, or None if any is
+        unconnected."""
+        values = []
+        for input_id in input_ids:
+            value = self.get_input_signal(device_id, input_id)
+            if value is None:  # this input is unconnected
+                return None
+            values.append(value)
+        return values
+
+    def execute_adder(self, device_id):
+        """Simulate an adder and update its output values.
+
+        The output (ID None) is A + B modulo 2**width, and COUT is HIGH if
+        the sum overflows. Return True if successful.
+        """
+        device = self.devices.get_device(device_id)
+        values = self.get_bus_inputs(device_id, [self.devices.A_ID,
+                                                 self.devices.B_ID])
+        if values is None:
+            return False
+        width = device.bus_widths[None]
+        total = values[0] + values[1]
+        self.update_bus(device, None, total & ((1 << width) - 1))
+
+        carry = self.devices.HIGH if total >> width else self.devices.LOW
+        signal = device.outputs[self.devices.COUT_ID]
+        updated_signal = self.update_signal(signal, carry)
+        if updated_signal is None:  # if the update is unsuccessful
+            return False
+        device.outputs[self.devices.COUT_ID] = updated_signal
+        return True
+
+    def execute_comparator(self, device_id):
+        """Simulate a comparator and update its output signals.
+
+        EQ, LT and GT are HIGH if A is equal to, less than or greater than B
+        respectively. Return True if successful.
+        """
+        device = self.devices.get_device(device_id)
+        values = self.get_bus_inputs(device_id, [self.devices.A_ID,
+                                                 self.devices.B_ID])
+        if values is None:
+            return False
+        [a, b] = values
+        results = {self.devices.EQ_ID: a == b, self.devices.LT_ID: a < b,
+                   self.devices.GT_ID: a > b}
+        for output_id, result in results.items():
+            target = self.devices.HIGH if result else self.devices.LOW
+            updated_signal = self.update_signal(device.outputs[output_id],
+                                                target)
+            if updated_signal is None:  # if the update is unsuccessful
+                return False
+            device.outputs[output_id] = updated_signal
+        return True
+
+    def execute_mux(self, device_id):
+        """Simulate a multiplexer and update its output value.
+
+        The output is bus A if SEL is LOW and bus B if SEL is HIGH. Return
+        True if successful.
+        """
+        device = self.devices.get_device(device_id)
+        values = self.get_bus_inputs(device_id, [self.devices.SEL_ID,
+                                                 self.devices.A_ID,
+                                                 self.devices.B_ID])
+        if values is None:
+            return False
+        [select, a, b] = values
+        if select in [self.devices.HIGH, self.devices.RISING]:
+            self.update_bus(device, None, b)
+        else:
+            self.update_bus(device, None, a)
+        return True
+
+    def read_memory(self, device, address):
+        """Return the word at the given address of a memory device.
+
+        Addresses past the end of the memory read as 0.
+        """
+        if address >= len(device.memory):
+            return 0
+        mask = (1 << device.bus_widths[None]) - 1
+        return int(device.memory[address]) & mask
+
+    def execute_ram(self, device_id):
+        """Simulate a RAM and update its output value.
+
+        When CLK is RISING and WE is HIGH, the DATA bus is stored at the
+        address on the ADDR bus and the output is left unchanged until the
+        next execution, as for the other clocked devices. Otherwise the
+        output is set to the word at the address. Return True if successful.
+        """
+        device = self.devices.get_device(device_id)
+        values = self.get_bus_inputs(device_id, [self.devices.CLK_ID,
+                                                 self.devices.ADDR_ID,
+                                                 self.devices.DATA_ID,
+                                                 self.devices.WE_ID])
+        if values is None:
+            return False
+        [clock_signal, address, data, write_enable] = values
+        if clock_signal == self.devices.RISING:
+            # the level of WE before the edge, as for the D-type DATA input
+            if write_enable in [self.devices.HIGH, self.devices.FALLING]:
+                if address < len(device.memory):
+                    device.write_memory(address, data)
+                self.steady_state = False  # output is updated next iteration
+        else:
+            self.update_bus(device, None, self.read_memory(device, address))
+        return True
+
+    def execute_rom(self, device_id):
+        """Simulate a ROM and update its output value.
+
+        The output is the word at the address on the ADDR bus. Return True
+        if successful.
+        """
+        device = self.devices.get_device(device_id)
+        address = self.get_input_signal(device_id, self.devices.ADDR_ID)
+        if address is None:  # ADDR is unconnected
+            return False
+        self.update_bus(device, None, self.read_memory(device, address))
+        return True
+
     def execute_clock(self, device_id):
         """Simulate a clock and update its output signal value.
 
@@ -337,9 +728,12 @@ class Network:
         Return True if successful.
         """
         device = self.devices.get_device(device_id)
-        device.clock_counter = (device.clock_counter + 1) % len(device.trace)
-        # output ID is None
-        output_signal = int(device.trace[device.clock_counter])
+        counter = device.clock_counter + 1
+        if counter == device.trace_length:
+            counter = 0
+        device.clock_counter = counter
+        # output ID is None. The trace is bit-packed, 8 cycles per byte.
+        output_signal = device.trace[counter >> 3] >> (counter & 7) & 1
         # could use the update_signal function instead to have 'rising and falling' edges
         device.outputs[None] = output_signal
 
@@ -347,7 +741,7 @@ class Network:
 
     def update_clocks(self):
         """If it is time to do so, set clock signals to RISING or FALLING."""
-        clock_devices = self.devices.find_devices(self.devices.CLOCK)
+        clock_devices = self.devices.kind_groups.get(self.devices.CLOCK, [])
         for device_id in clock_devices:
             device = self.devices.get_device(device_id)
             if device.clock_counter == device.clock_half_period:
@@ -365,62 +759,79 @@ class Network:
 
         Return True if successful and the network does not oscillate.
         """
-        clock_devices = self.devices.find_devices(self.devices.CLOCK)
-        switch_devices = self.devices.find_devices(self.devices.SWITCH)
-        d_type_devices = self.devices.find_devices(self.devices.D_TYPE)
-        siggen_devices = self.devices.find_devices(self.devices.SIGGEN)
-        and_devices = self.devices.find_devices(self.devices.AND)
-        or_devices = self.devices.find_devices(self.devices.OR)
-        nand_devices = self.devices.find_devices(self.devices.NAND)
-        nor_devices = self.devices.find_devices(self.devices.NOR)
-        xor_devices = self.devices.find_devices(self.devices.XOR)
+        # Devices are executed one kind at a time, in the order of the kinds
+        # table. Each entry is (device_kind, device_ids, evaluator).
+        schedule = self.devices.get_schedule()
+
+        # Apply the scheduled switch changes, if any are due
+        stimulus = self.stimulus
+        if stimulus is not None and self.cycle >= stimulus.next_cycle:
+            stimulus.apply(self.cycle)
+        self.cycle += 1
+
+        profiler = self.profiler
+        if profiler is not None:
+            start_time = time.perf_counter()
 
         # This sets clock signals to RISING or FALLING, where necessary
         self.update_clocks()
 
+        if profiler is not None:
+            profiler.add_phase_time("update_clocks",
+                                    time.perf_counter() - start_time)
+            start_time = time.perf_counter()
+            evaluations = 0
+
         # Number of iterations to wait for the signals to settle before
         # declaring the network unstable
         iteration_limit = 20
 
         iterations = 0
-        while iterations < iteration_limit:
-            iterations += 1
-            self.steady_state = True
+        try:
+            while iterations < iteration_limit:
+                iterations += 1
+                self.steady_state = True
+
+                for device_kind, device_ids, evaluator in schedule:
+                    if profiler is not None:
+                        kind_start_time = time.perf_counter()
+                    for device_id in device_ids:
+                        if not evaluator(self, device_id):
+                            return False
+                    if profiler is not None:
+                        profiler.add_kind_time(
+                            device_kind,
+                            time.perf_counter() - kind_start_time,
+                            len(device_ids))
+                        evaluations += len(device_ids)
+
+                if self.steady_state:
+                    break
+        finally:
+            # The cycle is counted even if a device could not be executed
+            if profiler is not None:
+                profiler.add_phase_time("settle",
+                                        time.perf_counter() - start_time)
+                profiler.end_cycle(iterations, evaluations)
+        return self.steady_state
 
-            for device_id in switch_devices:  # execute switch devices
-                if not self.execute_switch(device_id):
-                    return False
-            # Execute D-type devices before clocks to catch the rising edge of
-            # the clock
-            for device_id in siggen_devices:  # execute XOR devices
-                if not self.execute_siggen(device_id):
-                    return False
-            for device_id in d_type_devices:  # execute DTYPE devices
-                if not self.execute_d_type(device_id):
-                    return False
-            for device_id in clock_devices:  # complete clock executions
-                if not self.execute_clock(device_id):
-                    return False
-            for device_id in and_devices:  # execute AND gate devices
-                if not self.execute_gate(device_id, self.devices.HIGH,
-                                         self.devices.HIGH):
-                    return False
-            for device_id in or_devices:  # execute OR gate devices
-                if not self.execute_gate(device_id, self.devices.LOW,
-                                         self.devices.LOW):
-                    return False
-            for device_id in nand_devices:  # execute NAND gate devices
-                if not self.execute_gate(device_id, self.devices.HIGH,
-                                         self.devices.LOW):
-                    return False
-            for device_id in nor_devices:  # execute NOR gate devices
-                if not self.execute_gate(device_id, self.devices.LOW,
-                                         self.devices.HIGH):
-                    return False
-            for device_id in xor_devices:  # execute XOR devices
-                if not self.execute_gate(device_id, None, None):
-                    return False
+    def reset_stimulus(self):
+        """Restart the cycle count and the stimulus schedule from cycle 0."""
+        self.cycle = 0
+        if self.stimulus is not None:
+            self.stimulus.reset()
 
-            if self.steady_state:
-                break
-        return self.steady_state
+    def fork(self):
+        """Return a copy of the network for what-if simulation.
+
+        The copy runs on a fork of the devices, so it shares the netlist with
+        this network but its signals, switches, D-type memories, clocks and
+        stimulus schedule evolve independently from the current state
+        onwards.
+        """
+        forked_network = copy.copy(self)
+        forked_network.devices = self.devices.fork()
+        if self.stimulus is not None:
+            forked_network.stimulus = self.stimulus.fork(
+                forked_network.devices)
+        return forked_network
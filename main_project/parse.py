@@ -2,6 +2,7 @@ import re
 import sys
 
 from main_project.error import SyntaxError, SemanticError, ValueError, UnclassedError
+from main_project.stimulus import Stimulus
 
 """Parse the definition file and build the logic network.
 
@@ -32,13 +33,16 @@ class Parser:
     network: instance of the network.Network() class.
     monitors: instance of the monitors.Monitors() class.
     scanner: instance of the scanner.Scanner() class.
+    generator: seed or generator of the cold start-up of the devices (see
+               devices.Devices.cold_startup).
 
     Public methods
     --------------
     parse_network(self): Parses the circuit definition file.
     """
 
-    def __init__(self, names, devices, network, monitors, scanner):
+    def __init__(self, names, devices, network, monitors, scanner,
+                 generator=None):
         """Initialise constants."""
 
         self.scanner = scanner
@@ -46,6 +50,8 @@ class Parser:
         self.devices = devices
         self.network = network
         self.monitors = monitors
+        # Seed or generator of the cold start-up, see Devices.cold_startup
+        self.generator = generator
 
         self.symbol_type = None
         self.symbol_id = None
@@ -96,6 +102,13 @@ class Parser:
                         break
                     self.parse_section('monitor')
 
+                elif self.symbol.id == self.scanner.STIMULUS_ID:
+                    if not self.found_devices:
+                        self.error(SyntaxError, "Specifying stimulus before "
+                                   "devices is not allowed")
+                        break
+                    self.parse_section('stimulus')
+
                 else:
                     self.error(SyntaxError, "Heading name '{}' not allowed".format(
                         self.scanner.name_string))
@@ -109,6 +122,8 @@ class Parser:
                     self.scanner.input_file.close()
                 except AttributeError:
                     pass
+                # Start up the whole circuit at once, now it is built
+                self.devices.cold_startup(self.generator)
                 break
             else:
                 self.error(SyntaxError, "not allowed to write '{}' outside of section.Expected "
@@ -144,6 +159,10 @@ class Parser:
                 if i.outputs == {}:
                     self.error(SemanticError,
                                "Gate '{}' has no output".format(self.devices.names.get_name_string(i.device_id)))
+                if i.device_kind == self.devices.LUT and i.lut_table is None:
+                    self.error(SemanticError,
+                               "No table specified for LUT '{}'".format(
+                                   self.names.get_name_string(i.device_id)))
 
                 print("[name: {}, type: {}, num_inputs: {}, num_outputs: {}, trace: {}]"
                       .format(self.devices.names.get_name_string(i.device_id), self.names.get_name_string(i.device_kind), i.inputs, i.outputs, i.trace))
@@ -159,6 +178,12 @@ class Parser:
             while self.parse_monitor():
                 pass
 
+        elif heading == 'stimulus':
+            if self.network.stimulus is None:
+                self.network.stimulus = Stimulus(self.devices)
+            while self.parse_stimulus():
+                pass
+
         print("END OF SECTION")
 
     def parse_device(self):
@@ -208,6 +233,30 @@ class Parser:
 
                 elif self.symbol.id == self.devices.SIGGEN:
                     self.devices.add_device(i, self.symbol.id)
+
+                elif self.symbol.id == self.devices.LUT:
+                    # inputs and truth table are given as attributes
+                    self.devices.add_device(i, self.symbol.id)
+                    self.devices.add_output(i, None)
+
+                elif self.symbol.id in self.devices.bus_types:
+                    # the width can be changed with a width attribute
+                    self.devices.make_device(
+                        i, self.symbol.id, self.devices.default_bus_width)
+
+                elif self.symbol.id in self.devices.memory_types:
+                    # the depth and width can be changed with attributes
+                    self.devices.make_device(
+                        i, self.symbol.id, (self.devices.default_memory_depth,
+                                            self.devices.default_bus_width))
+
+                elif self.symbol.id in self.devices.kinds:
+                    # any other registered kind, made without a property
+                    status = self.devices.make_device(i, self.symbol.id)
+                    if status != self.devices.NO_ERROR:
+                        self.error(SemanticError,
+                                   "Device '{}' could not be created".format(
+                                       name))
                 else:
                     self.error(
                         SyntaxError, "Can't create device {} in this section".format(
@@ -250,6 +299,15 @@ class Parser:
                             self.error(
                                 SemanticError, "Not allowed to specify inputs for a DTYPE device")
 
+                        elif self.devices.get_device(ID).device_kind in (
+                                self.devices.bus_types +
+                                self.devices.memory_types):
+                            kind = self.devices.get_device(ID).device_kind
+                            self.error(SemanticError, "Not allowed to "
+                                       "specify inputs for a {} device"
+                                       .format(self.names.get_name_string(
+                                           kind)))
+
                         elif self.devices.get_device(ID).device_kind == self.devices.names.query("XOR"):
                             if num != 2:
                                 self.error(SemanticError,
@@ -295,6 +353,47 @@ class Parser:
                             self.devices.make_siggen(
                                 siggen.device_id, str(self.symbol.id[0]))
 
+                elif self.symbol.id == self.scanner.TABLE:
+                    self.symbol = self.scanner.get_symbol()
+                    if self.symbol.type == self.scanner.NUMBER:
+                        for device in devices:
+                            ID = self.devices.names.query(device)
+                            if self.devices.get_device(ID) is None:
+                                self.error(SemanticError, "Device '{}' does "
+                                           "not exist".format(device))
+                            elif not self.devices.set_lut_table(
+                                    ID, str(self.symbol.id[0])):
+                                self.error(SemanticError,
+                                           "Table of '{}' must have 2^n "
+                                           "entries for n inputs, given "
+                                           "after the inputs".format(device))
+
+                elif self.symbol.id == self.scanner.WIDTH:
+                    self.symbol = self.scanner.get_symbol()
+                    if self.symbol.type == self.scanner.NUMBER:
+                        for device in devices:
+                            ID = self.devices.names.query(device)
+                            if self.devices.get_device(ID) is None:
+                                self.error(SemanticError, "Device '{}' does "
+                                           "not exist".format(device))
+                            elif not self.devices.set_bus_width(
+                                    ID, int(self.symbol.id[0])):
+                                self.error(SemanticError, "Invalid width "
+                                           "for '{}'".format(device))
+
+                elif self.symbol.id == self.scanner.DEPTH:
+                    self.symbol = self.scanner.get_symbol()
+                    if self.symbol.type == self.scanner.NUMBER:
+                        for device in devices:
+                            ID = self.devices.names.query(device)
+                            if self.devices.get_device(ID) is None:
+                                self.error(SemanticError, "Device '{}' does "
+                                           "not exist".format(device))
+                            elif not self.devices.set_memory_depth(
+                                    ID, int(self.symbol.id[0])):
+                                self.error(SemanticError, "Invalid depth "
+                                           "for '{}'".format(device))
+
                 else:
                     self.error(SyntaxError, "Expected number")
 
@@ -352,24 +451,26 @@ class Parser:
                         self.scanner.name_string))
 
                 # ----- GET FIRST DEVICE PORT ----- #
-                elif first_device.device_kind == self.devices.D_TYPE:
-                    self.symbol = self.scanner.get_symbol()
-                    if self.symbol.type != self.scanner.DOT:
-                        self.error(
-                            SyntaxError, "DTYPE ports must be indexed using a dot")
-
+                else:
                     self.symbol = self.scanner.get_symbol()
-                    if self.symbol.id not in self.devices.dtype_output_ids:
-                        self.error(
-                            SyntaxError, "invalid output name for DTYPE device")
+                    if self.symbol.type == self.scanner.DOT:
+                        self.symbol = self.scanner.get_symbol()
+                        if self.symbol.id not in first_device.outputs:
+                            self.error(SyntaxError, "invalid output name for "
+                                       "device '{}'".format(
+                                           self.names.get_name_string(
+                                               first_device.device_id)))
+                        first_device_port_id = self.symbol.id
+                        self.symbol = self.scanner.get_symbol()
+
+                    elif first_device.device_kind == self.devices.D_TYPE:
+                        self.error(SyntaxError,
+                                   "DTYPE ports must be indexed using a dot")
 
-                    first_device_port_id = self.symbol.id
-
-                else:
-                    first_device_port_id = None
+                    else:
+                        first_device_port_id = None
 
                 # ----- NEXT WORD MUST BE 'TO' ----- #
-                self.symbol = self.scanner.get_symbol()
                 if self.symbol.id != self.scanner.TO:
                     self.error(
                         SyntaxError, "there should be a 'to' after the first device")
@@ -411,6 +512,9 @@ class Parser:
                     elif status == self.network.PORT_ABSENT:
                         self.error(SemanticError, "Invalid port index '{}'".format(
                             self.scanner.name_string))
+                    elif status == self.network.WIDTH_MISMATCH:
+                        self.error(SemanticError, "Bus widths of the "
+                                   "connected ports do not match")
                     elif status == self.network.NO_ERROR:
                         pass
                 else:
@@ -437,14 +541,16 @@ class Parser:
             if device is None:
                 self.error(SemanticError, "Undefined device '{}'".format(self.scanner.name_string))
                 
-            if device.device_kind == self.devices.D_TYPE:
+            if None not in device.outputs or len(device.outputs) > 1:
+                # named output ports, e.g. DTYPE Q and QBAR or ADDER COUT
                 device = self.symbol.id
                 self.symbol = self.scanner.get_symbol(query=True)
 
                 if self.symbol.type == self.scanner.DOT:
 
                     self.symbol = self.scanner.get_symbol(query=True)
-                    if self.symbol.id in self.devices.dtype_output_ids:
+                    outputs = self.devices.get_device(device).outputs
+                    if self.symbol.id in outputs:
 
                         status = self.monitors.make_monitor(
                             device, self.symbol.id)
@@ -460,10 +566,20 @@ class Parser:
                             pass
                     else:
                         self.error(
-                            SyntaxError, "Expected the name of a port (Q, QBAR)")
+                            SyntaxError, "Expected the name of an output port")
+
+                elif None in self.devices.get_device(device).outputs:
+                    # the symbol after the name has already been read
+                    status = self.monitors.make_monitor(device, None)
+                    if status == self.monitors.MONITOR_PRESENT:
+                        self.error(SemanticError,
+                                   "Already monitoring {}".format(
+                                       self.names.get_name_string(device)))
+                    if self.symbol.type == self.scanner.CURLY_CLOSE:
+                        return False
                 else:
                     self.error(
-                        SyntaxError, "Expected a dot to index a DTYPE port")
+                        SyntaxError, "Expected a dot to index an output port")
 
             else:
                 status = self.monitors.make_monitor(
@@ -485,6 +601,63 @@ class Parser:
                 self.scanner.name_string))
         return True
 
+    def parse_stimulus(self):
+        """Schedule switch changes by reading 1 line at a time"""
+        # FORMAT = S1, S2 set 1 at 10 every 20;
+
+        switches, definition = self.get_names_before_delimiter(
+            [], [self.scanner.SET])
+        if (definition and switches) is None:
+            return False
+
+        # ----- GET SWITCH VALUE ----- #
+        self.symbol = self.scanner.get_symbol()
+        if (self.symbol.type != self.scanner.NUMBER or
+                int(self.symbol.id[0]) not in [0, 1]):
+            self.error(SyntaxError,
+                       "Expected number 1 or 0 after word 'set'")
+        signal = int(self.symbol.id[0])
+
+        # ----- GET CYCLE AND OPTIONAL PERIOD ----- #
+        self.symbol = self.scanner.get_symbol()
+        if self.symbol.id != self.scanner.AT:
+            self.error(SyntaxError,
+                       "Expected word 'at' followed by a cycle number")
+        self.symbol = self.scanner.get_symbol()
+        if self.symbol.type != self.scanner.NUMBER:
+            self.error(SyntaxError,
+                       "Expected a cycle number after word 'at'")
+        cycle = int(self.symbol.id[0])
+
+        period = None
+        self.symbol = self.scanner.get_symbol()
+        if self.symbol.id == self.scanner.EVERY:
+            self.symbol = self.scanner.get_symbol()
+            if self.symbol.type != self.scanner.NUMBER:
+                self.error(SyntaxError, "Expected a number of cycles "
+                           "after word 'every'")
+            period = int(self.symbol.id[0])
+            self.symbol = self.scanner.get_symbol()
+
+        for switch in switches:
+            stimulus = self.network.stimulus
+            status = stimulus.add_event(self.names.query(switch), signal,
+                                        cycle, period)
+            if status == stimulus.NOT_SWITCH:
+                self.error(SemanticError,
+                           "Switch '{}' does not exist".format(switch))
+            elif status == stimulus.INVALID_SIGNAL:
+                self.error(SemanticError, "Switch '{}' can only be set to "
+                           "1 or 0".format(switch))
+            elif status == stimulus.INVALID_CYCLE:
+                self.error(SemanticError, "Repeating stimulus needs a "
+                           "period of at least 1")
+
+        if self.symbol.type != self.scanner.SEMICOLON:
+            self.error(SyntaxError, "Unexpected symbol encountered - maybe "
+                       "you missed a semicolon?")
+        return True
+
     def get_names_before_delimiter(self, true_delimiting_word_ids, false_delimiting_word_ids):
         """ 
         Tripwire function which takes 2 arrays of name_ids.
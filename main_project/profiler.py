@@ -0,0 +1,126 @@
+"""Collect timings and counters from the simulation loop.
+
+Used in the Logic Simulator project to find out where simulation time is
+spent. Profiling is opt-in: the network and the monitors only report to a
+profiler when one is attached to the network.
+
+Classes
+-------
+Profiler - collects timings and counters from the simulation loop.
+"""
+import collections
+
+
+class Profiler:
+
+    """Collect timings and counters from the simulation loop.
+
+    To profile a simulation, attach a profiler to the network with
+    network.profiler = Profiler(names), run the simulation, then read the
+    results with as_dict() or print(profiler.report()). Set network.profiler
+    back to None to stop profiling.
+
+    Parameters
+    ----------
+    names: instance of the names.Names() class.
+
+    Public methods
+    --------------
+    reset(self): Clears all timings and counters.
+
+    add_phase_time(self, phase, seconds): Adds time spent in a named phase of
+                                          the simulation cycle.
+
+    add_kind_time(self, device_kind, seconds, evaluations): Adds time spent
+                            executing devices of the specified kind.
+
+    end_cycle(self, iterations, evaluations): Records the settle iterations
+                      and device evaluations of a completed simulation cycle.
+
+    as_dict(self): Returns the results as a dictionary.
+
+    report(self): Returns the results as a printable string.
+    """
+
+    def __init__(self, names):
+        """Initialise the timings and counters."""
+        self.names = names
+        self.reset()
+
+    def reset(self):
+        """Clear all timings and counters."""
+        self.cycles = 0
+
+        # phase_times stores {phase_name: seconds}
+        self.phase_times = collections.OrderedDict()
+
+        # kind_times stores {device_kind: seconds} and kind_evaluations
+        # stores {device_kind: number of device executions}
+        self.kind_times = collections.OrderedDict()
+        self.kind_evaluations = collections.OrderedDict()
+
+        # Histograms store {value: number of cycles with that value}
+        self.settle_histogram = collections.Counter()
+        self.evaluations_histogram = collections.Counter()
+
+    def add_phase_time(self, phase, seconds):
+        """Add time spent in a named phase of the simulation cycle."""
+        self.phase_times[phase] = self.phase_times.get(phase, 0) + seconds
+
+    def add_kind_time(self, device_kind, seconds, evaluations):
+        """Add time spent executing devices of the specified kind."""
+        self.kind_times[device_kind] = \
+            self.kind_times.get(device_kind, 0) + seconds
+        self.kind_evaluations[device_kind] = \
+            self.kind_evaluations.get(device_kind, 0) + evaluations
+
+    def end_cycle(self, iterations, evaluations):
+        """Record the settle iterations and device evaluations of a cycle."""
+        self.cycles += 1
+        self.settle_histogram[iterations] += 1
+        self.evaluations_histogram[evaluations] += 1
+
+    def as_dict(self):
+        """Return the results as a dictionary.
+
+        Device kinds are given by their name strings and histograms are
+        sorted by value.
+        """
+        kinds = collections.OrderedDict()
+        for device_kind, seconds in self.kind_times.items():
+            kind_name = self.names.get_name_string(device_kind)
+            kinds[kind_name] = {
+                "seconds": seconds,
+                "evaluations": self.kind_evaluations[device_kind]}
+
+        return {
+            "cycles": self.cycles,
+            "phases": dict(self.phase_times),
+            "kinds": dict(kinds),
+            "settle_iterations": dict(sorted(self.settle_histogram.items())),
+            "devices_evaluated": dict(
+                sorted(self.evaluations_histogram.items()))}
+
+    def report(self):
+        """Return the results as a printable string."""
+        results = self.as_dict()
+        lines = ["Cycles simulated: {}".format(results["cycles"])]
+
+        lines.append("Time per phase:")
+        for phase, seconds in results["phases"].items():
+            lines.append("    {:<16}{:>12.6f} s".format(phase, seconds))
+
+        lines.append("Time per device kind:")
+        for kind_name, kind in results["kinds"].items():
+            lines.append("    {:<16}{:>12.6f} s {:>12} evaluations".format(
+                kind_name, kind["seconds"], kind["evaluations"]))
+
+        lines.append("Settle iterations per cycle:")
+        for iterations, cycles in results["settle_iterations"].items():
+            lines.append("    {:<16}{:>12} cycles".format(iterations, cycles))
+
+        lines.append("Devices evaluated per cycle:")
+        for evaluations, cycles in results["devices_evaluated"].items():
+            lines.append("    {:<16}{:>12} cycles".format(evaluations,
+                                                          cycles))
+        return "\n".join(lines)
@@ -0,0 +1,313 @@
+"""Replay recorded switch values from stimulus files.
+
+Used in the Logic Simulator project to drive the switches of a circuit from
+CSV, NumPy .npy or VCD files, for regression against recorded behaviour.
+
+Classes
+-------
+Replay - base class for stimulus file readers.
+CsvReplay - replays switch values from a CSV file.
+NpyReplay - replays switch values from a NumPy .npy file.
+VcdReplay - replays switch changes from a value change dump (VCD) file.
+"""
+import copy
+import itertools
+
+import numpy as np
+
+
+class Replay:
+
+    """Base class for stimulus file readers.
+
+    A replay is used like a stimulus.Stimulus(): attach it to the network with
+    network.stimulus = replay and the network calls apply() at the start of
+    every cycle. The file is read in chunks of switch changes as the
+    simulation reaches them, so memory use does not depend on the length of
+    the file, and the cycles without changes cost one comparison. Switch
+    states are written directly, without going through set_switch.
+
+    Subclasses implement read_events() for their file format.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    path: name of the stimulus file.
+    chunk: number of cycles (or changes, for VCD) read at a time.
+
+    Public methods
+    --------------
+    get_device(self, signal_name): Returns the device of the given signal
+                                   name, without adding names.
+
+    map_signals(self, signal_names): Returns the switch devices with the
+                                     given signal names.
+
+    check_values(self, block): Checks that a block of switch values holds
+                               only 0s and 1s.
+
+    read_events(self): Yields chunks of switch changes from the file.
+
+    reset(self): Restarts the replay from the start of the file.
+
+    next_chunk(self): Loads the next chunk of switch changes.
+
+    next_change(self): Moves on to the next switch change.
+
+    apply(self, cycle): Applies the switch changes due by the given cycle.
+
+    fork(self, devices): Returns a copy of the replay that sets the switches
+                         of the given devices.
+
+    get_changes(self, first_cycle, block, last_row): Returns the switch
+                         changes in a block of rows of switch values.
+    """
+
+    def __init__(self, devices, path, chunk=65536):
+        """Open the stimulus file at its first chunk."""
+        if chunk <= 0:
+            raise ValueError("Expected chunk to be a positive integer.")
+        self.devices = devices
+        self.path = path
+        self.chunk = chunk
+        # switches stores the switch device of each column of the file
+        self.switches = []
+        self.reset()
+
+    def get_device(self, signal_name):
+        """Return the device of the given signal name, or None.
+
+        The name is looked up with names.query, so unknown names are not
+        added to the names of the circuit.
+        """
+        device_name = signal_name.strip().split(".")[0]
+        try:
+            device_id = self.devices.names.query(device_name)
+        except SyntaxError:
+            return None
+        return self.devices.get_device(device_id)
+
+    def map_signals(self, signal_names):
+        """Return the switch devices with the given signal names.
+
+        Raise ValueError if a name is not the name of a switch.
+        """
+        switches = []
+        for signal_name in signal_names:
+            device = self.get_device(signal_name)
+            if (device is None or "." in signal_name or
+                    device.device_kind != self.devices.SWITCH):
+                raise ValueError(
+                    "'{}' is not the name of a switch.".format(signal_name))
+            switches.append(device)
+        return switches
+
+    def check_values(self, block):
+        """Check that a block of switch values holds only 0s and 1s.
+
+        Raise ValueError if it does not, or if the values are not integers
+        or booleans.
+        """
+        if block.dtype.kind not in "iub":
+            raise ValueError("Expected integer switch values.")
+        if ((block != 0) & (block != 1)).any():
+            raise ValueError("Expected switch values of 0 or 1.")
+
+    def read_events(self):
+        """Yield chunks of switch changes from the file.
+
+        Each chunk is a tuple of lists (cycles, columns, signals), sorted by
+        cycle, where signals[i] is the new state of the switch in
+        self.switches[columns[i]] at cycles[i].
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """Restart the replay from the start of the file."""
+        self.chunks = self.read_events()
+        self.cycles = self.columns = self.signals = []
+        self.position = 0
+        self.applied_cycle = None  # last cycle passed to apply()
+        self.next_chunk()
+
+    def next_chunk(self):
+        """Load the next chunk of switch changes and set next_cycle."""
+        for cycles, columns, signals in self.chunks:
+            if cycles:
+                self.cycles = cycles
+                self.columns = columns
+                self.signals = signals
+                self.position = 0
+                self.next_cycle = cycles[0]
+                return
+        self.cycles = []
+        self.position = 0
+        self.next_cycle = float("inf")  # end of the file
+
+    def next_change(self):
+        """Move on to the next switch change and set next_cycle."""
+        self.position += 1
+        if self.position == len(self.cycles):
+            self.next_chunk()
+        else:
+            self.next_cycle = self.cycles[self.position]
+
+    def apply(self, cycle):
+        """Apply the switch changes due by the given cycle."""
+        self.applied_cycle = cycle
+        while self.next_cycle <= cycle:
+            position = self.position
+            self.switches[self.columns[position]].switch_state = (
+                self.signals[position])
+            self.next_change()
+
+    def fork(self, devices):
+        """Return a copy of the replay that sets the switches of devices.
+
+        The copy reopens the file and skips the changes up to the same
+        cycle, which the switches of the forked devices already hold.
+        """
+        forked_replay = copy.copy(self)
+        forked_replay.devices = devices
+        forked_replay.reset()
+        applied_cycle = self.applied_cycle
+        if applied_cycle is not None:
+            while forked_replay.next_cycle <= applied_cycle:
+                forked_replay.next_change()
+            forked_replay.applied_cycle = applied_cycle
+        return forked_replay
+
+    def get_changes(self, first_cycle, block, last_row):
+        """Return the switch changes in a block of rows as lists.
+
+        block has one row per cycle from first_cycle and one column per
+        switch, and last_row is the row before the block, or None.
+        """
+        if last_row is None:
+            previous = np.empty_like(block)
+            previous[0] = block[0] ^ 1  # every switch is set on the first row
+        else:
+            previous = np.empty_like(block)
+            previous[0] = last_row
+        previous[1:] = block[:-1]
+        rows, columns = np.nonzero(block != previous)
+        signals = block[rows, columns]
+        return ((rows + first_cycle).tolist(), columns.tolist(),
+                signals.tolist())
+
+
+class CsvReplay(Replay):
+
+    """Replay switch values from a CSV file.
+
+    The first line holds the signal names of the switches and each further
+    line holds the values (0 or 1) of the switches at one cycle, starting
+    from cycle 0. The file is parsed chunk lines at a time.
+    """
+
+    def read_events(self):
+        """Yield chunks of switch changes from the file."""
+        with open(self.path) as stimulus_file:
+            header = stimulus_file.readline()
+            self.switches = self.map_signals(header.strip().split(","))
+            first_cycle = 0
+            last_row = None
+            while True:
+                lines = list(itertools.islice(stimulus_file, self.chunk))
+                if not any(line.strip() for line in lines):
+                    return
+                block = np.loadtxt(lines, delimiter=",", dtype=np.int64,
+                                   ndmin=2)
+                self.check_values(block)
+                yield self.get_changes(first_cycle, block, last_row)
+                first_cycle += len(block)
+                last_row = block[-1]
+
+
+class NpyReplay(Replay):
+
+    """Replay switch values from a NumPy .npy file.
+
+    The file holds a 2-D array of 0s and 1s with one row per cycle and one
+    column per switch, named by signal_names. It is memory-mapped, so the
+    chunks are views of the file and are never copied into memory.
+    """
+
+    def __init__(self, devices, path, signal_names, chunk=65536):
+        """Map the signal names to switches and open the file."""
+        self.signal_names = signal_names
+        super().__init__(devices, path, chunk)
+
+    def read_events(self):
+        """Yield chunks of switch changes from the file."""
+        self.switches = self.map_signals(self.signal_names)
+        values = np.load(self.path, mmap_mode="r")
+        if values.ndim != 2 or values.shape[1] != len(self.switches):
+            raise ValueError("Expected one column per signal name.")
+        last_row = None
+        for first_cycle in range(0, len(values), self.chunk):
+            block = values[first_cycle:first_cycle + self.chunk]
+            self.check_values(block)
+            yield self.get_changes(first_cycle, block, last_row)
+            last_row = block[-1]
+
+
+class VcdReplay(Replay):
+
+    """Replay switch changes from a value change dump (VCD) file.
+
+    Scalar variables named after switches are replayed and the other
+    variables, including those that are not signals of the circuit, are
+    ignored, so dumps of hardware or of other tools can be replayed. Each
+    change at time t is applied at cycle
+    t // cycle_time. Values x and z leave the switch unchanged. VCD only
+    records changes, so the file is turned into switch changes directly.
+    """
+
+    def __init__(self, devices, path, cycle_time=1, chunk=65536):
+        """Set the time per cycle and open the file."""
+        self.cycle_time = cycle_time
+        super().__init__(devices, path, chunk)
+
+    def read_events(self):
+        """Yield chunks of switch changes from the file."""
+        self.switches = []
+        columns = {}  # {identifier code: column}
+        in_definitions = True
+        cycle = 0
+        cycles = []
+        changes = []
+        signals = []
+        with open(self.path) as stimulus_file:
+            tokens = (token for line in stimulus_file
+                      for token in line.split())
+            for token in tokens:
+                if in_definitions:
+                    if token == "$enddefinitions":
+                        in_definitions = False
+                    elif token == "$var":
+                        [_, size, code, reference] = itertools.islice(
+                            tokens, 4)
+                        if size != "1":
+                            continue
+                        device = self.get_device(reference)
+                        if device is None:
+                            continue
+                        if (device.device_kind == self.devices.SWITCH and
+                                "." not in reference):
+                            columns[code] = len(self.switches)
+                            self.switches.append(device)
+                elif token.startswith("#"):
+                    cycle = int(token[1:]) // self.cycle_time
+                    if len(cycles) >= self.chunk:
+                        yield cycles, changes, signals
+                        cycles, changes, signals = [], [], []
+                elif token[0] in "01" and token[1:] in columns:
+                    cycles.append(cycle)
+                    changes.append(columns[token[1:]])
+                    signals.append(int(token[0]))
+                elif token[0] in "bBrR":
+                    next(tokens)  # skip the identifier of a vector change
+                elif token[1:] in columns and token[0] not in "xXzZ":
+                    raise ValueError("Expected switch values of 0 or 1.")
+        yield cycles, changes, signals
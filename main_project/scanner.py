@@ -83,14 +83,18 @@ class Scanner:
                     self.SLASH, self.HASHTAG, self.EOF] = range(14)
 
 
-        self.heading_list = ["devices", "connections", "monitor"]
+        self.heading_list = ["devices", "connections", "monitor", "stimulus"]
         [self.DEVICES_ID, self.CONNECTION_ID,
-            self.MONITOR_ID] = self.names.lookup(self.heading_list)
+            self.MONITOR_ID, self.STIMULUS_ID] = self.names.lookup(
+                self.heading_list)
 
         self.keyword_list = ["are", "is", "have",
-                             "has", "set", "to", "cycle", "trace"]
+                             "has", "set", "to", "cycle", "trace", "table",
+                             "width", "depth", "at", "every"]
         [self.ARE, self.IS, self.HAVE, self.HAS, self.SET,
-         self.TO, self.CYCLE, self.TRACE] = self.names.lookup(self.keyword_list)
+         self.TO, self.CYCLE, self.TRACE, self.TABLE,
+         self.WIDTH, self.DEPTH, self.AT,
+         self.EVERY] = self.names.lookup(self.keyword_list)
 
         [self.DEVICE] = self.names.lookup(["device"])
 
@@ -0,0 +1,108 @@
+"""Schedule switch changes for scripted simulation runs.
+
+Used in the Logic Simulator project to change switches at given simulation
+cycles, from the STIMULUS section of a definition file or from Python.
+
+Classes
+-------
+Stimulus - applies scheduled switch changes as the network is executed.
+"""
+import copy
+import heapq
+
+
+class Stimulus:
+
+    """Apply scheduled switch changes as the network is executed.
+
+    Switch changes are kept in a list of events sorted by cycle, so applying
+    them costs nothing on the cycles without events and O(log n) per event
+    otherwise. An event may repeat with a fixed period. To use a stimulus,
+    attach it to the network with network.stimulus = stimulus; the network
+    then calls apply() at the start of every cycle.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+
+    Public methods
+    --------------
+    add_event(self, device_id, signal, cycle, period=None): Schedules a
+                      switch change at the given cycle, repeating every period
+                      cycles if a period is given.
+
+    reset(self): Restarts the schedule from cycle 0.
+
+    apply(self, cycle): Applies the switch changes due by the given cycle.
+
+    fork(self, devices): Returns a copy of the stimulus that sets the
+                         switches of the given devices.
+    """
+
+    def __init__(self, devices):
+        """Initialise the schedule and stimulus errors."""
+        self.devices = devices
+        self.names = devices.names
+
+        [self.NO_ERROR, self.NOT_SWITCH, self.INVALID_SIGNAL,
+         self.INVALID_CYCLE] = self.names.unique_error_codes(4)
+
+        # schedule stores the events as they were added, as tuples of
+        # (cycle, order, device_id, signal, period)
+        self.schedule = []
+        self.reset()
+
+    def add_event(self, device_id, signal, cycle, period=None):
+        """Schedule a switch change at the given cycle.
+
+        The switch is set to signal (HIGH or LOW) at the start of the cycle,
+        and again every period cycles after that if a period is given. Events
+        at the same cycle are applied in the order they were added. Return
+        self.NO_ERROR if successful, or the corresponding error if not.
+        """
+        device = self.devices.get_device(device_id)
+        if device is None or device.device_kind != self.devices.SWITCH:
+            return self.NOT_SWITCH
+        if signal not in [self.devices.LOW, self.devices.HIGH]:
+            return self.INVALID_SIGNAL
+        if cycle < 0 or (period is not None and period <= 0):
+            return self.INVALID_CYCLE
+        event = (cycle, len(self.schedule), device_id, signal, period)
+        self.schedule.append(event)
+        heapq.heappush(self.events, event)
+        self.next_cycle = self.events[0][0]
+        return self.NO_ERROR
+
+    def reset(self):
+        """Restart the schedule from cycle 0."""
+        self.events = list(self.schedule)
+        heapq.heapify(self.events)
+        # Cycle of the next event, checked by the network every cycle
+        self.next_cycle = self.events[0][0] if self.events else float("inf")
+
+    def apply(self, cycle):
+        """Apply the switch changes due by the given cycle.
+
+        Repeating events are rescheduled to their next cycle after this one.
+        """
+        events = self.events
+        while events and events[0][0] <= cycle:
+            (event_cycle, order, device_id, signal,
+             period) = heapq.heappop(events)
+            self.devices.set_switch(device_id, signal)
+            if period is not None:
+                repeats = (cycle - event_cycle) // period + 1
+                heapq.heappush(events, (event_cycle + repeats * period, order,
+                                        device_id, signal, period))
+        self.next_cycle = events[0][0] if events else float("inf")
+
+    def fork(self, devices):
+        """Return a copy of the stimulus that sets the switches of devices.
+
+        The copy continues from the same point in the schedule.
+        """
+        forked_stimulus = copy.copy(self)
+        forked_stimulus.devices = devices
+        forked_stimulus.schedule = list(self.schedule)
+        forked_stimulus.events = list(self.events)
+        return forked_stimulus
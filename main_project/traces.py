@@ -0,0 +1,725 @@
+"""Store monitored signal traces compactly.
+
+Used in the Logic Simulator project to store the signals of monitors that
+are not kept in the dense signal array of monitors.Monitors(), in memory or
+on disk.
+
+Functions
+---------
+get_buckets - returns the summaries of buckets of signals.
+
+Classes
+-------
+RunLengthTrace - stores a signal trace as runs of equal values.
+DecimatedTrace - stores every k-th cycle of a signal trace.
+WindowedTrace - stores the cycles of a signal trace inside given windows.
+TracePyramid - summarises signal traces at power-of-two resolutions.
+TraceWriter - writes signal traces to disk in compressed chunks.
+TraceReader - reads windows of signal traces written by TraceWriter.
+"""
+import array
+import bisect
+import json
+import os
+import zlib
+
+import numpy as np
+
+
+def get_buckets(mins, maxs, changes, starts):
+    """Return [mins, maxs, changes] of buckets of summarised signals.
+
+    mins, maxs and changes have one row per trace and one column per cycle
+    or bucket. The new buckets start at the given columns and each runs to
+    the start of the next one, or to the end.
+    """
+    return [np.minimum.reduceat(mins, starts, axis=1),
+            np.maximum.reduceat(maxs, starts, axis=1),
+            np.logical_or.reduceat(changes, starts, axis=1)]
+
+
+class RunLengthTrace:
+
+    """Store a signal trace as runs of equal values.
+
+    Each run is stored as its first cycle and its value, so a signal that
+    rarely changes takes a few bytes per change however many cycles it is
+    recorded for. Appending takes amortised O(1) time and reading the signal
+    at a cycle takes O(log runs) time, by binary search of the run starts.
+
+    Parameters
+    ----------
+    values: optional array of signals to start the trace with.
+    dtype: NumPy type of the arrays returned by to_array.
+
+    Public methods
+    --------------
+    append(self, value): Appends the signal of the next cycle.
+
+    extend(self, values): Appends an array of signals, one per cycle.
+
+    extend_run(self, value, cycles): Appends the same signal for a number of
+                                     cycles.
+
+    get_signal(self, cycle): Returns the signal at the given cycle.
+
+    to_array(self, start=0, stop=None): Returns the signals of a window of
+                                        cycles as an array.
+
+    get_size(self): Returns the number of bytes used by the runs.
+
+    clear(self): Deletes all the cycles.
+    """
+
+    def __init__(self, values=None, dtype=np.uint8):
+        """Initialise an empty trace and add any values."""
+        self.dtype = np.dtype(dtype)
+        self.clear()
+        if values is not None:
+            self.extend(values)
+
+    def clear(self):
+        """Delete all the cycles."""
+        self.starts = array.array("q")  # first cycle of each run
+        self.values = array.array("Q")  # signal of each run
+        self.length = 0  # number of cycles
+
+    def __len__(self):
+        """Return the number of cycles in the trace."""
+        return self.length
+
+    def append(self, value):
+        """Append the signal of the next cycle."""
+        values = self.values
+        if not values or values[-1] != value:
+            self.starts.append(self.length)
+            values.append(value)
+        self.length += 1
+
+    def extend(self, values):
+        """Append an array of signals, one per cycle."""
+        values = np.asarray(values)
+        if len(values) == 0:
+            return
+        # The first cycle of every run in values
+        changes = np.flatnonzero(values[1:] != values[:-1]) + 1
+        if not self.values or self.values[-1] != values[0]:
+            changes = np.concatenate([[0], changes])
+        self.starts.extend((changes + self.length).tolist())
+        self.values.extend(values[changes].tolist())
+        self.length += len(values)
+
+    def extend_run(self, value, cycles):
+        """Append the same signal for a number of cycles in O(1) time."""
+        if cycles <= 0:
+            return
+        if not self.values or self.values[-1] != value:
+            self.starts.append(self.length)
+            self.values.append(value)
+        self.length += cycles
+
+    def get_signal(self, cycle):
+        """Return the signal at the given cycle.
+
+        Negative cycles count back from the end, as for a list. Raise
+        IndexError if the cycle is not in the trace.
+        """
+        if cycle < 0:
+            cycle += self.length
+        if not 0 <= cycle < self.length:
+            raise IndexError("cycle out of range")
+        return self.values[bisect.bisect_right(self.starts, cycle) - 1]
+
+    def to_array(self, start=0, stop=None):
+        """Return the signals of a window of cycles as an array.
+
+        start and stop index the cycles as for a list. Only the runs in the
+        window are expanded, so rendering a window of a long trace is cheap.
+        """
+        [start, stop, _] = slice(start, stop).indices(self.length)
+        if stop <= start:
+            return np.empty(0, dtype=self.dtype)
+        first = bisect.bisect_right(self.starts, start) - 1
+        last = bisect.bisect_left(self.starts, stop)
+        run_starts = np.array(self.starts[first:last], dtype=np.int64)
+        run_starts[0] = start
+        run_lengths = np.diff(run_starts, append=stop)
+        return np.repeat(np.array(self.values[first:last], dtype=self.dtype),
+                         run_lengths)
+
+    def get_size(self):
+        """Return the number of bytes used by the runs."""
+        return (len(self.starts) * self.starts.itemsize +
+                len(self.values) * self.values.itemsize)
+
+
+class DecimatedTrace:
+
+    """Store every k-th cycle of a signal trace.
+
+    Cycles 0, k, 2k, ... are sampled and each sample stands for the k cycles
+    from it, so the trace takes 1/k of the memory of every cycle and reads
+    back as if the signal was held between samples. The methods are those of
+    RunLengthTrace.
+
+    Parameters
+    ----------
+    every: number of cycles per sample, k.
+    values: optional array of signals to start the trace with.
+    dtype: NumPy type of the arrays returned by to_array.
+    """
+
+    def __init__(self, every, values=None, dtype=np.uint8):
+        """Initialise an empty trace and add any values."""
+        if every <= 0:
+            raise ValueError("Expected every to be a positive integer.")
+        self.every = every
+        self.dtype = np.dtype(dtype)
+        self.clear()
+        if values is not None:
+            self.extend(values)
+
+    def clear(self):
+        """Delete all the cycles."""
+        self.samples = array.array("Q")  # signal of every k-th cycle
+        self.length = 0  # number of cycles
+
+    def __len__(self):
+        """Return the number of cycles in the trace."""
+        return self.length
+
+    def append(self, value):
+        """Append the signal of the next cycle."""
+        if self.length % self.every == 0:
+            self.samples.append(value)
+        self.length += 1
+
+    def extend(self, values):
+        """Append an array of signals, one per cycle."""
+        values = np.asarray(values)
+        first = -self.length % self.every  # the first sampled value
+        self.samples.extend(values[first::self.every].tolist())
+        self.length += len(values)
+
+    def extend_run(self, value, cycles):
+        """Append the same signal for a number of cycles."""
+        if cycles <= 0:
+            return
+        # Number of multiples of every from length to length + cycles - 1
+        samples = (-(-(self.length + cycles) // self.every) -
+                   -(-self.length // self.every))
+        self.samples.extend(array.array("Q", [value]) * samples)
+        self.length += cycles
+
+    def get_signal(self, cycle):
+        """Return the signal at the given cycle.
+
+        Negative cycles count back from the end, as for a list. Raise
+        IndexError if the cycle is not in the trace.
+        """
+        if cycle < 0:
+            cycle += self.length
+        if not 0 <= cycle < self.length:
+            raise IndexError("cycle out of range")
+        return self.samples[cycle // self.every]
+
+    def to_array(self, start=0, stop=None):
+        """Return the signals of a window of cycles as an array.
+
+        start and stop index the cycles as for a list. Only the samples in
+        the window are expanded.
+        """
+        [start, stop, _] = slice(start, stop).indices(self.length)
+        if stop <= start:
+            return np.empty(0, dtype=self.dtype)
+        first = start // self.every
+        last = (stop - 1) // self.every + 1
+        signals = np.repeat(np.array(self.samples[first:last],
+                                     dtype=self.dtype), self.every)
+        return signals[start - first * self.every:stop - first * self.every]
+
+    def get_size(self):
+        """Return the number of bytes used by the samples."""
+        return len(self.samples) * self.samples.itemsize
+
+
+class WindowedTrace:
+
+    """Store the cycles of a signal trace inside given windows.
+
+    Cycles outside the windows are not stored and read back as the fill
+    value, so only the windows take memory. The methods are those of
+    RunLengthTrace.
+
+    Parameters
+    ----------
+    windows: list of [start, stop) pairs of cycles.
+    values: optional array of signals to start the trace with.
+    dtype: NumPy type of the arrays returned by to_array.
+    fill: signal of the cycles outside the windows.
+    """
+
+    def __init__(self, windows, values=None, dtype=np.uint8, fill=0):
+        """Check the windows, initialise an empty trace and add any values."""
+        windows = sorted(windows)
+        self.window_starts = []
+        self.window_stops = []
+        # window_offsets stores the index in samples of each window's start
+        self.window_offsets = [0]
+        for start, stop in windows:
+            if not 0 <= start < stop or (self.window_stops and
+                                         start < self.window_stops[-1]):
+                raise ValueError("Expected windows of cycles that do not "
+                                 "overlap.")
+            self.window_starts.append(start)
+            self.window_stops.append(stop)
+            self.window_offsets.append(self.window_offsets[-1] + stop - start)
+        self.dtype = np.dtype(dtype)
+        self.fill = fill
+        self.clear()
+        if values is not None:
+            self.extend(values)
+
+    def clear(self):
+        """Delete all the cycles."""
+        self.samples = array.array("Q")  # signals inside the windows
+        self.length = 0  # number of cycles
+        self.window = 0  # the first window not yet passed
+
+    def __len__(self):
+        """Return the number of cycles in the trace."""
+        return self.length
+
+    def append(self, value):
+        """Append the signal of the next cycle."""
+        window = self.window
+        if window < len(self.window_starts):
+            if self.length >= self.window_stops[window]:
+                window = self.window = window + 1
+            if (window < len(self.window_starts) and
+                    self.length >= self.window_starts[window]):
+                self.samples.append(value)
+        self.length += 1
+
+    def extend(self, values):
+        """Append an array of signals, one per cycle."""
+        values = np.asarray(values)
+        self.extend_windows(len(values), lambda start, stop:
+                            values[start:stop].tolist())
+
+    def extend_run(self, value, cycles):
+        """Append the same signal for a number of cycles."""
+        if cycles > 0:
+            self.extend_windows(cycles, lambda start, stop:
+                                array.array("Q", [value]) * (stop - start))
+
+    def extend_windows(self, cycles, get_values):
+        """Append the given number of cycles.
+
+        get_values(start, stop) returns the signals of the new cycles from
+        start to stop, counted from the first new cycle.
+        """
+        end = self.length + cycles
+        window = self.window
+        while window < len(self.window_starts):
+            start = max(self.window_starts[window], self.length)
+            stop = min(self.window_stops[window], end)
+            if start < stop:
+                self.samples.extend(get_values(start - self.length,
+                                               stop - self.length))
+            if self.window_stops[window] > end:
+                break
+            window += 1
+        self.window = window
+        self.length = end
+
+    def get_signal(self, cycle):
+        """Return the signal at the given cycle.
+
+        Negative cycles count back from the end, as for a list. Raise
+        IndexError if the cycle is not in the trace.
+        """
+        if cycle < 0:
+            cycle += self.length
+        if not 0 <= cycle < self.length:
+            raise IndexError("cycle out of range")
+        window = bisect.bisect_right(self.window_starts, cycle) - 1
+        if window < 0 or cycle >= self.window_stops[window]:
+            return self.fill
+        return self.samples[self.window_offsets[window] + cycle -
+                            self.window_starts[window]]
+
+    def to_array(self, start=0, stop=None):
+        """Return the signals of a window of cycles as an array.
+
+        start and stop index the cycles as for a list. Only the stored
+        windows overlapping the window are copied.
+        """
+        [start, stop, _] = slice(start, stop).indices(self.length)
+        signals = np.full(max(stop - start, 0), self.fill, dtype=self.dtype)
+        window = bisect.bisect_right(self.window_stops, start)
+        while (window < len(self.window_starts) and
+               self.window_starts[window] < stop):
+            first = max(start, self.window_starts[window])
+            last = min(stop, self.window_stops[window])
+            offset = self.window_offsets[window] - self.window_starts[window]
+            signals[first - start:last - start] = self.samples[
+                offset + first:offset + last]
+            window += 1
+        return signals
+
+    def get_size(self):
+        """Return the number of bytes used by the samples."""
+        return len(self.samples) * self.samples.itemsize
+
+
+class TraceWriter:
+
+    """Write signal traces to disk in compressed chunks.
+
+    The traces are stored in a directory holding three files: "data" holds
+    each signal split into chunks of a fixed number of cycles, each chunk
+    compressed with zlib; "index" holds the [offset, length] in the data
+    file of every chunk, as int64 with one row per chunk and one column per
+    signal, so that it can be memory-mapped; "header.json" holds the signal
+    names, the type of the signals, the chunk size and the number of cycles.
+    Only one chunk of signals is held in memory, so the length of the traces
+    is limited by disk space only.
+
+    Parameters
+    ----------
+    path: name of the directory, which is created if needed.
+    signal_names: list of the names of the signals.
+    dtype: NumPy type of the signals.
+    chunk: number of cycles per chunk.
+    level: zlib compression level.
+
+    Public methods
+    --------------
+    write_chunk(self, signals): Appends an array of signals, one row per
+                                signal and one column per cycle.
+
+    flush(self): Compresses and writes the buffered cycles.
+
+    close(self): Writes the remaining cycles and the header.
+    """
+
+    def __init__(self, path, signal_names, dtype=np.uint8, chunk=65536,
+                 level=6):
+        """Create the directory and open the data and index files."""
+        if chunk <= 0:
+            raise ValueError("Expected chunk to be a positive integer.")
+        self.path = path
+        self.signal_names = list(signal_names)
+        self.dtype = np.dtype(dtype)
+        self.chunk = chunk
+        self.level = level
+        self.cycles = 0  # cycles written to disk
+        self.buffer = np.empty((len(self.signal_names), chunk),
+                               dtype=self.dtype)
+        self.buffered = 0  # cycles held in the buffer
+        os.makedirs(path, exist_ok=True)
+        self.data_file = open(os.path.join(path, "data"), "wb")
+        self.index_file = open(os.path.join(path, "index"), "wb")
+        self.offset = 0  # size of the data file
+
+    def write_chunk(self, signals):
+        """Append an array of signals.
+
+        signals has one row per signal, in the order of signal_names, and
+        one column per cycle, such as a chunk yielded by
+        monitors.Monitors.stream.
+        """
+        position = 0
+        cycles = signals.shape[1]
+        while position < cycles:
+            length = min(self.chunk - self.buffered, cycles - position)
+            self.buffer[:, self.buffered:self.buffered + length] = signals[
+                :, position:position + length]
+            self.buffered += length
+            position += length
+            if self.buffered == self.chunk:
+                self.flush()
+
+    def flush(self):
+        """Compress and write the buffered cycles as one chunk per signal.
+
+        Every chunk but the last must be full, so this is only called with
+        a partial chunk by close.
+        """
+        if self.buffered == 0:
+            return
+        index = np.empty((len(self.signal_names), 2), dtype=np.int64)
+        for row in range(len(self.signal_names)):
+            data = zlib.compress(self.buffer[row, :self.buffered].tobytes(),
+                                 self.level)
+            self.data_file.write(data)
+            index[row] = [self.offset, len(data)]
+            self.offset += len(data)
+        self.index_file.write(index.tobytes())
+        self.cycles += self.buffered
+        self.buffered = 0
+
+    def close(self):
+        """Write the remaining cycles and the header, and close the files."""
+        self.flush()
+        self.data_file.close()
+        self.index_file.close()
+        header = {"signals": self.signal_names, "dtype": self.dtype.str,
+                  "chunk": self.chunk, "cycles": self.cycles}
+        with open(os.path.join(self.path, "header.json"), "w") as header_file:
+            json.dump(header, header_file)
+
+
+class TraceReader:
+
+    """Read windows of signal traces written by TraceWriter.
+
+    The index is memory-mapped and reading a window of cycles decompresses
+    only the chunks overlapping it, so windows of traces much larger than
+    memory, for example for display, are read in time proportional to the
+    window.
+
+    Parameters
+    ----------
+    path: name of the directory written by TraceWriter.
+
+    Public methods
+    --------------
+    get_length(self): Returns the number of cycles stored.
+
+    get_trace(self, signal_name, start=0, stop=None): Returns a window of
+                                        the signals of a trace as an array.
+
+    get_signal_array(self, start=0, stop=None): Returns a window of all the
+                                        traces as an array.
+
+    close(self): Closes the files.
+    """
+
+    def __init__(self, path):
+        """Read the header and open the data and index files."""
+        with open(os.path.join(path, "header.json")) as header_file:
+            header = json.load(header_file)
+        self.signal_names = header["signals"]
+        self.signal_rows = {name: row for row, name in
+                            enumerate(self.signal_names)}
+        self.dtype = np.dtype(header["dtype"])
+        self.chunk = header["chunk"]
+        self.cycles = header["cycles"]
+        chunks = -(-self.cycles // self.chunk)
+        if chunks and self.signal_names:
+            self.index = np.memmap(os.path.join(path, "index"),
+                                   dtype=np.int64, mode="r",
+                                   shape=(chunks, len(self.signal_names), 2))
+        else:
+            self.index = np.empty((0, len(self.signal_names), 2),
+                                  dtype=np.int64)
+        self.data_file = open(os.path.join(path, "data"), "rb")
+
+    def get_length(self):
+        """Return the number of cycles stored for each signal."""
+        return self.cycles
+
+    def get_trace(self, signal_name, start=0, stop=None):
+        """Return a window of the signals of a trace as an array.
+
+        start and stop index the cycles as for a list. Raise KeyError if
+        there is no trace of the signal.
+        """
+        row = self.signal_rows[signal_name]
+        [start, stop, _] = slice(start, stop).indices(self.cycles)
+        if stop <= start:
+            return np.empty(0, dtype=self.dtype)
+        first = start // self.chunk
+        last = (stop - 1) // self.chunk
+        chunks = []
+        for chunk in range(first, last + 1):
+            [offset, length] = self.index[chunk, row].tolist()
+            self.data_file.seek(offset)
+            chunks.append(np.frombuffer(
+                zlib.decompress(self.data_file.read(length)),
+                dtype=self.dtype))
+        signals = np.concatenate(chunks)
+        return signals[start - first * self.chunk:stop - first * self.chunk]
+
+    def get_signal_array(self, start=0, stop=None):
+        """Return a window of all the traces as an array.
+
+        The array has one row per signal, in the order of signal_names.
+        """
+        [start, stop, _] = slice(start, stop).indices(self.cycles)
+        signals = np.empty((len(self.signal_names), max(stop - start, 0)),
+                           dtype=self.dtype)
+        for row, signal_name in enumerate(self.signal_names):
+            signals[row] = self.get_trace(signal_name, start, stop)
+        return signals
+
+    def close(self):
+        """Close the files."""
+        self.data_file.close()
+
+
+class TracePyramid:
+
+    """Summarise signal traces at power-of-two resolutions.
+
+    Level k of the pyramid holds, for each trace and each bucket of 2**k
+    cycles, the minimum and the maximum signal and whether the signal
+    changes in the bucket (from the cycle before each of its cycles). The
+    levels are updated as cycles are appended, a buffer of cycles at a
+    time, so appending takes amortised O(1) time per cycle. The levels
+    start at buckets of 2**lowest cycles and together take about 3 / 2**
+    lowest bytes per uint8 signal.
+
+    get_summary serves a window of cycles at any number of pixels from the
+    level whose buckets are the largest that fit in a pixel, in O(pixels)
+    time. Windows with fewer than 2**lowest cycles per pixel are left to
+    the caller, who can summarise that few signals directly with
+    get_buckets.
+
+    Parameters
+    ----------
+    rows: number of traces.
+    dtype: NumPy type of the signals.
+    lowest: level of the finest buckets kept.
+    buffer: number of cycles added to the levels at a time.
+
+    Public methods
+    --------------
+    append(self, signals): Appends one cycle of signals.
+
+    extend(self, signals): Appends an array of signals, one row per trace
+                           and one column per cycle.
+
+    flush(self): Adds the buffered cycles to the levels.
+
+    get_summary(self, start, stop, pixels): Returns the summaries of a
+                           window of cycles split into pixels.
+    """
+
+    def __init__(self, rows, dtype=np.uint8, lowest=4, buffer=1024):
+        """Initialise an empty pyramid."""
+        self.rows = rows
+        self.dtype = np.dtype(dtype)
+        self.lowest = lowest
+        self.length = 0  # cycles added to the levels
+        # mins, maxs and changes store the arrays of each level from lowest,
+        # with one row per trace and room for more buckets than are used
+        self.mins = []
+        self.maxs = []
+        self.changes = []
+        self.last = None  # signals of the last cycle added
+        self.buffer = np.empty((rows, buffer), dtype=self.dtype)
+        self.buffered = 0  # cycles held in the buffer
+
+    def append(self, signals):
+        """Append one cycle of signals, one per trace."""
+        self.buffer[:, self.buffered] = signals
+        self.buffered += 1
+        if self.buffered == self.buffer.shape[1]:
+            self.flush()
+
+    def extend(self, signals):
+        """Append an array of signals with one column per cycle."""
+        self.flush()
+        for start in range(0, signals.shape[1], self.buffer.shape[1]):
+            block = signals[:, start:start + self.buffer.shape[1]]
+            self.buffer[:, :block.shape[1]] = block
+            self.buffered = block.shape[1]
+            self.flush()
+
+    def store(self, level, first, mins, maxs, changes):
+        """Store the summaries of a level from bucket first onwards."""
+        index = level - self.lowest
+        stop = first + mins.shape[1]
+        if index == len(self.mins):
+            columns = max(stop, 16)
+            self.mins.append(np.empty((self.rows, columns), self.dtype))
+            self.maxs.append(np.empty((self.rows, columns), self.dtype))
+            self.changes.append(np.empty((self.rows, columns), bool))
+        elif stop > self.mins[index].shape[1]:
+            # Grow geometrically, so storing takes amortised O(1) time
+            columns = max(2 * self.mins[index].shape[1], stop)
+            for arrays in [self.mins, self.maxs, self.changes]:
+                grown = np.empty((self.rows, columns), arrays[index].dtype)
+                grown[:, :first] = arrays[index][:, :first]
+                arrays[index] = grown
+        self.mins[index][:, first:stop] = mins
+        self.maxs[index][:, first:stop] = maxs
+        self.changes[index][:, first:stop] = changes
+
+    def flush(self):
+        """Add the buffered cycles to every level."""
+        cycles = self.buffered
+        if cycles == 0:
+            return
+        self.buffered = 0
+        signals = self.buffer[:, :cycles]
+        changes = np.empty(signals.shape, dtype=bool)
+        changes[:, 1:] = signals[:, 1:] != signals[:, :-1]
+        if self.last is None:
+            changes[:, 0] = False
+        else:
+            changes[:, 0] = signals[:, 0] != self.last
+        self.last = signals[:, -1].copy()
+
+        # Buckets of the lowest level, the first of which may have been
+        # started by the cycles added before
+        length = self.length
+        size = 1 << self.lowest
+        first = length >> self.lowest
+        starts = np.concatenate([[0], np.arange((first + 1) * size - length,
+                                                cycles, size)])
+        [mins, maxs, changes] = get_buckets(signals, signals, changes,
+                                            starts)
+        if length % size:
+            mins[:, 0] = np.minimum(mins[:, 0], self.mins[0][:, first])
+            maxs[:, 0] = np.maximum(maxs[:, 0], self.maxs[0][:, first])
+            changes[:, 0] |= self.changes[0][:, first]
+        self.length = length = length + cycles
+        level = self.lowest
+        self.store(level, first, mins, maxs, changes)
+
+        # Merge pairs of buckets until a bucket covers every cycle
+        while (length - 1) >> level:
+            index = level - self.lowest
+            if first % 2:
+                mins = np.concatenate([self.mins[index][:, first - 1:first],
+                                       mins], axis=1)
+                maxs = np.concatenate([self.maxs[index][:, first - 1:first],
+                                       maxs], axis=1)
+                changes = np.concatenate(
+                    [self.changes[index][:, first - 1:first], changes],
+                    axis=1)
+                first -= 1
+            [mins, maxs, changes] = get_buckets(
+                mins, maxs, changes, np.arange(0, mins.shape[1], 2))
+            first //= 2
+            level += 1
+            self.store(level, first, mins, maxs, changes)
+
+    def get_summary(self, start, stop, pixels):
+        """Return the summaries of a window of cycles split into pixels.
+
+        Return [mins, maxs, changes], arrays with one row per trace and one
+        column per pixel, accurate to within a bucket at the pixel borders.
+        Return None if the window has fewer than 2**lowest cycles per pixel.
+        """
+        self.flush()
+        [start, stop, _] = slice(start, stop).indices(self.length)
+        if pixels <= 0 or stop - start < pixels << self.lowest:
+            return None
+        width = (stop - start) // pixels
+        level = min(width.bit_length() - 1,
+                    self.lowest + len(self.mins) - 1)
+        index = level - self.lowest
+        # Pixels are at least a bucket wide, so no two start in one bucket
+        buckets = (start + np.arange(pixels) * (stop - start) //
+                   pixels) >> level
+        first = buckets[0]
+        last = ((stop - 1) >> level) + 1
+        return get_buckets(self.mins[index][:, first:last],
+                           self.maxs[index][:, first:last],
+                           self.changes[index][:, first:last],
+                           buckets - first)
@@ -0,0 +1,153 @@
+"""Write monitored signals to value change dump (VCD) files.
+
+Used in the Logic Simulator project to export the monitored signals of long
+runs for inspection in standard waveform viewers.
+
+Classes
+-------
+VcdWriter - writes monitored signals to a VCD file as they are simulated.
+"""
+import numpy as np
+
+
+class VcdWriter:
+
+    """Write monitored signals to a VCD file as they are simulated.
+
+    The writer is a sink for the chunks yielded by monitors.Monitors.stream:
+    only the changes of each signal are written and nothing is kept in
+    memory apart from the last value of each signal and the file buffer, so
+    the length of a run is limited by disk space only. Cycle c is written at
+    time c * cycle_time, as read back by replay.VcdReplay. Single-bit signals
+    are compared and written as logic levels, 0 or 1 (RISING as 1 and
+    FALLING as 0), so a RISING then HIGH signal is written once. Buses are
+    written as binary vectors. BLANK is written as x, and as bx for buses
+    (see monitors.Monitors.get_blank).
+
+    Parameters
+    ----------
+    monitors: instance of the monitors.Monitors() class.
+    path: name of the VCD file.
+    cycle_time: VCD time units per cycle.
+    timescale: VCD time unit.
+    buffer_size: size in bytes of the file buffer.
+
+    Public methods
+    --------------
+    get_code(self, index): Returns the VCD identifier code of a signal.
+
+    write_header(self): Writes the declarations of the monitored signals.
+
+    write_chunk(self, signals): Writes the changes in a chunk of signals.
+
+    close(self): Writes the end time and closes the file.
+    """
+
+    def __init__(self, monitors, path, cycle_time=1, timescale="1 ns",
+                 buffer_size=65536):
+        """Open the file and write the declarations of the signals."""
+        if cycle_time <= 0:
+            raise ValueError("Expected cycle_time to be a positive integer.")
+        self.monitors = monitors
+        self.devices = monitors.devices
+        self.cycle_time = cycle_time
+        self.timescale = timescale
+        self.cycles = 0  # cycles written
+        self.last_signals = None  # signals of the last cycle written
+        devices = self.devices
+        # levels maps each single-bit signal to its logic level, and
+        # level_values stores the VCD value of each level
+        self.levels = np.arange(5)
+        self.levels[devices.RISING] = devices.HIGH
+        self.levels[devices.FALLING] = devices.LOW
+        self.level_values = {devices.LOW: "0", devices.HIGH: "1",
+                             devices.BLANK: "x"}
+
+        # codes stores the identifier code, widths the bus width (None for
+        # single bits) and blanks the stored BLANK value of each monitor, in
+        # the order of monitor_rows
+        self.codes = []
+        self.widths = []
+        self.blanks = []
+        for device_id, output_id in monitors.monitor_rows:
+            self.codes.append(self.get_code(len(self.codes)))
+            self.widths.append(devices.get_bus_width(device_id, output_id))
+            self.blanks.append(monitors.get_blank(device_id, output_id))
+        # The rows of single-bit signals, which are written as levels
+        self.bit_rows = [row for row, width in enumerate(self.widths)
+                         if width is None]
+        self.vcd_file = open(path, "w", buffering=buffer_size)
+        self.write_header()
+
+    def get_code(self, index):
+        """Return the VCD identifier code of the given signal index.
+
+        Codes are written in base 94 with the printable ASCII characters.
+        """
+        code = ""
+        while True:
+            code += chr(33 + index % 94)
+            index //= 94
+            if index == 0:
+                return code
+
+    def write_header(self):
+        """Write the declarations of the monitored signals."""
+        lines = ["$version GF2 logic simulator $end\n",
+                 "$timescale {} $end\n".format(self.timescale),
+                 "$scope module circuit $end\n"]
+        for (device_id, output_id), code, width in zip(
+                self.monitors.monitor_rows, self.codes, self.widths):
+            lines.append("$var wire {} {} {} $end\n".format(
+                1 if width is None else width, code,
+                self.devices.get_signal_name(device_id, output_id)))
+        lines.append("$upscope $end\n$enddefinitions $end\n")
+        self.vcd_file.write("".join(lines))
+
+    def write_chunk(self, signals):
+        """Write the changes in a chunk of signals.
+
+        signals is an array with one row per monitor, in the order of
+        monitor_rows, and one column per cycle, such as a chunk yielded by
+        monitors.Monitors.stream. Every signal is written at the first cycle.
+        """
+        signals = np.asarray(signals)
+        cycles = signals.shape[1]
+        if cycles == 0:
+            return
+        if self.bit_rows:
+            signals = signals.copy()
+            signals[self.bit_rows] = self.levels[signals[self.bit_rows]]
+        changed = np.empty(signals.shape, dtype=bool)
+        if self.last_signals is None:
+            changed[:, 0] = True
+        else:
+            changed[:, 0] = signals[:, 0] != self.last_signals
+        changed[:, 1:] = signals[:, 1:] != signals[:, :-1]
+        # Changes sorted by cycle, as the file must be
+        [change_cycles, rows] = np.nonzero(changed.T)
+        values = signals[rows, change_cycles]
+
+        lines = []
+        last_cycle = None
+        for cycle, row, value in zip(change_cycles.tolist(), rows.tolist(),
+                                     values.tolist()):
+            if cycle != last_cycle:
+                lines.append("#{}\n".format((self.cycles + cycle) *
+                                            self.cycle_time))
+                last_cycle = cycle
+            if self.widths[row] is None:
+                lines.append(self.level_values[value] + self.codes[row] +
+                             "\n")
+            elif value == self.blanks[row]:
+                lines.append("bx {}\n".format(self.codes[row]))
+            else:
+                lines.append("b{:b} {}\n".format(value, self.codes[row]))
+        self.vcd_file.write("".join(lines))
+        self.last_signals = signals[:, -1].copy()
+        self.cycles += cycles
+
+    def close(self):
+        """Write the end time and close the file."""
+        self.vcd_file.write("#{}\n".format(self.cycles * self.cycle_time))
+        self.vcd_file.close()
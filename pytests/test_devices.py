@@ -1,8 +1,9 @@
 """Test the devices module."""
 import pytest
+import numpy as np
 
 from main_project.names import Names
-from main_project.devices import Devices
+from main_project.devices import Devices, NO_BUS_WIDTHS
 
 
 @pytest.fixture
@@ -160,3 +161,289 @@ def test_siggen(new_devices):
     after = len(new_devices.find_devices())
     assert names.get_name_string(new_devices.find_devices()[0]) == "sg1"
     assert before + 1 == after
+
+
+def test_register_kind(new_devices):
+    """Test if devices of a registered kind can be made with make_device."""
+    names = new_devices.names
+    [BUF_ID, B1_ID, B2_ID, I1_ID] = names.lookup(["BUF", "B1", "B2", "I1"])
+
+    def create_buffer(device_id, device_kind, device_property):
+        if device_property is not None:
+            return new_devices.QUALIFIER_PRESENT
+        new_devices.add_device(device_id, device_kind)
+        new_devices.add_input(device_id, I1_ID)
+        new_devices.add_output(device_id, None)
+        return new_devices.NO_ERROR
+
+    assert new_devices.make_device(B1_ID, BUF_ID) == new_devices.BAD_DEVICE
+
+    new_devices.register_kind(BUF_ID, create_buffer, None, [I1_ID], [None],
+                              False)
+    assert new_devices.make_device(B1_ID, BUF_ID) == new_devices.NO_ERROR
+    assert new_devices.make_device(B2_ID, BUF_ID,
+                                   1) == new_devices.QUALIFIER_PRESENT
+    assert new_devices.find_devices(BUF_ID) == [B1_ID]
+    assert new_devices.get_device(B1_ID).inputs == {I1_ID: None}
+
+
+def test_make_bus_device(new_devices):
+    """Test if word-level devices are made with buses of the given width."""
+    names = new_devices.names
+    [R_ID, L_ID, A_ID, DATA_ID, COUT_ID] = names.lookup(
+        ["R", "L", "Add", "DATA", "COUT"])
+
+    assert new_devices.make_device(R_ID, new_devices.REGISTER,
+                                   12) == new_devices.NO_ERROR
+    assert new_devices.get_bus_width(R_ID, None) == 12
+    assert new_devices.get_bus_width(R_ID, DATA_ID) == 12
+    assert new_devices.get_device(R_ID).outputs[None] < 2 ** 12
+
+    assert new_devices.make_device(A_ID, new_devices.ADDER,
+                                   64) == new_devices.NO_ERROR
+    assert new_devices.get_bus_width(A_ID, COUT_ID) is None
+    # Single-bit devices share an empty, read-only bus_widths
+    [SW_ID] = names.lookup(["Sw"])
+    new_devices.make_device(SW_ID, new_devices.SWITCH, 0)
+    assert new_devices.get_device(SW_ID).bus_widths is NO_BUS_WIDTHS
+    assert new_devices.get_device(A_ID).bus_widths is not NO_BUS_WIDTHS
+
+    assert new_devices.make_device(
+        L_ID, new_devices.LFSR) == new_devices.NO_QUALIFIER
+    assert new_devices.make_device(
+        L_ID, new_devices.LFSR, 33) == new_devices.INVALID_QUALIFIER
+    assert new_devices.make_device(
+        L_ID, new_devices.REGISTER, 65) == new_devices.INVALID_QUALIFIER
+
+    # Changing the width truncates the stored value
+    assert new_devices.set_bus_width(R_ID, 3)
+    assert new_devices.get_bus_width(R_ID, DATA_ID) == 3
+    assert new_devices.get_device(R_ID).outputs[None] < 8
+    assert not new_devices.set_bus_width(R_ID, 0)
+    assert not new_devices.set_bus_width(DATA_ID, 3)
+
+
+def test_make_memory(new_devices, tmp_path):
+    """Test if memories are made and loaded from arrays and .npy files."""
+    names = new_devices.names
+    [RAM_ID, ROM_ID, ADDR_ID] = names.lookup(["Ram", "Rom", "ADDR"])
+
+    assert new_devices.make_device(
+        RAM_ID, new_devices.RAM) == new_devices.NO_QUALIFIER
+    assert new_devices.make_device(
+        RAM_ID, new_devices.RAM, (0, 8)) == new_devices.INVALID_QUALIFIER
+    assert new_devices.make_device(
+        RAM_ID, new_devices.RAM, (1000, 12)) == new_devices.NO_ERROR
+    assert new_devices.get_bus_width(RAM_ID, ADDR_ID) == 10
+    assert new_devices.get_device(RAM_ID).memory.dtype == np.uint16
+
+    # Words are truncated to the width
+    assert new_devices.load_memory(RAM_ID, np.arange(1000) * 5)
+    assert new_devices.get_device(RAM_ID).memory[900] == 4500 % 4096
+    assert not new_devices.load_memory(RAM_ID, np.arange(999))
+
+    path = str(tmp_path / "rom.npy")
+    np.save(path, np.arange(16, dtype=np.uint8))
+    assert new_devices.make_device(ROM_ID, new_devices.ROM,
+                                   (16, 8)) == new_devices.NO_ERROR
+    assert new_devices.load_memory(ROM_ID, path, mmap=True)
+    memory = new_devices.get_device(ROM_ID).memory
+    assert isinstance(memory, np.memmap)
+    assert not memory.flags.writeable
+    assert memory.tolist() == list(range(16))
+    assert not new_devices.load_memory(ROM_ID, str(tmp_path / "none.npy"))
+
+    assert new_devices.set_memory_depth(ROM_ID, 64)
+    assert new_devices.get_bus_width(ROM_ID, ADDR_ID) == 6
+
+
+def test_fork_memory(new_devices):
+    """Test that a forked RAM shares its words until either copy writes."""
+    [RAM_ID] = new_devices.names.lookup(["Ram1"])
+    new_devices.make_device(RAM_ID, new_devices.RAM, (16, 8))
+    device = new_devices.get_device(RAM_ID)
+    device.write_memory(3, 7)
+    forked_device = device.fork()
+    assert forked_device.memory is device.memory
+
+    forked_device.write_memory(3, 9)
+    device.write_memory(4, 1)
+    assert device.memory[3] == 7 and device.memory[4] == 1
+    assert forked_device.memory[3] == 9 and forked_device.memory[4] == 0
+
+
+def test_cold_startup(new_devices):
+    """Test that devices start in a reset state until cold_startup is run."""
+    names = new_devices.names
+    device_ids = names.lookup(["Clk1", "Dtype1", "Sig1", "Lfsr1"])
+    [CLK_ID, D_ID, SIG_ID, LFSR_ID] = device_ids
+    new_devices.make_device(CLK_ID, new_devices.CLOCK, 3)
+    new_devices.make_device(D_ID, new_devices.D_TYPE)
+    new_devices.make_device(SIG_ID, new_devices.SIGGEN, "0110")
+    new_devices.make_device(LFSR_ID, new_devices.LFSR, 4)
+
+    def get_state():
+        """Return the start-up state of the devices."""
+        return [(device.clock_counter, device.dtype_memory, device.bus_memory,
+                 dict(device.outputs))
+                for device in new_devices.devices_list]
+
+    assert get_state() == [(0, None, None, {None: 0}),
+                           (None, 0, None, {new_devices.Q_ID: 0,
+                                            new_devices.QBAR_ID: 0}),
+                           (0, None, None, {None: 0}),
+                           (None, None, 1, {None: 1})]
+
+    # The same seed gives the same state, whatever form it is given in
+    new_devices.cold_startup(5)
+    state = get_state()
+    new_devices.cold_startup(np.random.default_rng(5))
+    assert get_state() == state
+    for seed in range(20):
+        new_devices.cold_startup(seed)
+        clock = new_devices.get_device(CLK_ID)
+        siggen = new_devices.get_device(SIG_ID)
+        assert 0 <= clock.clock_counter < 3
+        assert siggen.outputs[None] == int("0110"[siggen.clock_counter])
+        assert 0 < new_devices.get_device(LFSR_ID).bus_memory < 16
+
+
+def test_get_arrays(devices_with_items):
+    """Test that get_arrays returns the devices as compressed arrays."""
+    devices = devices_with_items
+    names = devices.names
+    [AND1_ID, NOR1_ID, SW1_ID, I1, D1_ID] = names.lookup(["And1", "Nor1",
+                                                          "Sw1", "I1", "D1"])
+    devices.make_device(D1_ID, devices.D_TYPE)
+    devices.get_device(AND1_ID).inputs[I1] = (SW1_ID, None)
+    devices.get_device(D1_ID).inputs[devices.DATA_ID] = (D1_ID,
+                                                         devices.QBAR_ID)
+    devices.get_device(SW1_ID).outputs[None] = devices.HIGH
+
+    arrays = devices.get_arrays()
+    assert list(arrays.device_ids) == [AND1_ID, NOR1_ID, SW1_ID, D1_ID]
+    assert list(arrays.kinds) == [devices.AND, devices.NOR, devices.SWITCH,
+                                  devices.D_TYPE]
+    assert list(arrays.dtype_memory) == [-1, -1, -1, devices.LOW]
+    assert list(arrays.output_offsets) == [0, 1, 2, 3, 5]
+    assert list(arrays.output_ports) == [-1, -1, -1, devices.Q_ID,
+                                         devices.QBAR_ID]
+    assert arrays.output_signals[2] == devices.HIGH
+    assert list(arrays.input_offsets) == [0, 2, 18, 18, 22]
+
+    # And1.I1 is driven by Sw1 and D1.DATA by D1.QBAR
+    assert arrays.input_drivers[0] == 2
+    d_type_inputs = slice(arrays.input_offsets[3], arrays.input_offsets[4])
+    drivers = dict(zip(arrays.input_ports[d_type_inputs],
+                       arrays.input_drivers[d_type_inputs]))
+    assert drivers[devices.DATA_ID] == 4
+    assert drivers[devices.CLK_ID] == -1
+
+
+def test_pack(devices_with_items):
+    """Test that packed devices keep their state in the arrays."""
+    devices = devices_with_items
+    names = devices.names
+    [AND1_ID, SW1_ID, D1_ID, I1] = names.lookup(["And1", "Sw1", "D1", "I1"])
+    devices.make_device(D1_ID, devices.D_TYPE)
+    devices.get_device(AND1_ID).inputs[I1] = (SW1_ID, None)
+    before = devices.get_arrays()
+
+    assert devices.pack()
+    assert not devices.pack()
+    arrays = devices.get_arrays()
+    assert devices.get_arrays() is arrays
+    for old, new in zip(before, arrays):
+        assert list(old) == list(new)
+
+    # The devices read and write the arrays
+    and_device = devices.get_device(AND1_ID)
+    assert and_device.inputs[I1] == (SW1_ID, None)
+    assert dict(and_device.outputs) == {None: devices.LOW}
+    devices.get_device(SW1_ID).outputs[None] = devices.HIGH
+    assert arrays.output_signals[2] == devices.HIGH
+    d_type = devices.get_device(D1_ID)
+    arrays.dtype_memory[3] = devices.HIGH
+    assert d_type.dtype_memory == devices.HIGH
+    assert devices.get_device(SW1_ID).dtype_memory is None
+    with pytest.raises(KeyError):
+        d_type.outputs[None] = devices.HIGH
+
+    # A fork copies the state and shares the connections
+    forked_devices = devices.fork()
+    forked_devices.get_device(D1_ID).dtype_memory = devices.LOW
+    assert d_type.dtype_memory == devices.HIGH
+    assert forked_devices.get_arrays().input_drivers is arrays.input_drivers
+    assert not np.shares_memory(forked_devices.get_arrays().output_signals,
+                                arrays.output_signals)
+
+
+def test_device_slots(new_devices):
+    """Test that devices do not accept undeclared attributes."""
+    [SW1_ID] = new_devices.names.lookup(["Sw1"])
+    new_devices.make_device(SW1_ID, new_devices.SWITCH, 0)
+    device = new_devices.get_device(SW1_ID)
+    with pytest.raises(AttributeError):
+        device.colour = "red"
+    # GUI state is kept by the GUI
+    with pytest.raises(AttributeError):
+        device.location = [0, 0]
+
+
+def test_make_devices(devices_with_items):
+    """Test that make_devices makes many devices and finds all errors."""
+    devices = devices_with_items
+    [AND1_ID, SW2_ID, CLK1_ID, CLK2_ID, X_ID, L1_ID, L2_ID,
+     L3_ID] = devices.names.lookup(["And1", "Sw2", "Clk1", "Clk2", "X",
+                                    "L1", "L2", "L3"])
+    errors = devices.make_devices([(SW2_ID, devices.SWITCH, 1),
+                                   (AND1_ID, devices.AND, 2),
+                                   (CLK1_ID, devices.CLOCK, 0),
+                                   (CLK2_ID, X_ID, None),
+                                   (SW2_ID, devices.SWITCH, 0),
+                                   (L1_ID, devices.LUT, 3),
+                                   (L2_ID, devices.LUT, (2, [0, None])),
+                                   (L3_ID, devices.LUT, (1, "10")),
+                                   (CLK2_ID, devices.CLOCK, 4)])
+    assert errors == [(1, devices.DEVICE_PRESENT),
+                      (2, devices.INVALID_QUALIFIER),
+                      (3, devices.BAD_DEVICE),
+                      (4, devices.DEVICE_PRESENT),
+                      (5, devices.INVALID_QUALIFIER),
+                      (6, devices.INVALID_QUALIFIER)]
+    assert devices.get_device(SW2_ID).switch_state == devices.HIGH
+    assert devices.get_device(CLK2_ID).clock_half_period == 4
+    assert devices.get_device(L3_ID) is not None
+    assert devices.get_device(CLK1_ID) is None
+
+
+def test_siggen_trace(new_devices, tmp_path):
+    """Test that signal generator traces are stored bit-packed."""
+    [SG_ID, SW_ID] = new_devices.names.lookup(["Sg1", "Sw1"])
+    assert new_devices.make_device(SG_ID, new_devices.SIGGEN,
+                                   "1101000011") == new_devices.NO_ERROR
+    device = new_devices.get_device(SG_ID)
+    assert device.trace == bytes([0b00001011, 0b11])
+    assert device.trace_length == 10
+    assert [new_devices.get_trace_bit(device, i) for i in range(10)] == [
+        1, 1, 0, 1, 0, 0, 0, 0, 1, 1]
+    assert new_devices.pack_trace("10a1") is None
+    assert new_devices.pack_trace([]) is None
+
+    # Traces from text files, with white space, and from .npy files
+    text_path = tmp_path / "trace.txt"
+    text_path.write_text("0110\n1000 1\n")
+    assert new_devices.load_trace(SG_ID, str(text_path))
+    assert device.trace_length == 9
+    assert device.trace == bytes([0b00010110, 0b1])
+    bits = np.random.default_rng(0).integers(0, 2, 100000)
+    np.save(tmp_path / "trace.npy", bits)
+    assert new_devices.load_trace(SG_ID, str(tmp_path / "trace.npy"))
+    assert [new_devices.get_trace_bit(device, i)
+            for i in range(100000)] == bits.tolist()
+
+    text_path.write_text("0120")
+    assert not new_devices.load_trace(SG_ID, str(text_path))
+    assert not new_devices.load_trace(SG_ID, str(tmp_path / "none.txt"))
+    new_devices.make_device(SW_ID, new_devices.SWITCH, 0)
+    assert not new_devices.load_trace(SW_ID, str(tmp_path / "trace.npy"))
@@ -0,0 +1,250 @@
+"""Test the bitparallel and equivalence modules."""
+import random
+
+import pytest
+
+from main_project.names import Names
+from main_project.devices import Devices
+from main_project.bitparallel import BitParallel
+from main_project.equivalence import Equivalence, load_circuit
+
+xor_definition = """DEVICES {
+    A, B are SWITCH;
+    X is a XOR gate;
+}
+CONNECTIONS {
+    device X {
+        A to X.I1;
+        B to X.I2;
+    }
+}
+MONITOR {
+    X;
+}
+"""
+
+nand_definition = """DEVICES {
+    A, B are SWITCH;
+    N1, N2, N3, X are NAND gates;
+    N1, N2, N3, X have 2 inputs;
+}
+CONNECTIONS {
+    device N1 {
+        A to N1.I1;
+        B to N1.I2;
+    }
+    device N2 {
+        A to N2.I1;
+        N1 to N2.I2;
+    }
+    device N3 {
+        N1 to N3.I1;
+        B to N3.I2;
+    }
+    device X {
+        N2 to X.I1;
+        N3 to X.I2;
+    }
+}
+MONITOR {
+    X;
+}
+"""
+
+and_definition = xor_definition.replace(
+    "X is a XOR gate;", "X is a AND gate;\n    X has 2 inputs;")
+
+# N oscillates while A is HIGH
+oscillator_definition = """DEVICES {
+    A, B are SWITCH;
+    N is a NAND gate;
+    N has 2 inputs;
+    X is a XOR gate;
+}
+CONNECTIONS {
+    device N {
+        A to N.I1;
+        N to N.I2;
+    }
+    device X {
+        N to X.I1;
+        B to X.I2;
+    }
+}
+MONITOR {
+    X;
+}
+"""
+
+counter_definition = """DEVICES {
+    A, B, C are DTYPE;
+    RST, ST are SWITCH;
+    CK is CLOCK;
+    CK has cycle 2;
+}
+CONNECTIONS {
+    device A {
+        A.QBAR to A.DATA;
+        RST to A.CLEAR;
+        ST to A.SET;
+        CK to A.CLK;
+    }
+    device B {
+        B.QBAR to B.DATA;
+        RST to B.CLEAR;
+        ST to B.SET;
+        A.Q to B.CLK;
+    }
+    device C {
+        C.QBAR to C.DATA;
+        RST to C.CLEAR;
+        ST to C.SET;
+        B.Q to C.CLK;
+    }
+}
+MONITOR {
+    A.Q, B.Q, C.Q, CK;
+}
+"""
+
+
+@pytest.fixture
+def load(tmp_path):
+    """Return a function that loads a circuit from a definition string."""
+    def load_definition(definition, name="circuit.txt"):
+        path = tmp_path / name
+        path.write_text(definition)
+        return load_circuit(str(path))
+    return load_definition
+
+
+def test_bitparallel_matches_network(load):
+    """Test that every lane follows the network from its start-up state."""
+    monitors = load(counter_definition)
+    devices = monitors.devices
+    network = monitors.network
+    devices.cold_startup(3)
+    engine = BitParallel(devices, lanes=64)
+
+    [RST_ID, ST_ID] = devices.names.lookup(["RST", "ST"])
+    generator = random.Random(1)
+    for cycle in range(40):
+        for switch_id in [RST_ID, ST_ID]:
+            signal = int(generator.random() < 0.1)
+            devices.set_switch(switch_id, signal)
+            engine.set_switch(switch_id, -signal)  # every lane
+        assert network.execute_network()
+        assert engine.step()
+        for device_id, output_id in monitors.monitor_rows:
+            expected = devices.get_device(device_id).outputs[output_id]
+            assert engine.get_signal(device_id, output_id) == (
+                engine.mask if expected == devices.HIGH else 0)
+
+
+def test_set_phases(load):
+    """Test that clocks start from a different phase in each lane."""
+    monitors = load(counter_definition)
+    devices = monitors.devices
+    engine = BitParallel(devices, lanes=4)
+    [CK_ID] = devices.names.lookup(["CK"])
+    engine.set_phases(CK_ID, [0, 1, 2, 3])
+    assert engine.get_signal(CK_ID, None) == 0b1100
+    levels = []
+    for cycle in range(4):
+        engine.step()
+        levels.append(engine.get_signal(CK_ID, None))
+    # Lane i runs i cycles ahead of lane 0
+    assert levels == [0b1100, 0b0110, 0b0011, 0b1001]
+
+
+@pytest.mark.parametrize("lanes", [8, 64, 65536])
+def test_equivalent_circuits(load, lanes):
+    """Test that equivalent circuits pass random and exhaustive checks."""
+    equivalence = Equivalence(load(xor_definition, "xor.txt"),
+                              load(nand_definition, "nand.txt"), lanes)
+    assert equivalence.error_code == equivalence.NO_ERROR
+    assert equivalence.monitor_names == ["X"]
+
+    result = equivalence.check_random(1000, cycles=3, seed=0)
+    assert result == {"equivalent": True, "vectors": 1000}
+    result = equivalence.check_exhaustive(cycles=2)
+    assert result == {"equivalent": True, "vectors": 4}
+
+
+def test_mismatch(load):
+    """Test that a mismatch is reported with its cycle and pattern."""
+    equivalence = Equivalence(load(xor_definition, "xor.txt"),
+                              load(and_definition, "and.txt"), lanes=8)
+    result = equivalence.check_exhaustive()
+    # Patterns are counted in binary with A as the lowest bit
+    assert result == {"equivalent": False, "vectors": 2, "cycle": 0,
+                      "signal": "X", "values": (1, 0),
+                      "pattern": {"A": [1], "B": [0]}}
+
+    result = equivalence.check_random(1000, cycles=4, seed=3)
+    assert not result["equivalent"]
+    pattern = result["pattern"]
+    cycle = result["cycle"]
+    assert len(pattern["A"]) == cycle + 1
+    # The circuits agree on the earlier cycles and differ at the last one
+    for a, b in zip(pattern["A"][:-1], pattern["B"][:-1]):
+        assert a ^ b == a & b
+    assert pattern["A"][-1] ^ pattern["B"][-1] != (
+        pattern["A"][-1] & pattern["B"][-1])
+
+
+def test_unmatched_signals(load):
+    """Test the errors for circuits whose signals do not match."""
+    other_switches = xor_definition.replace("B", "C")
+    equivalence = Equivalence(load(xor_definition, "xor.txt"),
+                              load(other_switches, "other.txt"))
+    assert equivalence.error_code == equivalence.SWITCHES_DIFFER
+    assert equivalence.check_random(10) is None
+
+    other_monitor = nand_definition.replace("MONITOR {\n    X;",
+                                            "MONITOR {\n    N1;")
+    equivalence = Equivalence(load(xor_definition, "xor.txt"),
+                              load(other_monitor, "other.txt"))
+    assert equivalence.error_code == equivalence.MONITORS_DIFFER
+    assert equivalence.check_exhaustive() is None
+
+    first = load(xor_definition, "xor.txt")
+    second = load(nand_definition, "nand.txt")
+    for monitors in [first, second]:
+        for device_id, output_id in list(monitors.monitor_rows):
+            monitors.remove_monitor(device_id, output_id)
+    equivalence = Equivalence(first, second)
+    assert equivalence.error_code == equivalence.NO_MONITORS
+
+
+def test_oscillation(load):
+    """Test that a circuit which does not settle makes a check
+    inconclusive."""
+    equivalence = Equivalence(load(xor_definition, "xor.txt"),
+                              load(oscillator_definition, "osc.txt"),
+                              lanes=8)
+    assert equivalence.error_code == equivalence.NO_ERROR
+    result = equivalence.check_exhaustive()
+    assert result == {"equivalent": None, "vectors": 0, "cycle": 0,
+                      "oscillating": 2}
+    result = equivalence.check_random(100, cycles=2, seed=0)
+    assert result["equivalent"] is None
+
+
+def test_too_many_switches(load):
+    """Test that exhaustive checks are limited to 63 switches."""
+    equivalence = Equivalence(load(xor_definition, "xor.txt"),
+                              load(nand_definition, "nand.txt"))
+    equivalence.switch_names = ["S{}".format(i) for i in range(64)]
+    with pytest.raises(ValueError):
+        equivalence.check_exhaustive()
+
+
+def test_unsupported_device():
+    """Test that devices without a bit-parallel model are rejected."""
+    names = Names()
+    devices = Devices(names)
+    [REG_ID] = names.lookup(["Reg1"])
+    devices.make_device(REG_ID, devices.REGISTER, 8)
+    with pytest.raises(ValueError):
+        BitParallel(devices)
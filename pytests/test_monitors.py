@@ -1,10 +1,13 @@
 """Test the monitors module."""
 import pytest
+import numpy as np
 
 from main_project.names import Names
 from main_project.network import Network
 from main_project.devices import Devices
 from main_project.monitors import Monitors
+from main_project.stimulus import Stimulus
+from main_project.traces import TraceReader
 
 
 @pytest.fixture
@@ -197,3 +200,391 @@ def test_display_signals(capsys, new_monitors):
             "Clock1: -__--__--__--__--__-" in traces)
 
     assert "" in traces  # additional empty line at the end
+
+
+def test_fork(new_monitors):
+    """Test if a fork continues from the same state without affecting it."""
+    names = new_monitors.names
+    devices = new_monitors.devices
+    network = new_monitors.network
+    [SW1_ID, SW2_ID, OR1_ID] = names.lookup(["Sw1", "Sw2", "Or1"])
+
+    HIGH = devices.HIGH
+    LOW = devices.LOW
+
+    network.execute_network()
+    new_monitors.record_signals()
+
+    branch = new_monitors.fork()
+    # The netlist is shared, the signals are not
+    or1 = devices.get_device(OR1_ID)
+    branch_or1 = branch.devices.get_device(OR1_ID)
+    assert branch_or1.inputs is or1.inputs
+    assert branch_or1.outputs is not or1.outputs
+
+    # Set Sw1 to HIGH in the fork only
+    branch.devices.set_switch(SW1_ID, HIGH)
+    for monitors in [new_monitors, branch]:
+        monitors.network.execute_network()
+        monitors.record_signals()
+
+    assert new_monitors.monitors_dictionary == {
+        (SW1_ID, None): [LOW, LOW],
+        (SW2_ID, None): [LOW, LOW],
+        (OR1_ID, None): [LOW, LOW]}
+    assert branch.monitors_dictionary == {
+        (SW1_ID, None): [LOW, HIGH],
+        (SW2_ID, None): [LOW, LOW],
+        (OR1_ID, None): [LOW, HIGH]}
+
+
+def test_stream(new_monitors):
+    """Test if stream yields the monitored signals in chunks."""
+    names = new_monitors.names
+    devices = new_monitors.devices
+    [SW1_ID] = names.lookup(["Sw1"])
+
+    HIGH = devices.HIGH
+    LOW = devices.LOW
+
+    chunks = list(new_monitors.stream(10, chunk=4))
+    assert [chunk.shape for chunk in chunks] == [(3, 4), (3, 4), (3, 2)]
+    assert all((chunk == LOW).all() for chunk in chunks)
+
+    # Streamed signals are not stored in the monitors
+    assert all(trace == [] for trace in
+               new_monitors.monitors_dictionary.values())
+
+    # The network is only executed when the next chunk is requested
+    stream = new_monitors.stream(6, chunk=3)
+    assert (next(stream) == LOW).all()
+    devices.set_switch(SW1_ID, HIGH)
+    assert next(stream).tolist() == [[HIGH, HIGH, HIGH],
+                                     [LOW, LOW, LOW],
+                                     [HIGH, HIGH, HIGH]]
+
+
+def test_record_chunk(new_monitors):
+    """Test if record_chunk stores streamed signals like record_signals."""
+    names = new_monitors.names
+    devices = new_monitors.devices
+    [SW1_ID, SW2_ID, OR1_ID] = names.lookup(["Sw1", "Sw2", "Or1"])
+
+    HIGH = devices.HIGH
+    LOW = devices.LOW
+
+    devices.set_switch(SW2_ID, HIGH)
+    for chunk in new_monitors.stream(3, chunk=2):
+        new_monitors.record_chunk(chunk)
+
+    assert new_monitors.monitors_dictionary == {
+        (SW1_ID, None): [LOW, LOW, LOW],
+        (SW2_ID, None): [HIGH, HIGH, HIGH],
+        (OR1_ID, None): [HIGH, HIGH, HIGH]}
+
+
+def test_run_until(new_monitors):
+    """Test if run_until stops at the cycle where the predicate is true."""
+    names = new_monitors.names
+    devices = new_monitors.devices
+    network = new_monitors.network
+    [SW1_ID, OR1_ID, CLOCK_ID, COUNT_ID,
+     CLK] = names.lookup(["Sw1", "Or1", "Clock", "Count", "CLK"])
+    devices.make_device(CLOCK_ID, devices.CLOCK, 1)
+    devices.make_device(COUNT_ID, devices.COUNTER, 8)
+    network.make_connection(CLOCK_ID, None, COUNT_ID, CLK)
+    devices.get_device(COUNT_ID).bus_memory = 0
+    devices.get_device(COUNT_ID).outputs[None] = 0
+
+    cycle, traces = new_monitors.run_until("Count == 0x05", 100)
+    assert cycle == len(traces[(OR1_ID, None)]) - 1
+    assert devices.get_device(COUNT_ID).outputs[None] == 5
+    assert cycle < 12
+
+    # The signals are recorded after the cycles of the previous run
+    devices.set_switch(SW1_ID, devices.HIGH)
+    assert new_monitors.run_until("Or1 == HIGH and not Sw2",
+                                  100)[0] == cycle + 1
+
+    # The predicate may be a function, and may never become true
+    assert new_monitors.run_until(lambda: False, 10)[0] is None
+    assert len(new_monitors.monitors_dictionary[(SW1_ID, None)]) == (
+        cycle + 12)
+
+    for expression in ["Nothing == 1", "Or1.Q == 1", "Or1 ==", "Count.I1"]:
+        with pytest.raises(ValueError):
+            new_monitors.compile_predicate(expression)
+
+
+def test_signal_store(new_monitors):
+    """Test that signals are stored in a growing 2-D array."""
+    names = new_monitors.names
+    devices = new_monitors.devices
+    network = new_monitors.network
+    [SW1_ID, OR1_ID, COUNT_ID] = names.lookup(["Sw1", "Or1", "Count"])
+    HIGH = devices.HIGH
+    LOW = devices.LOW
+
+    for cycle in range(100):
+        devices.set_switch(SW1_ID, cycle % 3 == 0)
+        network.execute_network()
+        new_monitors.record_signals()
+    signal_array = new_monitors.get_signal_array()
+    assert signal_array.dtype == np.uint8
+    assert signal_array.shape == (3, 100)
+    assert new_monitors.signal_array.shape[1] == 128  # grown geometrically
+    assert new_monitors.get_trace(OR1_ID, None, 3, 7).tolist() == [
+        HIGH, LOW, LOW, HIGH]
+    assert new_monitors.get_trace(OR1_ID, None, -2).tolist() == [LOW, HIGH]
+    assert new_monitors.get_trace(COUNT_ID, None) is None
+
+    # A 16-bit bus widens the store and is BLANK before it was monitored
+    devices.make_device(COUNT_ID, devices.COUNTER, 16)
+    devices.get_device(COUNT_ID).outputs[None] = 0x1234
+    new_monitors.make_monitor(COUNT_ID, None)
+    new_monitors.record_signals()
+    assert new_monitors.signal_array.dtype == np.uint32
+    assert new_monitors.get_trace(COUNT_ID, None, -2).tolist() == [
+        1 << 16, 0x1234]
+
+    new_monitors.remove_monitor(SW1_ID, None)
+    assert list(new_monitors.monitor_rows.values()) == [0, 1, 2]
+    assert new_monitors.get_signal_array().shape == (3, 101)
+
+
+def test_ring_buffer():
+    """Test that a store with a capacity keeps only the last cycles."""
+    new_names = Names()
+    new_devices = Devices(new_names)
+    new_network = Network(new_names, new_devices)
+    new_monitors = Monitors(new_names, new_devices, new_network, capacity=4)
+    [SW1_ID] = new_names.lookup(["Sw1"])
+    new_devices.make_device(SW1_ID, new_devices.SWITCH, 0)
+    new_monitors.make_monitor(SW1_ID, None)
+
+    values = [0, 1, 1, 0, 1, 0, 0]
+    for value in values:
+        new_devices.set_switch(SW1_ID, value)
+        new_network.execute_network()
+        new_monitors.record_signals()
+    assert new_monitors.cycles == 7
+    assert new_monitors.get_length() == 4
+    assert new_monitors.monitors_dictionary == {(SW1_ID, None): values[-4:]}
+    assert new_monitors.get_trace(SW1_ID, None, 1, 3).tolist() == values[4:6]
+
+    chunk = np.array([[1, 1, 0, 1, 1, 1]], dtype=np.uint8)
+    new_monitors.record_chunk(chunk[:, :2])
+    assert new_monitors.monitors_dictionary == {(SW1_ID, None): [0, 0, 1, 1]}
+    new_monitors.record_chunk(chunk)
+    assert new_monitors.monitors_dictionary == {(SW1_ID, None): [0, 1, 1, 1]}
+    assert new_monitors.cycles == 15
+
+
+def test_run_length_monitors(new_monitors):
+    """Test that run-length encoded monitors behave like stored rows."""
+    devices = new_monitors.devices
+    network = new_monitors.network
+    [SW1_ID, SW2_ID, OR1_ID] = devices.names.lookup(["Sw1", "Sw2", "Or1"])
+    devices.set_switch(SW1_ID, 1)
+    network.execute_network()
+    new_monitors.record_signals()
+
+    assert new_monitors.set_run_length(SW2_ID, None)
+    assert new_monitors.monitor_rows == {(SW1_ID, None): 0,
+                                         (SW2_ID, None): None,
+                                         (OR1_ID, None): 1}
+    forked_monitors = new_monitors.fork()
+    new_monitors.record_chunk(np.array([[0, 0], [1, 1], [1, 1]],
+                                       dtype=np.uint8))
+    devices.set_switch(SW2_ID, 1)
+    network.execute_network()
+    new_monitors.record_signals()
+    assert new_monitors.monitors_dictionary == {
+        (SW1_ID, None): [1, 0, 0, 1],
+        (SW2_ID, None): [0, 1, 1, 1],
+        (OR1_ID, None): [1, 1, 1, 1]}
+    assert new_monitors.get_trace(SW2_ID, None, 1, 3).tolist() == [1, 1]
+    assert len(forked_monitors.traces[(SW2_ID, None)]) == 1
+
+    assert new_monitors.remove_monitor(SW1_ID, None)
+    assert new_monitors.monitor_rows == {(SW2_ID, None): None,
+                                         (OR1_ID, None): 0}
+    new_monitors.reset_monitors()
+    assert new_monitors.monitors_dictionary == {(SW2_ID, None): [],
+                                                (OR1_ID, None): []}
+
+
+def test_run_length_store():
+    """Test a store of run-length encoded monitors with a capacity."""
+    new_names = Names()
+    new_devices = Devices(new_names)
+    new_network = Network(new_names, new_devices)
+    new_monitors = Monitors(new_names, new_devices, new_network, capacity=4,
+                            run_length=True)
+    [SW1_ID] = new_names.lookup(["Sw1"])
+    new_devices.make_device(SW1_ID, new_devices.SWITCH, 0)
+    new_monitors.make_monitor(SW1_ID, None, 2)
+    assert new_monitors.monitor_rows == {(SW1_ID, None): None}
+
+    values = [0, 1, 1, 0, 1]
+    for value in values:
+        new_devices.set_switch(SW1_ID, value)
+        new_network.execute_network()
+        new_monitors.record_signals()
+    assert new_monitors.get_length() == 4
+    assert new_monitors.monitors_dictionary == {(SW1_ID, None): values[-4:]}
+    trace = new_monitors.traces[(SW1_ID, None)]
+    assert len(trace) == 7
+    assert trace.get_signal(0) == new_devices.BLANK
+
+
+def test_spill_traces(tmp_path, new_monitors):
+    """Test that spilled signals are cleared and read back from disk."""
+    devices = new_monitors.devices
+    network = new_monitors.network
+    [SW1_ID] = devices.names.lookup(["Sw1"])
+    network.execute_network()
+    new_monitors.record_signals()
+    devices.set_switch(SW1_ID, devices.HIGH)
+
+    path = tmp_path / "store"
+    assert new_monitors.spill_traces(path, 10, chunk=4, store_chunk=8) == 11
+    assert new_monitors.get_length() == 0
+    reader = TraceReader(path)
+    assert reader.signal_names == ["Sw1", "Sw2", "Or1"]
+    assert reader.get_trace("Or1", 0, 3).tolist() == [0, 1, 1]
+    assert (reader.get_trace("Sw2") == devices.LOW).all()
+    reader.close()
+
+
+def test_set_policy(new_monitors):
+    """Test that recording policies keep only the cycles they record."""
+    devices = new_monitors.devices
+    [SW1_ID, SW2_ID, OR1_ID] = devices.names.lookup(["Sw1", "Sw2", "Or1"])
+    values = np.array([[0, 1, 1, 0, 0, 1, 1, 1],
+                       [1, 1, 1, 1, 0, 0, 0, 0],
+                       [1, 1, 1, 1, 0, 1, 1, 1]], dtype=np.uint8)
+    new_monitors.record_chunk(values[:, :2])
+    assert new_monitors.set_policy(SW1_ID, None, new_monitors.EVERY, 3)
+    assert new_monitors.set_policy(SW2_ID, None, new_monitors.WINDOWS,
+                                   [(1, 3), (6, 7)])
+    assert new_monitors.set_run_length(OR1_ID, None)
+    assert new_monitors.signal_array.shape[0] == 0
+    new_monitors.record_chunk(values[:, 2:])
+
+    BLANK = devices.BLANK
+    assert new_monitors.monitors_dictionary == {
+        (SW1_ID, None): [0, 0, 0, 0, 0, 0, 1, 1],
+        (SW2_ID, None): [BLANK, 1, 1, BLANK, BLANK, BLANK, 0, BLANK],
+        (OR1_ID, None): values[2].tolist()}
+
+    # Back to recording every cycle, keeping the materialised trace
+    assert new_monitors.set_policy(SW2_ID, None, new_monitors.ALL)
+    assert new_monitors.monitor_rows[(SW2_ID, None)] == 0
+    new_monitors.record_chunk(np.array([[1], [1], [1]], dtype=np.uint8))
+    assert new_monitors.get_trace(SW2_ID, None, 5).tolist() == [BLANK, 0,
+                                                                BLANK, 1]
+    assert not new_monitors.set_policy(OR1_ID, OR1_ID, new_monitors.ALL)
+    with pytest.raises(ValueError):
+        new_monitors.set_policy(OR1_ID, None, 7)
+
+
+@pytest.mark.parametrize("pre, post, max_captures, expected", [
+    (2, 1, None, [[3, 5, 7], [9, 11, 12]]),
+    (8, 0, 1, [[0, 5, 6]]),
+    (1, 4, None, [[4, 5, 10], [10, 11, 12]]),
+])
+def test_capture(new_monitors, pre, post, max_captures, expected):
+    """Test that captures hold the cycles around each trigger."""
+    devices = new_monitors.devices
+    network = new_monitors.network
+    [SW1_ID, SW2_ID] = devices.names.lookup(["Sw1", "Sw2"])
+    devices.set_switch(SW2_ID, devices.HIGH)
+    # Sw1 is HIGH for cycles 5 to 6 and from cycle 11
+    switch_values = [0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 1]
+    network.stimulus = Stimulus(devices)
+    for cycle in [5, 7, 11]:
+        network.stimulus.add_event(SW1_ID, switch_values[cycle], cycle)
+
+    captures = new_monitors.capture("Sw1 == HIGH", 12, pre, post,
+                                    max_captures)
+    assert [[first, cycle, first + signals.shape[1]]
+            for first, cycle, signals in captures] == expected
+    for first, cycle, signals in captures:
+        assert signals[0].tolist() == switch_values[first:first +
+                                                    signals.shape[1]]
+        assert (signals[1] == devices.HIGH).all()
+    assert new_monitors.get_length() == 0
+
+
+@pytest.mark.parametrize("capacity", [None, 4096])
+def test_get_summary(capacity):
+    """Test that summaries match the stored signals at any zoom level."""
+    new_names = Names()
+    new_devices = Devices(new_names)
+    new_network = Network(new_names, new_devices)
+    new_monitors = Monitors(new_names, new_devices, new_network, capacity)
+    [SW1_ID, SW2_ID] = new_names.lookup(["Sw1", "Sw2"])
+    new_devices.make_device(SW1_ID, new_devices.SWITCH, 0)
+    new_devices.make_device(SW2_ID, new_devices.SWITCH, 0)
+    new_monitors.make_monitor(SW1_ID, None)
+    new_monitors.make_monitor(SW2_ID, None)
+    new_monitors.set_run_length(SW2_ID, None)
+
+    generator = np.random.default_rng(0)
+    signals = (generator.random((2, 3000)) < 0.02).cumsum(axis=1) % 2
+    signals = signals.astype(np.uint8)
+    new_monitors.record_chunk(signals[:, :1000])
+    new_monitors.get_summary()  # builds the pyramid
+    new_monitors.record_chunk(signals[:, 1000:2999])
+    new_devices.set_switch(SW1_ID, signals[0, 2999])
+    new_devices.set_switch(SW2_ID, signals[1, 2999])
+    new_network.execute_network()
+    new_monitors.record_signals()
+
+    changes = np.zeros(signals.shape, dtype=bool)
+    changes[:, 1:] = signals[:, 1:] != signals[:, :-1]
+    for start, stop, pixels in [(0, 3000, 100), (100, 2900, 7),
+                                (1234, 1290, 50), (5, 2000, 1)]:
+        [mins, maxs, edges] = new_monitors.get_summary(start, stop, pixels)
+        assert mins.shape == maxs.shape == edges.shape == (2, pixels)
+        # Each pixel agrees with the signals to within a bucket of cycles
+        width = (stop - start) // pixels
+        slack = 1 << max(width.bit_length() - 1, 0)
+        for pixel in range(pixels):
+            first = start + pixel * (stop - start) // pixels
+            last = start + (pixel + 1) * (stop - start) // pixels
+            inner = slice(first + slack, last - slack)
+            outer = slice(max(first - slack, 0), last + slack)
+            assert (mins[:, pixel] <= signals[:, inner].min(
+                axis=1, initial=1)).all()
+            assert (mins[:, pixel] >= signals[:, outer].min(axis=1)).all()
+            assert (maxs[:, pixel] >= signals[:, inner].max(
+                axis=1, initial=0)).all()
+            assert (edges[:, pixel] >= changes[:, inner].any(axis=1)).all()
+            assert (edges[:, pixel] <= changes[:, outer].any(axis=1)).all()
+
+
+def test_summary_policies(new_monitors):
+    """Test that the pyramid summarises the signals as read back, however
+    the recording policies thin them out."""
+    devices = new_monitors.devices
+    [SW1_ID, SW2_ID] = devices.names.lookup(["Sw1", "Sw2"])
+    assert new_monitors.set_policy(SW1_ID, None, new_monitors.EVERY, 7)
+    assert new_monitors.set_policy(SW2_ID, None, new_monitors.WINDOWS,
+                                   [(100, 400), (900, 1500)])
+    generator = np.random.default_rng(2)
+    signals = generator.integers(0, 2, (3, 2000), dtype=np.uint8)
+    new_monitors.record_chunk(signals[:, :50])
+    new_monitors.get_summary()  # builds the pyramid
+    new_monitors.record_chunk(signals[:, 50:1999])
+    for device_id, signal in zip([SW1_ID, SW2_ID], signals[:2, 1999]):
+        devices.set_switch(device_id, int(signal))
+    new_monitors.network.execute_network()
+    new_monitors.record_signals()
+    incremental = new_monitors.get_summary(0, None, 20)
+
+    new_monitors.pyramid = None  # rebuilt from the stored signals
+    rebuilt = new_monitors.get_summary(0, None, 20)
+    for summary, expected in zip(incremental, rebuilt):
+        assert (summary == expected).all()
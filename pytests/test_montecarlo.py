@@ -0,0 +1,130 @@
+"""Test the montecarlo module."""
+import random
+
+import numpy as np
+import pytest
+
+from main_project.equivalence import load_circuit
+from main_project.montecarlo import MonteCarlo
+
+counter_definition = """DEVICES {
+    A, B are DTYPE;
+    RST, ST, CK are SWITCH;
+}
+CONNECTIONS {
+    device A {
+        A.QBAR to A.DATA;
+        RST to A.CLEAR;
+        ST to A.SET;
+        CK to A.CLK;
+    }
+    device B {
+        B.QBAR to B.DATA;
+        RST to B.CLEAR;
+        ST to B.SET;
+        A.Q to B.CLK;
+    }
+}
+MONITOR {
+    A.Q, B.Q;
+}
+STIMULUS {
+    CK set 1 at 1 every 2;
+    CK set 0 at 2 every 2;
+}
+"""
+
+# A ripple counter driven by a clock, as in circuits/ripplecounter.txt
+ripple_definition = """DEVICES {
+    A, B, C are DTYPE;
+    RST, ST are SWITCH;
+    CK is CLOCK;
+    CK has cycle 1;
+}
+CONNECTIONS {
+    device A {
+        A.QBAR to A.DATA;
+        RST to A.CLEAR;
+        ST to A.SET;
+        CK to A.CLK;
+    }
+    device B {
+        B.QBAR to B.DATA;
+        RST to B.CLEAR;
+        ST to B.SET;
+        A.Q to B.CLK;
+    }
+    device C {
+        C.QBAR to C.DATA;
+        RST to C.CLEAR;
+        ST to C.SET;
+        B.Q to C.CLK;
+    }
+}
+MONITOR {
+    A.Q, B.Q, C.Q, CK;
+}
+"""
+
+reset_stimulus = """    RST set 1 at 0;
+    RST set 0 at 1;
+}
+"""
+
+
+@pytest.fixture
+def load(tmp_path):
+    """Return a function that loads a circuit from a definition string."""
+    def load_definition(definition):
+        path = tmp_path / "circuit.txt"
+        path.write_text(definition)
+        return load_circuit(str(path))
+    return load_definition
+
+
+def test_cold_startup_seed(load):
+    """Test that a seeded cold start-up is reproducible."""
+    devices = load(counter_definition).devices
+    memories = []
+    for repeat in range(2):
+        devices.cold_startup(random.Random(7))
+        memories.append([device.dtype_memory
+                         for device in devices.devices_list])
+    assert memories[0] == memories[1]
+
+
+def test_reset_circuit(load):
+    """Test that every sample of a reset circuit settles at once."""
+    definition = counter_definition[:-2] + reset_stimulus
+    monte_carlo = MonteCarlo(load(definition), samples=64, seed=1)
+    traces = monte_carlo.run_bitparallel(8)
+    assert monte_carlo.run_forks(8) == traces
+
+    statistics = monte_carlo.run(8)
+    assert list(statistics) == ["A.Q", "B.Q"]
+    # A.Q toggles on every rising edge of CK and B.Q on every one of A.Q
+    assert list(statistics["A.Q"]["high"]) == [0, 1, 1, 0, 0, 1, 1, 0]
+    assert list(statistics["B.Q"]["high"]) == [0, 1, 1, 1, 1, 0, 0, 0]
+    assert list(statistics["A.Q"]["settle"]) == [64] + [0] * 8
+
+
+def test_random_circuit(load):
+    """Test the statistics of a circuit that is never reset."""
+    monte_carlo = MonteCarlo(load(counter_definition), samples=4096, seed=2)
+    statistics = monte_carlo.run(6)
+    high = statistics["A.Q"]["high"]
+    settle = statistics["A.Q"]["settle"]
+    assert np.all(np.abs(high - 0.5) < 0.05)
+    assert settle.sum() == 4096
+    assert 0.45 < settle[-1] / 4096 < 0.55  # half never settle
+
+    again = MonteCarlo(load(counter_definition), samples=4096,
+                       seed=2).run(6)
+    assert np.array_equal(again["B.Q"]["high"], statistics["B.Q"]["high"])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_backends_agree(load, seed):
+    """Test that both backends simulate the same start-up states."""
+    monte_carlo = MonteCarlo(load(ripple_definition), samples=32, seed=seed)
+    assert monte_carlo.run_bitparallel(12) == monte_carlo.run_forks(12)
@@ -1,5 +1,6 @@
 """Test the network module."""
 import pytest
+import numpy as np
 
 from main_project.names import Names
 from main_project.devices import Devices
@@ -139,6 +140,23 @@ def test_make_connection(network_with_devices):
                           I2: (SW2_ID, None)}
 
 
+def test_make_connections(network_with_devices):
+    """Test that make_connections makes many connections and finds errors."""
+    network = network_with_devices
+    devices = network.devices
+    [SW1_ID, SW2_ID, OR1_ID, I1, I2, I3] = devices.names.lookup(
+        ["Sw1", "Sw2", "Or1", "I1", "I2", "I3"])
+
+    errors = network.make_connections([(SW1_ID, None, OR1_ID, I1),
+                                       (OR1_ID, I1, SW2_ID, None),
+                                       (SW2_ID, None, OR1_ID, I3),
+                                       (OR1_ID, I2, SW2_ID, None)])
+    assert errors == [(1, network.INPUT_CONNECTED), (2, network.PORT_ABSENT)]
+    assert network.get_connected_output(OR1_ID, I1) == (SW1_ID, None)
+    assert network.get_connected_output(OR1_ID, I2) == (SW2_ID, None)
+    assert network.make_connections([]) == []
+
+
 @pytest.mark.parametrize("function_args, error", [
     # I1 is not a valid device id
     ("(I1, I1, OR1_ID, I2)", "network.DEVICE_ABSENT"),
@@ -256,9 +274,11 @@ def test_execute_non_xor_gates(new_network, gate_id, switch_outputs,
     assert network.get_output_signal(gate_id, None) == eval(gate_output)
 
 
-def test_execute_non_gates(new_network):
+@pytest.mark.parametrize("packed", [False, True])
+def test_execute_non_gates(new_network, packed):
     """Test if execute_network returns the correct output for non-gate devices.
-    Tests switches, D-types and clocks.
+    Tests switches, D-types and clocks, with the devices stored in
+    dictionaries or packed into arrays.
     """
     network = new_network
     devices = network.devices
@@ -281,6 +301,8 @@ def test_execute_non_gates(new_network):
     network.make_connection(CL_ID, None, D_ID, devices.CLK_ID)
     network.make_connection(SW2_ID, None, D_ID, devices.SET_ID)
     network.make_connection(SW3_ID, None, D_ID, devices.CLEAR_ID)
+    if packed:
+        devices.pack()
 
     # Get device outputs, the expression is in a string here so that it
     # can be re-evaluated again after executing devices
@@ -347,3 +369,318 @@ def test_oscillating_network(new_network):
     network.make_connection(NOR1, None, NOR1, I1)
 
     assert not network.execute_network()
+
+
+def test_execute_not(new_network):
+    """Test if execute_network returns the correct output for NOT gates."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SW1_ID, NOT1_ID, I1] = names.lookup(["Sw1", "Not1", "I1"])
+    devices.make_device(NOT1_ID, devices.NOT, 1)
+    devices.make_device(SW1_ID, devices.SWITCH, 0)
+    network.make_connection(SW1_ID, None, NOT1_ID, I1)
+
+    network.execute_network()
+    assert network.get_output_signal(NOT1_ID, None) == devices.HIGH
+
+    devices.set_switch(SW1_ID, devices.HIGH)
+    network.execute_network()
+    assert network.get_output_signal(NOT1_ID, None) == devices.LOW
+
+
+def test_execute_registered_kind(new_network):
+    """Test if the network executes devices of a registered kind."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [BUF_ID, SW1_ID, B1_ID, I1] = names.lookup(["BUF", "Sw1", "B1", "I1"])
+
+    def create_buffer(device_id, device_kind, device_property):
+        devices.add_device(device_id, device_kind)
+        devices.add_input(device_id, I1)
+        devices.add_output(device_id, None)
+        return devices.NO_ERROR
+
+    def execute_buffer(network, device_id):
+        """Drive the output towards the input signal."""
+        target = network.get_input_signal(device_id, I1)
+        device = network.devices.get_device(device_id)
+        device.outputs[None] = network.update_signal(device.outputs[None],
+                                                     target)
+        return True
+
+    devices.register_kind(BUF_ID, create_buffer, execute_buffer, [I1],
+                          [None], False)
+    devices.make_device(SW1_ID, devices.SWITCH, 1)
+    devices.make_device(B1_ID, BUF_ID)
+    network.make_connection(SW1_ID, None, B1_ID, I1)
+
+    assert network.execute_network()
+    assert network.get_output_signal(B1_ID, None) == devices.HIGH
+
+
+def test_execute_lut(new_network):
+    """Test if execute_network looks up the output of LUT devices."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SW1_ID, SW2_ID, SW3_ID, MAJ_ID, I1, I2,
+     I3] = names.lookup(["Sw1", "Sw2", "Sw3", "Maj", "I1", "I2", "I3"])
+
+    # 3-input majority gate
+    assert devices.make_device(MAJ_ID, devices.LUT,
+                               (3, "00010111")) == devices.NO_ERROR
+    switches = [SW1_ID, SW2_ID, SW3_ID]
+    for switch_id, input_id in zip(switches, [I1, I2, I3]):
+        devices.make_device(switch_id, devices.SWITCH, 0)
+        network.make_connection(switch_id, None, MAJ_ID, input_id)
+
+    for pattern in range(8):
+        for bit, switch_id in enumerate(switches):
+            devices.set_switch(switch_id, (pattern >> bit) & 1)
+        network.execute_network()
+        expected = (devices.HIGH if bin(pattern).count("1") >= 2
+                    else devices.LOW)
+        assert network.get_output_signal(MAJ_ID, None) == expected
+
+
+def test_lut_lookup(new_network):
+    """Test if lut_lookup evaluates arrays of input patterns at once."""
+    network = new_network
+    devices = network.devices
+    LOW = devices.LOW
+    HIGH = devices.HIGH
+    RISING = devices.RISING
+
+    # Multiplexer: output I1 when I3 is LOW, else output I2
+    lut_table = devices.build_lut_table("01010011", 3)
+    input_signals = [np.array([HIGH, HIGH, LOW, RISING]),
+                     np.array([LOW, LOW, HIGH, LOW]),
+                     np.array([LOW, HIGH, HIGH, LOW])]
+    assert network.lut_lookup(lut_table,
+                              input_signals).tolist() == [HIGH, LOW, HIGH,
+                                                          HIGH]
+
+    assert devices.build_lut_table("0101001", 3) is None
+    assert devices.build_lut_table("01010012", 3) is None
+
+
+def test_execute_bus_devices(new_network):
+    """Test if counters, registers and adders work on N-bit buses."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [CLOCK_ID, COUNT_ID, REG_ID, ADD_ID, CLK, DATA, A, B,
+     COUT] = names.lookup(["Clock", "Count", "Reg", "Add", "CLK", "DATA", "A",
+                           "B", "COUT"])
+    devices.make_device(CLOCK_ID, devices.CLOCK, 1)
+    devices.make_device(COUNT_ID, devices.COUNTER, 4)
+    devices.make_device(REG_ID, devices.REGISTER, 4)
+    devices.make_device(ADD_ID, devices.ADDER, 4)
+    network.make_connection(CLOCK_ID, None, COUNT_ID, CLK)
+    network.make_connection(CLOCK_ID, None, REG_ID, CLK)
+    network.make_connection(COUNT_ID, None, REG_ID, DATA)
+    network.make_connection(COUNT_ID, None, ADD_ID, A)
+    network.make_connection(REG_ID, None, ADD_ID, B)
+
+    counts = []
+    registers = []
+    for _ in range(40):
+        assert network.execute_network()
+        counts.append(network.get_output_signal(COUNT_ID, None))
+        registers.append(network.get_output_signal(REG_ID, None))
+        total = counts[-1] + registers[-1]
+        assert network.get_output_signal(ADD_ID, None) == total % 16
+        assert network.get_output_signal(ADD_ID, COUT) == (
+            devices.HIGH if total > 15 else devices.LOW)
+
+    # The counter steps on every other cycle, and the register stores the
+    # count from before each clock edge
+    changes = [i for i in range(1, 40) if counts[i] != counts[i - 1]]
+    assert changes == list(range(changes[0], 40, 2))
+    for i in changes:
+        assert counts[i] == (counts[i - 1] + 1) % 16
+        assert registers[i] == counts[i - 1]
+
+
+@pytest.mark.parametrize("width", [2, 5, 8, 12])
+def test_execute_lfsr(new_network, width):
+    """Test if the default LFSR taps give a maximal-length sequence."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SW_ID, LFSR_ID, CLK] = names.lookup(["Sw", "Lfsr", "CLK"])
+    devices.make_device(SW_ID, devices.SWITCH, 0)
+    devices.make_device(LFSR_ID, devices.LFSR, width)
+    network.make_connection(SW_ID, None, LFSR_ID, CLK)
+
+    states = set()
+    for _ in range(2 ** width - 1):
+        states.add(network.get_output_signal(LFSR_ID, None))
+        # Toggle the switch to make one rising edge
+        devices.set_switch(SW_ID, 1)
+        network.execute_network()
+        devices.set_switch(SW_ID, 0)
+        network.execute_network()
+    assert states == set(range(1, 2 ** width))
+
+
+def test_execute_comparator_and_mux(new_network):
+    """Test if comparators and multiplexers select the right bus values."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SW_ID, HOLD_ID, REG1_ID, REG2_ID, CMP_ID, MUX_ID, CLK, DATA, SEL, A, B,
+     EQ, LT, GT] = names.lookup(["Sw", "Hold", "Reg1", "Reg2", "Cmp", "Mux",
+                                 "CLK", "DATA", "SEL", "A", "B", "EQ", "LT",
+                                 "GT"])
+    devices.make_device(SW_ID, devices.SWITCH, 0)
+    devices.make_device(HOLD_ID, devices.SWITCH, 0)
+    # The registers are never clocked, so they output their stored values
+    for device_id in [REG1_ID, REG2_ID]:
+        devices.make_device(device_id, devices.REGISTER, 8)
+        network.make_connection(HOLD_ID, None, device_id, CLK)
+        network.make_connection(device_id, None, device_id, DATA)
+    devices.make_device(CMP_ID, devices.COMPARATOR, 8)
+    devices.make_device(MUX_ID, devices.MUX, 8)
+    network.make_connection(REG1_ID, None, CMP_ID, A)
+    network.make_connection(REG2_ID, None, CMP_ID, B)
+    network.make_connection(SW_ID, None, MUX_ID, SEL)
+    network.make_connection(REG1_ID, None, MUX_ID, A)
+    network.make_connection(REG2_ID, None, MUX_ID, B)
+
+    for value1, value2 in [(3, 200), (77, 77), (255, 0)]:
+        devices.get_device(REG1_ID).bus_memory = value1
+        devices.get_device(REG2_ID).bus_memory = value2
+        for select, expected in [(0, value1), (1, value2)]:
+            devices.set_switch(SW_ID, select)
+            network.execute_network()
+            assert network.get_output_signal(MUX_ID, None) == expected
+        signals = [network.get_output_signal(CMP_ID, port_id)
+                   for port_id in [EQ, LT, GT]]
+        expected = [value1 == value2, value1 < value2, value1 > value2]
+        assert signals == [devices.HIGH if result else devices.LOW
+                           for result in expected]
+
+
+def test_bus_width_mismatch(new_network):
+    """Test if buses of different widths and signals cannot be connected."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SW_ID, COUNT_ID, REG_ID, CLK, DATA] = names.lookup(["Sw", "Count", "Reg",
+                                                         "CLK", "DATA"])
+    devices.make_device(SW_ID, devices.SWITCH, 0)
+    devices.make_device(COUNT_ID, devices.COUNTER, 4)
+    devices.make_device(REG_ID, devices.REGISTER, 8)
+
+    assert network.make_connection(COUNT_ID, None, REG_ID,
+                                   DATA) == network.WIDTH_MISMATCH
+    assert network.make_connection(SW_ID, None, REG_ID,
+                                   DATA) == network.WIDTH_MISMATCH
+    assert network.make_connection(COUNT_ID, None, REG_ID,
+                                   CLK) == network.WIDTH_MISMATCH
+    assert devices.set_bus_width(REG_ID, 4)
+    assert network.make_connection(REG_ID, DATA, COUNT_ID,
+                                   None) == network.NO_ERROR
+
+
+def test_execute_memory(new_network):
+    """Test if a RAM stores words on clock edges and a ROM looks them up."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [CLOCK_ID, COUNT_ID, WE_SW_ID, RAM_ID, ROM_ID, CLK, ADDR, DATA,
+     WE] = names.lookup(["Clock", "Count", "We", "Ram", "Rom", "CLK", "ADDR",
+                         "DATA", "WE"])
+    devices.make_device(CLOCK_ID, devices.CLOCK, 1)
+    devices.make_device(COUNT_ID, devices.COUNTER, 4)
+    devices.make_device(WE_SW_ID, devices.SWITCH, 1)
+    devices.make_device(RAM_ID, devices.RAM, (16, 4))
+    devices.make_device(ROM_ID, devices.ROM, (16, 4))
+    devices.load_memory(ROM_ID, [(3 * address) % 16 for address in range(16)])
+    network.make_connection(CLOCK_ID, None, COUNT_ID, CLK)
+    network.make_connection(CLOCK_ID, None, RAM_ID, CLK)
+    network.make_connection(COUNT_ID, None, RAM_ID, ADDR)
+    network.make_connection(COUNT_ID, None, RAM_ID, DATA)
+    network.make_connection(WE_SW_ID, None, RAM_ID, WE)
+    network.make_connection(COUNT_ID, None, ROM_ID, ADDR)
+
+    # Each word is written with its own address
+    for _ in range(40):
+        assert network.execute_network()
+        count = network.get_output_signal(COUNT_ID, None)
+        assert network.get_output_signal(ROM_ID, None) == (3 * count) % 16
+    assert devices.get_device(RAM_ID).memory.tolist() == list(range(16))
+
+    # With WE LOW, the RAM reads back the words
+    devices.set_switch(WE_SW_ID, 0)
+    devices.get_device(RAM_ID).memory[:] = 15
+    for _ in range(4):
+        assert network.execute_network()
+        assert network.get_output_signal(RAM_ID, None) == 15
+
+
+def test_update_signals(new_network):
+    """Test if the transition table updates signals one or many at a time."""
+    network = new_network
+    devices = network.devices
+    LOW, HIGH, RISING, FALLING, BLANK = range(5)
+
+    expected = {(LOW, LOW): LOW, (LOW, HIGH): RISING,
+                (FALLING, LOW): LOW, (FALLING, HIGH): RISING,
+                (HIGH, LOW): FALLING, (HIGH, HIGH): HIGH,
+                (RISING, LOW): FALLING, (RISING, HIGH): HIGH}
+    for (signal, target), new_signal in expected.items():
+        network.steady_state = True
+        assert network.update_signal(signal, target) == new_signal
+        assert network.steady_state == (signal == new_signal)
+    assert network.update_signal(BLANK, LOW) is None
+    assert network.update_signal(7, LOW) is None
+
+    # As before the transition table, any target other than LOW drives HIGH
+    for target in [None, RISING, FALLING, BLANK, 7, -1, 255]:
+        assert network.update_signal(LOW, target) == RISING
+        assert network.update_signal(HIGH, target) == HIGH
+
+    signals = np.array([signal for signal, target in expected])
+    targets = np.array([target for signal, target in expected])
+    network.steady_state = True
+    assert network.update_signals(signals, targets).tolist() == list(
+        expected.values())
+    assert not network.steady_state
+
+    network.steady_state = True
+    settled = np.array([LOW, HIGH, HIGH])
+    assert network.update_signals(settled, settled).tolist() == [LOW, HIGH,
+                                                                 HIGH]
+    assert network.steady_state
+    assert network.update_signals(np.array([LOW, BLANK]),
+                                  np.array([HIGH, HIGH])) is None
+    assert network.update_signals(np.array([LOW, HIGH, LOW]),
+                                  np.array([FALLING, 255, 7])).tolist() == [
+                                      RISING, HIGH, RISING]
+    assert devices.BLANK == BLANK
+
+
+def test_execute_siggen(new_network):
+    """Test that a signal generator repeats a trace longer than a byte."""
+    network = new_network
+    devices = network.devices
+    [SG_ID] = devices.names.lookup(["Sg1"])
+    devices.make_device(SG_ID, devices.SIGGEN, "100110101")
+    signals = []
+    for cycle in range(18):
+        assert network.execute_network()
+        signals.append(devices.get_device(SG_ID).outputs[None])
+    # The generator starts at the first bit and outputs the next one first
+    assert signals == [0, 0, 1, 1, 0, 1, 0, 1, 1] * 2
@@ -47,7 +47,29 @@ def test_heading_ordering(input):
                                         ("A is a NAND gate; B is a DTYPE; A has 2 inputs;", 1),
                                         ("{A is a NAND gate; B is a DTYPE;}", 2), # NAND gates need num of inputs defined - semantic
                                         ("{A is a NAND gate; B is a DTYPE; A has 18 inputs}", 2), # max ins is 16
-                                        ("{A is a SIGGEN; A has trace 10001;}",0)])  # works
+                                        # works
+                                        ("{A is a SIGGEN; A has trace 10001;}",
+                                         0),
+                                        # works
+                                        ("{M is LUT; M has 3 inputs; "
+                                         "M has table 00010111;}", 0),
+                                        # table needs 2^n entries - semantic
+                                        ("{M is LUT; M has 3 inputs; "
+                                         "M has table 0001;}", 2),
+                                        # LUTs need a table - semantic
+                                        ("{M is LUT; M has 3 inputs;}", 2),
+                                        # works
+                                        ("{R is REG; R has width 16;}", 0),
+                                        # LFSRs are at most 32 bits wide
+                                        # - semantic
+                                        ("{L is LFSR; L has width 40;}", 2),
+                                        # buses have fixed ports - semantic
+                                        ("{R is REG; R has 2 inputs;}", 2),
+                                        # works
+                                        ("{M is RAM; M has depth 1024; "
+                                         "M has width 16;}", 0),
+                                        # only memories have a depth - semantic
+                                        ("{R is REG; R has depth 4;}", 2)])
 def test_devices_section(inputs, id):
     new_parser = startup_parser(inputs)
     if id == 0:
@@ -198,6 +220,29 @@ MONITOR {
     return string
 
 
+@pytest.mark.parametrize("string, id",
+                         # works
+                         [("{S1 set 1 at 3; S1 set 0 at 0 every 4;}", 0),
+                          # missing cycle - syntax
+                          ("{S1 set 1;}", 1),
+                          # only switches can be set - semantic
+                          ("{A set 1 at 3;}", 2)])
+def test_stimulus_section(string, id):
+    device_init = "devices{A is a NAND gate; S1 is SWITCH; A has 2 inputs;} " \
+                  "connections{device A{S1 to A.I1; S1 to A.I2;}} stimulus"
+    new_parser = startup_parser(device_init + string)
+    if id == 0:
+        new_parser.parse_network()
+        assert new_parser.parse_error_count == 0
+        assert len(new_parser.network.stimulus.schedule) == 2
+    elif id == 1:
+        with pytest.raises(SyntaxError):
+            new_parser.parse_network()
+    elif id == 2:
+        with pytest.raises(SemanticError):
+            new_parser.parse_network()
+
+
 def test_d_type(big_test_file):
     new_parser = startup_parser(big_test_file)
     assert new_parser.parse_network() is True
@@ -0,0 +1,96 @@
+"""Test the profiler module."""
+import pytest
+
+from main_project.names import Names
+from main_project.devices import Devices
+from main_project.network import Network
+from main_project.monitors import Monitors
+from main_project.profiler import Profiler
+
+
+@pytest.fixture
+def profiled_monitors():
+    """Return a Monitors class instance on a network with a profiler."""
+    new_names = Names()
+    new_devices = Devices(new_names)
+    new_network = Network(new_names, new_devices)
+    new_monitors = Monitors(new_names, new_devices, new_network)
+
+    [SW1_ID, SW2_ID, OR1_ID, I1, I2] = new_names.lookup(["Sw1", "Sw2", "Or1",
+                                                         "I1", "I2"])
+    new_devices.make_device(SW1_ID, new_devices.SWITCH, 0)
+    new_devices.make_device(SW2_ID, new_devices.SWITCH, 0)
+    new_devices.make_device(OR1_ID, new_devices.OR, 2)
+    new_network.make_connection(SW1_ID, None, OR1_ID, I1)
+    new_network.make_connection(SW2_ID, None, OR1_ID, I2)
+    new_monitors.make_monitor(OR1_ID, None)
+
+    new_network.profiler = Profiler(new_names)
+    return new_monitors
+
+
+def test_profiler_counters(profiled_monitors):
+    """Test if the profiler counts cycles, iterations and evaluations."""
+    network = profiled_monitors.network
+    devices = profiled_monitors.devices
+    [SW1_ID] = devices.names.lookup(["Sw1"])
+
+    for _ in range(3):
+        network.execute_network()
+        profiled_monitors.record_signals()
+    # Switching Sw1 takes more settle iterations: the switch and the OR gate
+    # both go through RISING before settling at HIGH
+    devices.set_switch(SW1_ID, devices.HIGH)
+    network.execute_network()
+    profiled_monitors.record_signals()
+
+    results = network.profiler.as_dict()
+    assert results["cycles"] == 4
+    assert results["settle_iterations"] == {1: 3, 3: 1}
+    # Three devices are evaluated in each settle iteration
+    assert results["devices_evaluated"] == {3: 3, 9: 1}
+    assert results["kinds"]["SWITCH"]["evaluations"] == 12
+    assert results["kinds"]["OR"]["evaluations"] == 6
+    assert set(results["phases"]) == {"update_clocks", "settle",
+                                      "record_signals"}
+
+
+def test_profiler_report(profiled_monitors):
+    """Test if the report lists the phases and device kinds."""
+    network = profiled_monitors.network
+    network.execute_network()
+    profiled_monitors.record_signals()
+
+    report = network.profiler.report()
+    assert report.startswith("Cycles simulated: 1")
+    assert "record_signals" in report
+    assert "SWITCH" in report
+
+    network.profiler.reset()
+    assert network.profiler.as_dict()["cycles"] == 0
+
+
+def test_profiler_disabled(profiled_monitors):
+    """Test if nothing is collected once the profiler is detached."""
+    network = profiled_monitors.network
+    profiler = network.profiler
+    network.profiler = None
+    network.execute_network()
+    profiled_monitors.record_signals()
+    assert profiler.as_dict()["cycles"] == 0
+
+
+def test_profiler_failed_cycle(profiled_monitors):
+    """Test if a cycle is counted when a device cannot be executed."""
+    network = profiled_monitors.network
+    devices = profiled_monitors.devices
+    assert network.execute_network()
+    # A gate added after the first cycle is executed, and fails as its
+    # inputs are unconnected
+    [AND1_ID] = devices.names.lookup(["And1"])
+    devices.make_device(AND1_ID, devices.AND, 2)
+    assert not network.execute_network()
+
+    results = network.profiler.as_dict()
+    assert results["cycles"] == 2
+    assert sum(results["settle_iterations"].values()) == 2
@@ -0,0 +1,144 @@
+"""Test the replay module."""
+import numpy as np
+import pytest
+
+from main_project.names import Names
+from main_project.devices import Devices
+from main_project.network import Network
+from main_project.replay import CsvReplay, NpyReplay, VcdReplay
+
+
+@pytest.fixture
+def new_network():
+    """Return a Network class instance with two switches and an AND gate."""
+    new_names = Names()
+    new_devices = Devices(new_names)
+    new_network = Network(new_names, new_devices)
+
+    [SW1_ID, SW2_ID, AND1_ID, I1, I2] = new_names.lookup(["Sw1", "Sw2",
+                                                          "And1", "I1", "I2"])
+    new_devices.make_device(SW1_ID, new_devices.SWITCH, 0)
+    new_devices.make_device(SW2_ID, new_devices.SWITCH, 0)
+    new_devices.make_device(AND1_ID, new_devices.AND, 2)
+    new_network.make_connection(SW1_ID, None, AND1_ID, I1)
+    new_network.make_connection(SW2_ID, None, AND1_ID, I2)
+    return new_network
+
+
+# Switch values of Sw1 and Sw2 for 8 cycles
+values = [[0, 0], [1, 0], [1, 1], [1, 1], [0, 1], [0, 1], [1, 1], [0, 0]]
+
+
+def run(network, cycles):
+    """Execute the network and return the signals at the AND gate output."""
+    [AND1_ID] = network.devices.names.lookup(["And1"])
+    signals = []
+    for _ in range(cycles):
+        network.execute_network()
+        signals.append(network.get_output_signal(AND1_ID, None))
+    return signals
+
+
+expected = [int(sw1 and sw2) for sw1, sw2 in values]
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 100])
+def test_csv_replay(new_network, tmp_path, chunk):
+    """Test if switch values are replayed from a CSV file in chunks."""
+    path = tmp_path / "stimulus.csv"
+    path.write_text("Sw1,Sw2\n" + "".join("{},{}\n".format(*row)
+                                          for row in values))
+    new_network.stimulus = CsvReplay(new_network.devices, str(path), chunk)
+    assert run(new_network, 10) == expected + [0, 0]
+
+    new_network.reset_stimulus()
+    assert run(new_network, 3) == expected[:3]
+
+
+def test_npy_replay(new_network, tmp_path):
+    """Test if switch values are replayed from a memory-mapped .npy file."""
+    path = str(tmp_path / "stimulus.npy")
+    np.save(path, np.array(values, dtype=np.uint8))
+    new_network.stimulus = NpyReplay(new_network.devices, path,
+                                     ["Sw1", "Sw2"], 3)
+    assert run(new_network, 4) == expected[:4]
+
+    # A fork continues from the same cycle
+    branch = new_network.fork()
+    assert run(branch, 4) == expected[4:]
+    assert run(new_network, 4) == expected[4:]
+
+    with pytest.raises(ValueError):
+        NpyReplay(new_network.devices, path, ["Sw1", "And1"])
+
+
+def test_vcd_replay(new_network, tmp_path):
+    """Test if switch changes are replayed from a VCD file."""
+    path = tmp_path / "stimulus.vcd"
+    path.write_text("""$timescale 1ns $end
+$scope module top $end
+$var wire 1 ! Sw1 $end
+$var wire 1 " Sw2 $end
+$var wire 4 # Bus $end
+$var wire 1 $ Reset $end
+$upscope $end
+$enddefinitions $end
+$dumpvars
+0!
+0"
+b0000 #
+1$
+$end
+#10
+1!
+0$
+#20
+1"
+#40
+0!
+b1010 #
+#60
+1!
+#70
+0!
+0"
+""")
+    new_network.stimulus = VcdReplay(new_network.devices, str(path),
+                                     cycle_time=10, chunk=2)
+    assert run(new_network, 8) == expected
+
+
+def test_invalid_stimulus(new_network, tmp_path):
+    """Test that values other than 0 and 1 and unknown signals are
+    rejected without adding names.
+
+    Unknown variables of a VCD file are ignored instead.
+    """
+    names = new_network.devices.names
+    name_count = len(names.names)
+    [SW1_ID] = names.lookup(["Sw1"])
+    path = tmp_path / "stimulus.csv"
+    path.write_text("Sw1,Sw2\n0,1\n2,0\n")
+    with pytest.raises(ValueError):
+        CsvReplay(new_network.devices, str(path))
+
+    path = str(tmp_path / "stimulus.npy")
+    np.save(path, np.array([[0, 1], [1, 3]], dtype=np.uint8))
+    with pytest.raises(ValueError):
+        NpyReplay(new_network.devices, path, ["Sw1", "Sw2"])
+    with pytest.raises(ValueError):
+        NpyReplay(new_network.devices, path, ["Sw1", "Sw3"])
+    np.save(path, np.array([[0, 1], [1, 0]], dtype=float))
+    with pytest.raises(ValueError):
+        NpyReplay(new_network.devices, path, ["Sw1", "Sw2"])
+
+    header = ("$var wire 1 ! Sw1 $end\n$var wire 1 \" {} $end\n"
+              "$enddefinitions $end\n")
+    path = tmp_path / "stimulus.vcd"
+    path.write_text(header.format("Sw3") + "#0\n0!\n1\"\n")
+    assert VcdReplay(new_network.devices, str(path)).switches == [
+        new_network.devices.get_device(SW1_ID)]
+    path.write_text(header.format("And1") + "#0\n2!\n")
+    with pytest.raises(ValueError):
+        VcdReplay(new_network.devices, str(path))
+    assert len(names.names) == name_count
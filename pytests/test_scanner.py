@@ -108,9 +108,11 @@ def test_get_symbol_ignore():
         val = test_scan.get_symbol()
         assert val is None
     after_num = len(empty_names.names)
-    assert before + 12 == after_num
-    assert empty_names.names == ["devices", "connections", "monitor", "are", "is", "have", "has",
-                                 "set", "to", "cycle", "trace", "device"]
+    assert before + 18 == after_num
+    assert empty_names.names == ["devices", "connections", "monitor",
+                                 "stimulus", "are", "is", "have", "has",
+                                 "set", "to", "cycle", "trace", "table",
+                                 "width", "depth", "at", "every", "device"]
 
 
 def test_wordcount(new_names):
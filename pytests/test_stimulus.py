@@ -0,0 +1,91 @@
+"""Test the stimulus module."""
+import pytest
+
+from main_project.names import Names
+from main_project.devices import Devices
+from main_project.network import Network
+from main_project.stimulus import Stimulus
+
+
+@pytest.fixture
+def network_with_stimulus():
+    """Return a Network class instance with a stimulus and two switches."""
+    new_names = Names()
+    new_devices = Devices(new_names)
+    new_network = Network(new_names, new_devices)
+
+    [SW1_ID, SW2_ID] = new_names.lookup(["Sw1", "Sw2"])
+    new_devices.make_device(SW1_ID, new_devices.SWITCH, 0)
+    new_devices.make_device(SW2_ID, new_devices.SWITCH, 0)
+
+    new_network.stimulus = Stimulus(new_devices)
+    return new_network
+
+
+def run(network, device_id, cycles):
+    """Execute the network and return the signals of the device."""
+    signals = []
+    for _ in range(cycles):
+        network.execute_network()
+        signals.append(network.get_output_signal(device_id, None))
+    return signals
+
+
+def test_add_event(network_with_stimulus):
+    """Test if add_event returns the appropriate errors."""
+    network = network_with_stimulus
+    stimulus = network.stimulus
+    devices = network.devices
+    [SW1_ID, X_ID] = devices.names.lookup(["Sw1", "X"])
+
+    assert stimulus.add_event(SW1_ID, devices.HIGH, 3) == stimulus.NO_ERROR
+    assert stimulus.add_event(X_ID, devices.HIGH, 3) == stimulus.NOT_SWITCH
+    assert stimulus.add_event(SW1_ID, devices.RISING,
+                              3) == stimulus.INVALID_SIGNAL
+    assert stimulus.add_event(SW1_ID, devices.LOW,
+                              -1) == stimulus.INVALID_CYCLE
+    assert stimulus.add_event(SW1_ID, devices.LOW, 1,
+                              0) == stimulus.INVALID_CYCLE
+    assert stimulus.next_cycle == 3
+
+
+def test_apply(network_with_stimulus):
+    """Test if scheduled and repeating switch changes are applied."""
+    network = network_with_stimulus
+    stimulus = network.stimulus
+    devices = network.devices
+    [SW1_ID, SW2_ID] = devices.names.lookup(["Sw1", "Sw2"])
+    HIGH = devices.HIGH
+    LOW = devices.LOW
+
+    stimulus.add_event(SW1_ID, HIGH, 1, 4)
+    stimulus.add_event(SW1_ID, LOW, 3, 4)
+    stimulus.add_event(SW2_ID, HIGH, 5)
+    stimulus.add_event(SW2_ID, LOW, 5)  # added later, so applied later
+
+    assert run(network, SW1_ID, 10) == [LOW, HIGH, HIGH, LOW, LOW, HIGH, HIGH,
+                                        LOW, LOW, HIGH]
+    assert network.get_output_signal(SW2_ID, None) == LOW
+
+    # A fork continues the schedule without affecting the original
+    branch = network.fork()
+    assert run(branch, SW1_ID, 2) == [HIGH, LOW]
+    assert network.cycle == 10
+
+    network.reset_stimulus()
+    devices.set_switch(SW1_ID, LOW)
+    assert run(network, SW1_ID, 3) == [LOW, HIGH, HIGH]
+
+
+def test_apply_late(network_with_stimulus):
+    """Test if events added for past cycles are applied on the next cycle."""
+    network = network_with_stimulus
+    devices = network.devices
+    [SW1_ID] = devices.names.lookup(["Sw1"])
+
+    run(network, SW1_ID, 6)
+    network.stimulus.add_event(SW1_ID, devices.HIGH, 1, 10)
+    network.stimulus.add_event(SW1_ID, devices.LOW, 2, 10)
+    # Both events are applied at cycle 6, then repeat from cycles 11 and 12
+    assert run(network, SW1_ID, 6) == [devices.LOW] * 5 + [devices.HIGH]
+    assert network.stimulus.next_cycle == 12
@@ -0,0 +1,126 @@
+"""Test the traces module."""
+import pytest
+import numpy as np
+
+from main_project.traces import (RunLengthTrace, DecimatedTrace, WindowedTrace,
+                                 TraceWriter, TraceReader, TracePyramid,
+                                 get_buckets)
+
+
+@pytest.fixture
+def new_trace():
+    """Return a RunLengthTrace instance holding ten cycles."""
+    return RunLengthTrace(np.array([0, 0, 0, 1, 1, 0, 0, 0, 0, 1]))
+
+
+def test_append(new_trace):
+    """Test that only changes of the signal start new runs."""
+    assert len(new_trace) == 10
+    assert list(new_trace.starts) == [0, 3, 5, 9]
+    assert list(new_trace.values) == [0, 1, 0, 1]
+    new_trace.append(1)
+    new_trace.extend(np.array([1, 1, 0]))
+    new_trace.extend_run(0, 1000)
+    assert len(new_trace) == 1014
+    assert list(new_trace.starts) == [0, 3, 5, 9, 13]
+    assert new_trace.get_size() == 5 * 16
+
+
+def test_get_signal(new_trace):
+    """Test random access by cycle."""
+    signals = [new_trace.get_signal(cycle) for cycle in range(10)]
+    assert signals == [0, 0, 0, 1, 1, 0, 0, 0, 0, 1]
+    assert new_trace.get_signal(-2) == 0
+    with pytest.raises(IndexError):
+        new_trace.get_signal(10)
+
+
+@pytest.mark.parametrize("start, stop", [
+    (0, None), (4, 7), (3, 5), (9, 10), (5, 2), (-3, None)])
+def test_to_array(new_trace, start, stop):
+    """Test that windows of the trace expand to the same signals."""
+    signals = [0, 0, 0, 1, 1, 0, 0, 0, 0, 1]
+    window = new_trace.to_array(start, stop)
+    assert window.dtype == np.uint8
+    assert window.tolist() == signals[start:stop]
+
+
+def test_trace_store(tmp_path):
+    """Test that windows read from disk match the signals written."""
+    generator = np.random.default_rng(0)
+    signals = generator.integers(0, 2, (3, 1000), dtype=np.uint8)
+    path = tmp_path / "store"
+    writer = TraceWriter(path, ["A", "B", "C.Q"], chunk=64)
+    for start in range(0, 1000, 300):
+        writer.write_chunk(signals[:, start:start + 300])
+    writer.close()
+
+    reader = TraceReader(path)
+    assert reader.get_length() == 1000
+    assert reader.index.shape == (16, 3, 2)
+    assert (reader.get_trace("B") == signals[1]).all()
+    assert (reader.get_trace("C.Q", 100, 130) == signals[2, 100:130]).all()
+    assert (reader.get_trace("A", -10) == signals[0, -10:]).all()
+    assert reader.get_trace("A", 50, 50).size == 0
+    assert (reader.get_signal_array(63, 65) == signals[:, 63:65]).all()
+    with pytest.raises(KeyError):
+        reader.get_trace("D")
+    reader.close()
+
+
+@pytest.mark.parametrize("trace, expected", [
+    (DecimatedTrace(3), [0, 0, 0, 3, 3, 3, 6, 6, 6, 9, 9, 9, 12]),
+    (DecimatedTrace(1), list(range(13))),
+    (WindowedTrace([(8, 10), (2, 5), (12, 20)], fill=99),
+     [99, 99, 2, 3, 4, 99, 99, 99, 8, 9, 99, 99, 12]),
+])
+def test_policy_traces(trace, expected):
+    """Test that decimated and windowed traces read back the same however
+    the cycles were added."""
+    for value in range(4):
+        trace.append(value)
+    trace.extend(np.arange(4, 7))
+    trace.extend_run(7, 1)
+    trace.extend(np.arange(8, 13))
+    assert len(trace) == 13
+    assert trace.to_array().tolist() == expected
+    assert trace.to_array(4, 11).tolist() == expected[4:11]
+    assert [trace.get_signal(cycle) for cycle in range(13)] == expected
+
+    trace.clear()
+    trace.extend_run(5, 13)
+    assert trace.to_array(1, 4).tolist() == [
+        5 if value != 99 else 99 for value in expected[1:4]]
+
+
+def test_windowed_trace_errors():
+    """Test that overlapping windows are rejected."""
+    with pytest.raises(ValueError):
+        WindowedTrace([(0, 5), (4, 8)])
+    with pytest.raises(ValueError):
+        WindowedTrace([(3, 3)])
+    with pytest.raises(ValueError):
+        DecimatedTrace(0)
+
+
+def test_trace_pyramid():
+    """Test that every level summarises its buckets of cycles exactly."""
+    generator = np.random.default_rng(1)
+    signals = (generator.random((3, 10007)) < 0.01).cumsum(axis=1) % 3
+    signals = signals.astype(np.uint8)
+    changes = np.zeros(signals.shape, dtype=bool)
+    changes[:, 1:] = signals[:, 1:] != signals[:, :-1]
+
+    pyramid = TracePyramid(3, lowest=2, buffer=77)
+    for cycle in range(500):
+        pyramid.append(signals[:, cycle])
+    pyramid.extend(signals[:, 500:])
+    assert pyramid.get_summary(10, 50, 20) is None
+    assert pyramid.get_summary(0, None, 100)[0].shape == (3, 100)
+    assert len(pyramid.mins) == 13  # levels 2 to 14
+    for index in range(len(pyramid.mins)):
+        starts = np.arange(0, signals.shape[1], 1 << (index + 2))
+        expected = get_buckets(signals, signals, changes, starts)
+        for level, summary in zip([pyramid.mins, pyramid.maxs,
+                                   pyramid.changes], expected):
+            assert (level[index][:, :len(starts)] == summary).all()
@@ -0,0 +1,66 @@
+"""Test the vcd module."""
+import numpy as np
+import pytest
+
+from main_project.names import Names
+from main_project.devices import Devices
+from main_project.network import Network
+from main_project.monitors import Monitors
+from main_project.replay import VcdReplay
+from main_project.vcd import VcdWriter
+
+
+@pytest.fixture
+def new_monitors():
+    """Return a Monitors class instance monitoring two switches and a bus."""
+    new_names = Names()
+    new_devices = Devices(new_names)
+    new_network = Network(new_names, new_devices)
+    new_monitors = Monitors(new_names, new_devices, new_network)
+
+    [SW1_ID, SW2_ID, CLOCK_ID, COUNT_ID,
+     CLK] = new_names.lookup(["Sw1", "Sw2", "Clock", "Count", "CLK"])
+    new_devices.make_device(SW1_ID, new_devices.SWITCH, 0)
+    new_devices.make_device(SW2_ID, new_devices.SWITCH, 0)
+    new_devices.make_device(CLOCK_ID, new_devices.CLOCK, 1)
+    new_devices.make_device(COUNT_ID, new_devices.COUNTER, 4)
+    new_network.make_connection(CLOCK_ID, None, COUNT_ID, CLK)
+    new_monitors.make_monitor(SW1_ID, None)
+    new_monitors.make_monitor(SW2_ID, None)
+    new_monitors.make_monitor(COUNT_ID, None)
+    return new_monitors
+
+
+def test_write_chunk(tmp_path, new_monitors):
+    """Test that only the changes of each signal are written."""
+    path = tmp_path / "trace.vcd"
+    writer = VcdWriter(new_monitors, path, cycle_time=10)
+    # Sw1 rises and is then HIGH, which is the same level; Count is BLANK
+    # at first, stored as 1 << 4
+    writer.write_chunk(np.array([[0, 2, 1], [4, 4, 0], [16, 3, 3]]))
+    writer.write_chunk(np.array([[1, 3], [0, 0], [3, 4]]))
+    writer.close()
+
+    lines = path.read_text().splitlines()
+    assert "$var wire 1 ! Sw1 $end" in lines
+    assert "$var wire 4 # Count $end" in lines
+    body = lines[lines.index("$enddefinitions $end") + 1:]
+    assert body == ["#0", "0!", "x\"", "bx #", "#10", "1!", "b11 #", "#20",
+                    "0\"", "#40", "0!", "b100 #", "#50"]
+
+
+def test_write_vcd(tmp_path, new_monitors):
+    """Test that a streamed run can be replayed from its VCD file."""
+    devices = new_monitors.devices
+    network = new_monitors.network
+    [SW1_ID, SW2_ID] = devices.names.lookup(["Sw1", "Sw2"])
+    path = tmp_path / "run.vcd"
+    devices.set_switch(SW1_ID, 1)
+    assert new_monitors.write_vcd(path, 1000, chunk=64) == 1000
+    assert new_monitors.get_length() == 0
+
+    devices.set_switch(SW1_ID, 0)
+    network.stimulus = VcdReplay(devices, path)
+    network.execute_network()
+    assert devices.get_device(SW1_ID).switch_state == 1
+    assert devices.get_device(SW2_ID).switch_state == 0